@@ -1,8 +1,9 @@
 # Python official modules
+from datetime import timedelta
+import logging
 import os
 import sqlite3
-from time import time, localtime, strftime
-import werkzeug.security as ws
+from time import time
 
 # Flask modules
 import flask as fl
@@ -10,12 +11,28 @@ from flask_session import Session
 import flask_socketio as fio
 
 # Local Python files
+import db
 from helpers import *
+from journal import MoveJournal
+from lobby import LobbyBroadcaster, LobbyIndex
+from log_config import configure_logging
+from message_queue import queue_options
+import passwords
+from reaper import Reaper
+from session_store import SessionCache
+from snapshots import SnapshotWriter, restore_room
+from store import create_store
+import thirty_one_bots
 import thirty_one_game
+import wire
 # import cribbage
 
 # link to access app for debug http://127.0.0.1:5000
 
+# Log levels are set with LOG_LEVEL / LOG_LEVELS; see log_config.py
+configure_logging()
+logger = logging.getLogger(__name__)
+
 ##### TODO #####
 # Having temporary usernames persist outside of game room will cause issues with duplicate usernames. 
 # Should make usernames link on re-joining a room, but NOT re-joining lobby
@@ -31,52 +48,138 @@ def create_app():
     return app
 
 app = create_app()
-# Configure session to use filesystem (instead of signed cookies)
+
+# Number of workers running behind `workers.py`; with more than one, clients reconnect
+# their socket for each game room so the room's worker handles all of its events
+NUM_WORKERS = int(os.environ.get("NUM_WORKERS", 1))
+WORKER_INDEX = int(os.environ.get("WORKER_INDEX", 0))
+
+# Configure server-side sessions (instead of signed cookies): in-memory LRU with SQLite write-behind,
+# or straight to SQLite when workers share sessions.db
+# Sessions not written for PERMANENT_SESSION_LIFETIME are evicted
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
+app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=1)
+app.config["SESSION_TYPE"] = "cachelib"
+app.config["SESSION_CACHELIB"] = SessionCache(os.environ.get("SESSION_DB", "sessions.db"), shared=NUM_WORKERS > 1)
 Session(app)
 
-# Sets flask logging to Error only
-# log = logging.getLogger('werkzeug')
-# log.setLevel(logging.ERROR)
-
 # Configure socketio
-# With logs
-socketio = fio.SocketIO(app, logger=True, engineio_logger=True)
+# Workers share emits through a message queue, e.g. redis:// or the local sqlite:/// stand-in
+# Per-event logs are only written if the socketio / engineio loggers are set to INFO or lower
+socketio = fio.SocketIO(app, logger=logging.getLogger("socketio"), engineio_logger=logging.getLogger("engineio"),
+                        **queue_options(os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")))
 
-# Without logs
-# socketio = fio.SocketIO(app) #, logger=True, engineio_logger=True)
+# Queued session writes are saved off the request path
+socketio.start_background_task(app.config["SESSION_CACHELIB"].run, socketio.sleep)
 
-users = {}
+# Rooms are kept in this process unless ROOM_STORE points to a shared store, e.g. sqlite:///rooms.db
+rooms = create_store(os.environ.get("ROOM_STORE", "memory"))
 
-rooms = {}
+# Emits made while a handler holds a shared store's transaction are sent once it commits
+socketio.emit = rooms.deferred(socketio.emit)
 
 GAMES_TO_CAPACITY = {"thirty_one": 7, "cribbage": 3, "natac": 4}
 
+# Games that bots can fill empty seats in; see thirty_one_bots.py
+GAMES_WITH_BOTS = {"thirty_one"}
+
+# Seconds between bot moves so players can follow them
+BOT_MOVE_DELAY = float(os.environ.get("BOT_MOVE_DELAY", 1.0))
+
+bot_players = {}  # {(room name, bot name): ThirtyOneBot}
+bot_turns_running = set()  # names of rooms with a `play_bot_turns` task
+
+# Moves are journaled so any game can be replayed; see journal.py
+move_journal = MoveJournal(os.environ.get("JOURNAL_DIR") or "journal")
+socketio.start_background_task(move_journal.run, socketio.sleep)
+
+# Games are saved off the request path and restored after a restart; see snapshots.py
+snapshot_writer = SnapshotWriter(os.environ.get("SNAPSHOT_DB") or "snapshots.db")
+with rooms.transaction():
+    for snapshot in snapshot_writer.load():
+        if snapshot.name not in rooms and snapshot.game_name in GAMES_TO_CAPACITY:
+            rooms[snapshot.name] = restore_room(snapshot)
+
+            # The RNG's state isn't in the snapshot; journal the new seed it continues with
+            if rooms[snapshot.name].game:
+                move_journal.record(snapshot.name, "seed", rooms[snapshot.name].game.seed)
+socketio.start_background_task(snapshot_writer.run, socketio.sleep)
+
+# Hash of the test rooms' password "llll"; saves hashing it on every startup
+TEST_ROOMPW = "scrypt:32768:8:1$3lu3kudPAobTWbxL$7d78fa60a10ba5a88291cee819c069d7b7c93730532512a68f5ac77c58a46acf05410038693cc96bade870ea3c3fb625b93002e1c82fa74cb2718e0c599f4036"
+
 # Would it be optimal to split into lobbies for each game?
-rooms["lobby"] = Room(
+rooms.setdefault("lobby", Room(
     # This limits the lobby to 10000 people. Instead can skip capacity validation 
     # on join for lobby
     name="lobby", roompw="", game_name="", capacity=10000, date_created=int(time()), 
     creator="Frankobjank"
-)
+))
 
-rooms["Test_1"] = Room(
+rooms.setdefault("Test_1", Room(
     name="Test_1", roompw="", game_name="thirty_one",
     capacity=GAMES_TO_CAPACITY["thirty_one"], date_created=int(time()), creator="Frankobjank"
-)
+))
 
-rooms["Test_2"] = Room(
-    name="Test_2", roompw=ws.generate_password_hash("llll"), 
+rooms.setdefault("Test_2", Room(
+    name="Test_2", roompw=TEST_ROOMPW, 
     game_name="thirty_one", 
     capacity=GAMES_TO_CAPACITY["thirty_one"], date_created=int(time()), creator="Frankobjank"
-)
+))
 
-rooms["Test_3"] = Room(
-    name="Test_2", roompw=ws.generate_password_hash("llll"), 
+rooms.setdefault("Test_3", Room(
+    name="Test_3", roompw=TEST_ROOMPW, 
     game_name="cribbage", 
     capacity=GAMES_TO_CAPACITY["cribbage"], date_created=int(time()), creator="Frankobjank"
-)
+))
+
+# Rooms created by users are saved in the rooms table; bring them back after a restart
+with rooms.transaction():
+    for row in db.load_rooms():
+        if row["room"] not in rooms:
+            rooms[row["room"]] = Room(
+                name=row["room"], roompw=row["roompw"] or "", game_name=row["game"],
+                capacity=row["capacity"], date_created=row["date_created"], creator=row["creator"]
+            )
+            rooms[row["room"]].time_last_used = row["date_last_used"] or row["date_created"]
+
+# Lobby table rows per game, repackaged only when a room changes; see lobby.py
+lobby_index = LobbyIndex()
+lobby_index.fill(rooms)
+
+
+def send_lobby_update(game_name: str, update: wire.LobbyUpdate) -> None:
+    with app.app_context():
+        wire.emit("update_lobby", update, to=wire.lobby_channel(game_name))
+
+
+# Row changes are batched into one lobby update per game every LOBBY_UPDATE_INTERVAL seconds
+lobby_broadcaster = LobbyBroadcaster(lobby_index, send_lobby_update,
+                                     interval=float(os.environ.get("LOBBY_UPDATE_INTERVAL", 0.25)))
+socketio.start_background_task(lobby_broadcaster.run, socketio.sleep)
+
+
+def on_room_deleted(room: Room) -> None:
+    """Called by the reaper for each idle room it deletes."""
+    lobby_broadcaster.removed(room.game_name, room.name)
+    snapshot_writer.delete(room.name)
+    db.delete_room(room.name)
+    for key in [key for key in bot_players if key[0] == room.name]:
+        del bot_players[key]
+    logger.info("Deleted idle room %s.", room.name)
+
+
+# Disconnected users are removed after USER_TTL seconds and rooms nobody has used for ROOM_TTL
+# seconds are deleted; see reaper.py
+# The reaper sweeps every room in the store, so with a shared store only the first worker runs it.
+# The other background tasks run in every worker: each only saves snapshots (newer versions win)
+# and sends lobby updates for the rooms that worker changed
+reaper = Reaper(rooms, on_room_deleted, user_ttl=float(os.environ.get("USER_TTL", 600)),
+                room_ttl=float(os.environ.get("ROOM_TTL", 86400)),
+                interval=float(os.environ.get("REAP_INTERVAL", 60)),
+                keep={"lobby", "Test_1", "Test_2", "Test_3"})
+if WORKER_INDEX == 0:
+    socketio.start_background_task(reaper.run, socketio.sleep)
 
 
 # Uses session cookie
@@ -98,10 +201,15 @@ def after_request(response):
     return response
 
 
+@app.errorhandler(passwords.PoolBusy)
+def password_pool_busy(e):
+    return apology("Server is busy, please try again.", 503)
+
+
 @app.route("/")
 def index():
     # Display game options and option to view All
-    print(f"Session on index: {fl.session}")
+    logger.debug("Session on index: %s", fl.session)
     
     return fl.render_template("index.html")
 
@@ -123,24 +231,28 @@ def game():
     # Make sure session cookie is captured
     fl.session["session_cookie"] = fl.request.cookies.get("session")
 
-    return fl.render_template("game.html")
+    return fl.render_template("game.html", sticky_rooms=NUM_WORKERS > 1)
 
 
 # -- FlaskSocketIO -- #
+DUPE_ROOM_MSG = "Canceling Create Room request: room with same name already exists."
+
+
+# Not transactional: the password is hashed first, then `rooms[name] = room` saves the room
 @socketio.on("create_room")
 def on_create_room(data):
     
-    print(f"Received on create_room: {data}")
+    logger.debug("Received on create_room: %s", data)
     # Data keys: 'new_room_name', 'game', 'username', 'room' (i.e. lobby);
     
     if data.get("room", "") != "lobby":
         msg = "Canceling Create Room request: request did not originate from lobby."
-        print(msg)
+        logger.info(msg)
         return {"msg": msg, "accepted": False}
     
     if data.get("game", "") not in GAMES_TO_CAPACITY.keys():
         msg = f"Canceling Create Room request: game {data.get('game')} is not in list of accepted inputs."
-        print(msg)
+        logger.info(msg)
         return {"msg": msg, "accepted": False}
     
     new_room_name = data.get("new_room_name", "")
@@ -148,62 +260,49 @@ def on_create_room(data):
     validation = validate_name_input(name=new_room_name, max_len=18)
 
     if not validation["accepted"]:
-        print(validation["msg"])
+        logger.info(validation["msg"])
         return {"msg": validation["msg"], "accepted": False}
 
     # Add a dupe check here - redundant to rooms db check but
-    # this is better to use for now because db is currently not being used
-    if new_room_name in rooms.keys():
-        msg = f"Canceling Create Room request: room with same name already exists."
-        print(msg)
-        return {"msg": msg, "accepted": False}
+    # test rooms are not in the db
+    if new_room_name in rooms:
+        logger.info(DUPE_ROOM_MSG)
+        return {"msg": DUPE_ROOM_MSG, "accepted": False}
 
     # TODO Add ability to set password via room creation
     
-    # # Attempt to add room to database, checks for dupe
-    # try:
-    #     # If not dupe, add row to table
-    #     with sqlite3.connect("database.db") as conn:
-    #         conn.execute("""
-    #                      INSERT INTO rooms (room, roompw, game, date_created, date_last_used, capacity, creator)
-    #                      VALUES (?, ?, ?, ?, ?, ?, ?)
-    #                      """,
-    #                     (new_room_name,
-    #                      ws.generate_password_hash(data.get("password", "")),
-    #                      data["game"],
-    #                      int(time()),
-    #                      int(time()),
-    #                      GAMES_TO_CAPACITY[data["game"]],
-    #                      data["username"]))
-
-    # # Dupe room name
-    # except sqlite3.IntegrityError:
-    #     msg = f"Canceling Create Room request: room with same name already exists."
-    #     print(msg)
-    #     return {"msg": msg, "accepted": False}
-    
     # Set password to empty string if not given, else generate hash
     password = data.get("password", "")
     if len(password) == 0:
         roompw = ""
     else:
-        roompw = ws.generate_password_hash(password)
+        try:
+            roompw = passwords.generate_hash(password)
+        except passwords.PoolBusy:
+            return {"msg": "Server is busy, please try again.", "accepted": False}
+
+    new_room = Room(name=new_room_name,
+                    roompw=roompw, 
+                    game_name=data["game"],
+                    capacity=GAMES_TO_CAPACITY[data["game"]],
+                    date_created=int(time()),
+                    creator=data["username"])
+
+    # Attempt to add room to database, checks for dupe (case insensitive)
+    try:
+        db.add_room(new_room.name, new_room.roompw, new_room.game_name, new_room.date_created,
+                    new_room.capacity, new_room.creator)
+
+    # Dupe room name
+    except sqlite3.IntegrityError:
+        logger.info(DUPE_ROOM_MSG)
+        return {"msg": DUPE_ROOM_MSG, "accepted": False}
 
     # Add room to dict (and database)
-    rooms[new_room_name] = Room(name=new_room_name,
-                                roompw=roompw, 
-                                game_name=data["game"],
-                                capacity=GAMES_TO_CAPACITY[data["game"]],
-                                date_created=int(time()),
-                                creator=data["username"])
-    
-    # Push new room to all other users in lobby
-    # `rooms` is the rooms to add; `room` is room USER IS CURRENTLY IN
-    # Don't need to add all rooms, just new room
-    # Only add room for users with session var matching the game type
-    if data["game"] == fl.session["game"]:
-        fio.emit("update_lobby", {"action": "add_rooms", "room": data["room"], 
-                 "rooms": [rooms[new_room_name].package_self()]}, to="lobby")
+    rooms[new_room_name] = new_room
+    
+    # Push new room to users in the lobby for this game with the next lobby update
+    lobby_broadcaster.changed(new_room)
     
     # Use pass / fail for status to denote success of request
     return {"accepted": True}
@@ -214,14 +313,14 @@ def on_set_username(data):
     username = data.get("username_request", "")
 
     if len(fl.session.get("username", "")) > 0:
-        print("Canceling Set Username request: user is registered user.")
+        logger.info("Canceling Set Username request: user is registered user.")
         # Sending callback received to `emitWithAck`
         return {"msg": "Canceling Set Username request: user is registered user.", "accepted": False}
     
     validation = validate_name_input(name=username, max_len=12)
 
     if not validation["accepted"]:
-        print(validation["msg"])
+        logger.info(validation["msg"])
         return {"msg": validation["msg"], "accepted": False}
     
     # TODO username validation - check db for duplicate, check existing rooms for duplicate
@@ -231,19 +330,11 @@ def on_set_username(data):
     # On cleanup (every 3 hours?) users who are in DB without a password who were created over 24 hours ago can be deleted. First check if they are currently in any room.
 
     # Check for dupe name in all rooms
-    # This double loop is inefficient -
-        # Can optimize by storing all users not in db in a set to check against
-        # This would eliminate duplicates between rooms
-        # Maybe store all usernames in a db, with temporary flag for those who did not create an account? and temporary entry is deleted .. 24 hours after last disconnect?
-        # When this cleanup is run, rooms not used for 24 hours should also be deleted
-    for room in rooms.values():
-        for user in room.users:
-            # This doesn't allow anyone to re-join, adding check for cookie
-            # if user.name == username:
-            if user.name == username and user.session_cookie != fl.session["session_cookie"]:
-                msg = "Canceling Set Username request: username already taken."
-                print(msg)
-                return {"msg": msg, "accepted": False}
+    # This doesn't allow anyone to re-join, adding check for cookie
+    if rooms.name_taken(username, fl.session["session_cookie"]):
+        msg = "Canceling Set Username request: username already taken."
+        logger.info(msg)
+        return {"msg": msg, "accepted": False}
     
     # # Use session id to see if user already exists in lobby (i.e. on reconnection)
     # # If found, set user.name to name requested
@@ -261,6 +352,7 @@ def on_set_username(data):
 
 
 # Going to move password check to its own check before prejoin
+# Only reads the room (join checks again), so no transaction is held while the password is hashed
 @socketio.on("prejoin")
 def on_prejoin(data):
     # data contains keys: "room", "password", "req_username"
@@ -278,48 +370,48 @@ def on_prejoin(data):
         return response
     
     # BELOW CODE APPLIES ONLY TO GAMEROOMS - NOT LOBBY
+    room = rooms.peek(data["room"])
 
     # If can_join is set to true, do not return so additional checks can be made
     # Check for password AT THE END so that username can be retrieved before password checks are made
 
     # Check if room is full
-    if rooms[data["room"]].is_full():
+    if room.is_full():
         response["can_join"] = False
         response["msg"] = "room_full"
         return response
         
     # Check if user is rejoining; if rejoining will not need to set a username
-    print("Checking session cookie for rejoin")
-    for user in rooms[data["room"]].users:
-        
-        # Check if session cookie matches 
-        # TODO Can also use IP address for this, as browser crash or taking a break and
-        # resuming later are still big issues    
-        if user.session_cookie == fl.session["session_cookie"]:
-            
-            # User must NOT be connected in order to rejoin
-            if not user.connected:
-                    
-                response["can_join"] = True
-                response["username"] = user.name
-                # May be obvious, but calling prejoin does not necessarily mean join will be completed
-                # Therefore must wait to update user sid until join
-                # Update sid in user object - redundant with join - maybe this should happen on join only
-                # user.sid = fl.request.sid
-                break
+    logger.debug("Checking session cookie for rejoin")
 
+    # Check if session cookie matches 
+    # TODO Can also use IP address for this, as browser crash or taking a break and
+    # resuming later are still big issues    
+    user = registry.find_by_session(fl.session["session_cookie"], data["room"])
 
-            # If user is still is connected, prevent from joining
-            elif user.connected:
-                response["can_join"] = False
-                response["msg"] = "This name is already connected."
-                return response
+    if user:
+        # User must NOT be connected in order to rejoin
+        if not user.connected:
+                
+            response["can_join"] = True
+            response["username"] = user.name
+            # May be obvious, but calling prejoin does not necessarily mean join will be completed
+            # Therefore must wait to update user sid until join
+            # Update sid in user object - redundant with join - maybe this should happen on join only
+            # user.sid = fl.request.sid
+
+
+        # If user is still is connected, prevent from joining
+        elif user.connected:
+            response["can_join"] = False
+            response["msg"] = "This name is already connected."
+            return response
         
     # User was not found
     if len(response["username"]) == 0:
             
         # Check if game is in progress; don't allow new users to join mid-game
-        if rooms[data["room"]].game and rooms[data["room"]].game.in_progress:
+        if room.game and room.game.in_progress:
             response["can_join"] = False
             response["msg"] = "Cannot join - game is in progress"
             return response
@@ -336,7 +428,8 @@ def on_prejoin(data):
 
                 # Username accepted, allow client to join
                 if check_username_request(req_username=data["req_username"],
-                                          cookie_to_compare=fl.session["session_cookie"], rooms=rooms):
+                                          cookie_to_compare=fl.session["session_cookie"],
+                                          rooms=rooms):
                     response["username"] = data["req_username"]
                     response["can_join"] = True
                 
@@ -345,7 +438,7 @@ def on_prejoin(data):
                     response["msg"] = "Name not valid."
                     
                     # Tell client to use password modal if room is password protected
-                    if len(rooms[data["room"]].roompw) > 0:
+                    if len(room.roompw) > 0:
                         response["ask"] = "password"
                     
                     # Or use username modal if no password
@@ -359,7 +452,7 @@ def on_prejoin(data):
                 response["can_join"] = False
                 response["msg"] = "Please enter a name."
                 
-                if len(rooms[data["room"]].roompw) > 0:
+                if len(room.roompw) > 0:
                     response["ask"] = "password"
                 else:
                     response["ask"] = "username"
@@ -367,29 +460,43 @@ def on_prejoin(data):
         
     # User was found; make sure name isn't taken
     elif len(response["username"]) > 0:
-        if response["username"] in [user.name for user in rooms[data["room"]].users if user.connected]:
+        name_user = registry.find_by_name(data["room"], response["username"])
+        if name_user and name_user.connected:
             response["can_join"] = False
             response["msg"] = "name_taken"
             return response
         
     # Check if room is password-protected - save until end to gather username info first
-    if len(rooms[data["room"]].roompw) > 0:
+    if len(room.roompw) > 0 and not room.password_verified(fl.session["session_cookie"]):
         
         # Check if password given is correct
-        if not check_room_password(actual_roompw=rooms[data["room"]].roompw, user_roompw=data.get("password", "")):
+        try:
+            password_ok = room.check_password(data.get("password", ""))
+        except passwords.PoolBusy:
+            response["can_join"] = False
+            response["msg"] = "Server is busy, please try again."
+            response["ask"] = "password"
+            return response
+
+        if not password_ok:
             response["can_join"] = False
             response["msg"] = "Incorrect password."
             response["ask"] = "password"
             return response
+
+        # Don't ask this session again for a while
+        with rooms.transaction():
+            rooms[data["room"]].remember_password(fl.session["session_cookie"])
         
     # Did not hit any early exits;
-    print(f"End of prejoin checks; returning = {response}")
+    logger.debug("End of prejoin checks; returning = %s", response)
     return response
 
 
 @socketio.on("join")
+@rooms.transactional
 def on_join(data):
-    print("ON JOIN")
+    logger.debug("ON JOIN")
     # Change to unique url room solution?
         # potentially with option of making public and being added to a lobby
     
@@ -407,18 +514,17 @@ def on_join(data):
         fio.emit("update_lobby", {"action": "setup_room", "room": data["room"],
                  "username": data.get("username", "")}, to=fl.request.sid)
         
-        # Join the room
-        fio.join_room(data["room"])
+        # Join the room, and the channel for the game's lobby updates
+        wire.join_room(data["room"], fl.session.get("encoding", "json"))
+        wire.join_room(wire.lobby_channel(fl.session["game"]), fl.session.get("encoding", "json"))
         
-        print(f"{fl.session.get('username', 'Non-registered_user')} joined {data['room']}.")
+        logger.info("%s joined %s.", fl.session.get("username", "Non-registered_user"), data["room"])
         
         # Add rooms to lobby (rows in table)
         # Only include rooms pertaining to chosen game
-        fio.emit("update_lobby", {"action": "add_rooms", "room": data["room"], 
-                 "username": data.get("username", ""), 
-                 "rooms": [room.package_self() for room in rooms.values()
-                           if room.name != "lobby" and room.game_name == fl.session["game"]]}, 
-                           to=fl.request.sid)
+        wire.emit("update_lobby", wire.LobbyRooms(room=data["room"], username=data.get("username", ""), 
+                  rooms=lobby_index.rows(fl.session["game"], rooms)), 
+                  to=fl.request.sid, encoding=fl.session.get("encoding", "json"))
         
         # Exit early
         return "Server callback: lobby join completed."
@@ -430,29 +536,25 @@ def on_join(data):
     if data["room"] != "lobby":
         
         # Ensure username does not conflict with anyone in room - should be a validation in set_username?
-        if data.get("username", "") in [user.name for user in rooms[data["room"]].users if user.connected]:
+        name_user = registry.find_by_name(data["room"], data.get("username", ""))
+        if name_user and name_user.connected:
             msg = "Someone in the room has the same name as you; cannot join."
-            print(msg)
+            logger.info(msg)
             fio.emit("debug_msg", {"msg": msg}, to=fl.request.sid)
             return msg
 
-    # Initiate user object for use below
-    user = None
+    # Use session cookie to see if user exists in room already; update sid and connection status
+    user = registry.find_by_session(fl.session["session_cookie"], data["room"])
 
-    for room_user in rooms[data["room"]].users:
-        # Use session cookie to see if user exists in room already; update sid and connection status
-        if room_user.session_cookie == fl.session["session_cookie"]:
-
-            print(f"User {room_user.name} was found in room {data['room']}. Updating sid from {room_user.sid} TO {fl.request.sid}")
-            
-            # Copy new sid to room_user object
-            room_user.sid = fl.request.sid
-
-            # If user found, set connected to True
-            room_user.connected = True
+    if user:
+        logger.debug("User %s was found in room %s. Updating sid from %s TO %s", user.name, data["room"], user.sid, fl.request.sid)
+        
+        # Copy new sid to user object; re-indexes user in registry
+        user.sid = fl.request.sid
 
-            # Assign to `user` for using below
-            user = room_user
+        # If user found, set connected to True
+        user.connected = True
+        user.encoding = fl.session.get("encoding", "json")
 
     # REDUNDANT WITH PREJOIN
     # Check if username is set (would not be set for a non-registered user)
@@ -470,37 +572,37 @@ def on_join(data):
             sid = fl.request.sid,
             connected = True
         )
+        user.encoding = fl.session.get("encoding", "json")
 
         # Add new user to room clients
-        rooms[data["room"]].users.append(user)
+        rooms[data["room"]].add_user(user)
 
-        print(f"Added user to room {data['room']}")
+        logger.debug("Added user to room %s", data["room"])
     
 
+    rooms[data["room"]].touch()
+
     # For game room
     # Set up client's username on their end
     # THIS MUST HAPPEN BEFORE <add_players> SO USERNAME IS SET
     fio.emit("update_gameroom", {"action": "setup_room", "room": data["room"], "username": user.name,
                                  "game": rooms[data["room"]].game_name}, to=fl.request.sid)
     
-    print(f"Users on join: {rooms[data['room']].users} after processing.")
+    logger.debug("Users on join: %s after processing.", rooms[data["room"]].users)
 
     # Join the room
-    fio.join_room(data["room"])
+    wire.join_room(data["room"], user.encoding)
     
-    print(f"{user.name} joined {data['room']}.")
+    logger.info("%s joined %s.", user.name, data["room"])
         
     # Joining game room - NOT lobby
 
     # Log msg that player has joined
-    fio.emit("chat_log", {"msg": f"{user.name} has joined {data['room']}.", "sender": "system",
-             "time_stamp": strftime("%b-%d %I:%M%p", localtime())}, room=data["room"])
+    wire.emit("chat_log", wire.chat_message(f"{user.name} has joined {data['room']}."), to=data["room"])
 
     
     # Send updated player count to anyone remaining in lobby
-    fio.emit("update_lobby", {"action": "update_lobby_table", "row": data["room"], "col": "players",
-             "new_value": f"{rooms[data['room']].get_num_connected()} / {rooms[data['room']].capacity}"}, 
-             to="lobby")
+    lobby_broadcaster.changed(rooms[data["room"]])
     
     # Check if game exists; different rules for game vs not game
     game = rooms[data["room"]].game
@@ -508,68 +610,74 @@ def on_join(data):
     # If game doesn't exist or game is not in progress, add only players who are connected
     # TODO Check special cases, i.e. new games with different players in same room
     if not game or not game.in_progress:
-        print(f"Sending update room to {data['room']} to add {list((user.name for user in rooms[data['room']].users if user.connected))}")
+        players = [user.name for user in rooms[data["room"]].users if user.connected] + rooms[data["room"]].bots
+        logger.debug("Sending update room to %s to add %s", data["room"], players)
 
         # Send updated list of players to others in room
         fio.emit("update_gameroom", {"action": "add_players", "room": data["room"],
-                 "game": rooms[data["room"]].game_name,
-                 "players": list(user.name for user in rooms[data["room"]].users if user.connected)},
+                 "game": rooms[data["room"]].game_name, "players": players},
                  room=data["room"], broadcast=True)
     
     # If game does exist, add ALL players in game on reconnect
     # Use all players list to send updates to players who are knocked out
     elif game and game.in_progress and user.name in game.players.keys():
 
-        print(f"Sending update room to {data['room']} to add {list(game.players.keys())}")
+        players = list(game.players.keys())
+        logger.debug("Sending update room to %s to add %s", data["room"], players)
 
         # Send updated list of players to others in room
         fio.emit("update_gameroom", {"action": "add_players", "room": data["room"],
-                 "game": rooms[data["room"]].game_name, "players": list(game.players.keys())},
+                 "game": rooms[data["room"]].game_name, "players": players},
                  room=data["room"], broadcast=True)
         
         game_update = game.package_state(user.name)
                     
         # Send game data if game in progress
-        print(f"Sending game state to {user.name} on join: \n{game_update}")    
-        fio.emit("update_board", game_update, to=fl.request.sid, room=data["room"])
+        logger.debug("Sending game state to %s on join: %s", user.name, game_update)
+        wire.emit("update_board", game_update, to=fl.request.sid, encoding=user.encoding)
         fio.emit("debug_msg", {"msg": f"Server sent game state on join."}, to=fl.request.sid)
         
         # If player is rejoining, update connection status for all other clients in room
         fio.emit("update_gameroom", {"action": "conn_status", "room": data["room"], 
                  "players": [user.name], "connected": True}, room=data["room"], broadcast=True)
 
-        # Empty log for player after update is sent
-        game.players[user.name].log = []
+        # Log msgs up to here have been sent to the player
+        game.events.mark_read(user.name)
     
     # If a game has started, no matter game state, UPDATE the player's sid
     # It's also possible server to use sids from active players in room rather than the game state storing sids
 
+    snapshot_writer.save(rooms[data["room"]])
+
+    # Bots stop when their game isn't running, e.g. after a restart; pick up where they left off
+    schedule_bot_turns(data["room"])
 
     return "Server callback: game room join completed."
         
 
 @socketio.on("leave")
+@rooms.transactional
 def on_leave(data):
     # Disconnect handles leaving the page or disconnecting other ways;
     # Leave can handle leaving the current room to go to the lobby
     # For debug:
-    print("ON LEAVE")
+    logger.debug("ON LEAVE")
     
-    print(f"{data['username']} has left the {data['room']} room.")
+    logger.info("%s has left the %s room.", data["username"], data["room"])
     
-    fio.leave_room(data["room"])
+    wire.leave_room(data["room"])
 
     # In lieu of removing user from room users dict:
     # Set connected to False so that user persists
-    for user in rooms[data["room"]].users:
-
-        # Check session cookie and sid to identify correct user
-        if fl.session["session_cookie"] == user.session_cookie and fl.request.sid == user.sid:
-            user.connected = False
+    # Check session cookie and sid to identify correct user
+    user = registry.find_by_session(fl.session["session_cookie"], data["room"])
+    if user and fl.request.sid == user.sid:
+        user.connected = False
             
 
     # For leaving lobby
     if data["room"] == "lobby":
+        wire.leave_room(wire.lobby_channel(fl.session.get("game", "")))
         fio.emit("update_lobby", {"action": "teardown_room", "room": data["room"]}, to=fl.request.sid)
 
         # Will update lobby player counts when leaving game room, but not lobby
@@ -580,18 +688,16 @@ def on_leave(data):
     
 
     # For leaving game room
+    rooms[data["room"]].touch()
 
     # Send updated player count to anyone remaining in lobby
-    fio.emit("update_lobby", {"action": "update_lobby_table", "row": data["room"], "col": "players",
-             "new_value": f"{rooms[data['room']].get_num_connected()} / {rooms[data['room']].capacity}"}, to="lobby")
+    lobby_broadcaster.changed(rooms[data["room"]])
 
     # Teardown game room for user leaving
     fio.emit("update_gameroom", {"action": "teardown_room", "room": data["room"]}, to=fl.request.sid)
 
     # Notify the rest of clients in the room that user has left
-    fio.emit("chat_log", {"msg": f"{data['username']} has left.", "sender": "system",
-                          "time_stamp": strftime("%b-%d %I:%M%p", localtime())}, 
-                          to=data["room"])
+    wire.emit("chat_log", wire.chat_message(f"{data['username']} has left."), to=data["room"])
     
     # Update leaving player's connection status to False for all others in game room
     fio.emit("update_gameroom", {"action": "conn_status", "room": data["room"],
@@ -617,26 +723,30 @@ def on_leave(data):
 
 # Custom event - "move"
 @socketio.on("move")
+@rooms.transactional
 def on_move(data):
 
     # For debug:
-    print(f"Received move event `{data['action']}` from sid `{fl.request.sid}`.")
+    logger.debug("Received move event `%s` from sid `%s`.", data["action"], fl.request.sid)
     
     # If client requests start, check number of players in room
     if data["action"] == "start":
         
-        # Reject if invalid number of players
-        if not (2 <= rooms[data["room"]].get_num_connected() <= rooms[data["room"]].capacity):
+        # Reject if invalid number of players; bots count as players
+        num_players = rooms[data["room"]].get_num_connected() + len(rooms[data["room"]].bots)
+        if not (2 <= num_players <= rooms[data["room"]].capacity):
             fio.emit("debug_msg", {"msg": "Invalid number of players."}, to=fl.request.sid)
-            print("Invalid number of players.")
+            logger.info("Invalid number of players.")
             
-            fio.emit("chat_log", {"msg": f"Must have between 2 and {rooms[data['room']].capcity} people to start game.", 
-                     "sender": "system", "time_stamp": strftime("%b-%d %I:%M%p", localtime())}, to=fl.request.sid)
+            wire.emit("chat_log", wire.chat_message(f"Must have between 2 and {rooms[data['room']].capacity} people to start game."), 
+                      to=fl.request.sid, encoding=fl.session.get("encoding", "json"))
             return
         
         if not rooms[data["room"]].game:
             if rooms[data["room"]].game_name == "thirty_one":
                 rooms[data["room"]].game = thirty_one_game.State(data["room"])
+                move_journal.record(data["room"], "new", {"game": "thirty_one", "room": data["room"],
+                                                          "seed": rooms[data["room"]].game.seed})
             
             # elif rooms[data["room"]].game_name == "cribbage":
             #     rooms[data["room"]].game = .State(data["room"])
@@ -645,14 +755,20 @@ def on_move(data):
         if rooms[data["room"]].game.in_progress:
             fio.emit("debug_msg", {"msg": "Game is already in progress; Cannot start game."}, 
                      to=fl.request.sid)
-            print("Game is already in progress.")
+            logger.info("Game is already in progress.")
         
         # Add all players to game state since there are the correct number
         for user in rooms[data["room"]].users:
             if user.connected:
                 fio.emit("debug_msg", {"msg": f"Adding {user} to game."}, to=fl.request.sid)
-                print(f"Adding {user} to game.")
+                logger.debug("Adding %s to game.", user)
                 rooms[data["room"]].game.add_player(user.name)
+                move_journal.record(data["room"], "add_player", user.name)
+
+        for bot_name in rooms[data["room"]].bots:
+            logger.debug("Adding bot %s to game.", bot_name)
+            rooms[data["room"]].game.add_player(bot_name)
+            move_journal.record(data["room"], "add_player", bot_name)
 
     game = rooms[data["room"]].game
     
@@ -660,17 +776,14 @@ def on_move(data):
     if not game:
         msg = "The game has not started yet."
         fio.emit("debug_msg", {"msg": msg}, to=fl.request.sid)
-        fio.emit("chat_log", {"msg": msg, "sender": "system", 
-                 "time_stamp": strftime("%b-%d %I:%M%p", localtime())}, to=fl.request.sid)
+        wire.emit("chat_log", wire.chat_message(msg), to=fl.request.sid, encoding=fl.session.get("encoding", "json"))
         return
     
-    # Loop through room's users to find player name
-    player = None
+    # Find player by sid
+    player = registry.find_by_sid(fl.request.sid, data["room"])
 
-    for user in rooms[data["room"]].users:
-        if user.connected and user.sid == fl.request.sid:
-            player = user
-            break
+    if player and not player.connected:
+        player = None
 
 
     ### Bug ### occurred where player was not found for a game that was in progress. Some leaving and rejoining had occurred, it's possible a sid was lost or connected status was not updated
@@ -678,7 +791,7 @@ def on_move(data):
     # 2 Ideas: add username to `move` event or make sure `sid` and `connected` are solid and add
     # something to catch case when player isn't found
     if not player:
-        print("Rejecting move request: Unable to find user in room")
+        logger.warning("Rejecting move request: Unable to find user in room")
         fio.emit("debug_msg", {"msg":f"Server rejected move request; Unable to find user in room"},
                  to=fl.request.sid)
         return
@@ -687,119 +800,273 @@ def on_move(data):
     # Only allow input from all players to click continue during round ending (for 31)
     if game.in_progress and game.mode != "end_round" and player.name != game.current_player:
         
-        print("Not accepting move from non-current player while game is in progress.")
+        logger.info("Not accepting move from non-current player while game is in progress.")
         fio.emit("debug_msg", {"msg":f"Server rejected move request; {player.name} not current player."},
                  to=fl.request.sid)
         
         return
 
+    rooms[data["room"]].touch()
+
+    # Journal every packet given to the game, since rejected moves can still add log msgs
+    move_journal.record(data["room"], "move", data)
+
     # Update based on data.action, data.card
     if game.update(data) == "reject":
         
         # Send on server reject
-        print(f"Rejecting `{data['action']}` from `{player.name}`")
+        logger.info("Rejecting `%s` from `%s`", data["action"], player.name)
         fio.emit("debug_msg", {"msg": f"Server rejected move event `{data['action']}`"}, 
                 to=fl.request.sid)
 
     # Send on server accept; Tailored response to each player
     else:
+        send_update(data["room"], data["action"])
+        schedule_bot_turns(data["room"])
+    
+
+def send_update(room_name: str, action: str) -> None:
+    """Send the board and each player's overlay after an accepted move; also used by bot moves."""
+    game = rooms[room_name].game
+
+    # Lobby row still has in_progress from before the move
+    row_before = lobby_index.get(rooms[room_name].game_name, room_name)
+
+    # Clients don't have a board yet when a game starts; send full snapshot
+    new_game = action == "start"
+    
+    # Only send fields that changed with this move
+    changed_fields, changed_hands = game.changes.collect()
+    if new_game:
+        changed_fields = thirty_one_game.PUBLIC_FIELDS
+
+    # Shared part of the board is packaged once and sent to everyone in the room
+    response = game.package_public(changed_fields, full=new_game)
+    logger.debug("Sending response %s on %s", response, action)
+    wire.emit("update_board", response, to=room_name)
+    
+    # Tailored overlay (hand, hand score, log) to each player
+    for username in game.players.keys():
         
-        # Save in_progress var before game update
-        in_progress_before_update = game.in_progress
+        # Bots keep track of the game themselves and have no one to send a log to
+        if username in rooms[room_name].bots:
+            get_bot(room_name, username).observe(game)
+            game.events.mark_read(username)
+            continue
+
+        overlay = game.package_private(username, include_hand=new_game or username in changed_hands)
         
-        for username in game.players.keys():
-            
-            response = game.package_state(username)
-            
-            # have to specify the 'to' parameter of 'emit' to send to specific player
-            print(f"Sending response: \n{response} \non {data['action']}")
-            
-            recipient_sid = ""
-            # Lookup sid for user in room.users - this can be optimized with a dict
-            for user in rooms[data["room"]].users:
-                if user.connected and user.name == response["recipient"]:
-                    recipient_sid = user.sid
-                    break
-
-            fio.emit("update_board", response, to=recipient_sid, room=data["room"])
+        recipient_sid = ""
+        # Lookup sid for user in room
+        recipient = registry.find_by_name(room_name, username)
+        if recipient and recipient.connected:
+            recipient_sid = recipient.sid
+
+        # have to specify the 'to' parameter of 'emit' to send to specific player
+        if len(recipient_sid) > 0:
+            wire.emit("update_player", overlay, to=recipient_sid, encoding=recipient.encoding)
             
-            fio.emit("debug_msg", {"msg": 
-                    f"Server accepted move event `{data['action']}`. Server response: {response}."}, 
-                    to=recipient_sid)
-    
-            # Empty log for player after update is sent
-            game.players[username].log = []
+            socketio.emit("debug_msg", {"msg": f"Server accepted move event `{action}`."}, 
+                          to=recipient_sid)
+
+            # Log msgs up to here have been sent to the player
+            game.events.mark_read(username)
+
+    # If in_progress var has changed, send update to lobby. 
+    if not row_before or row_before.in_progress != game.in_progress:
+        lobby_broadcaster.changed(rooms[room_name])
+
+    snapshot_writer.save(rooms[room_name])
+
+
+def get_bot(room_name: str, name: str) -> thirty_one_bots.ThirtyOneBot:
+    """Bot players live in this worker; one missing (e.g. after a restart) catches up on its first move."""
+    if (room_name, name) not in bot_players:
+        bot_players[(room_name, name)] = thirty_one_bots.ThirtyOneBot(name)
+    return bot_players[(room_name, name)]
+
+
+def bot_is_up(room: Room) -> bool:
+    game = room.game
+    return bool(game and game.in_progress and game.mode in ("main_phase", "discard")
+                and game.current_player in room.bots)
+
+
+def schedule_bot_turns(room_name: str) -> None:
+    """Play bot turns in the background if a bot is up next."""
+    if room_name in bot_turns_running or not bot_is_up(rooms[room_name]):
+        return
+
+    bot_turns_running.add(room_name)
+    socketio.start_background_task(play_bot_turns, room_name)
+
+
+def play_bot_turns(room_name: str) -> None:
+    """Background task: bots move one at a time, BOT_MOVE_DELAY apart, until a person is up."""
+    try:
+        with app.app_context():
+            while True:
+                socketio.sleep(BOT_MOVE_DELAY)
+
+                with rooms.transaction():
+                    room = rooms.get(room_name)
+                    if not room or not bot_is_up(room):
+                        return
+
+                    game = room.game
+                    packet = {**get_bot(room_name, game.current_player).move(game),
+                              "room": room_name, "username": game.current_player}
+
+                    move_journal.record(room_name, "move", packet)
+                    if game.update(packet) == "reject":
+                        logger.error("Bot %s made a move that was rejected: %s", game.current_player, packet)
+                        return
+
+                    room.touch()
+                    send_update(room_name, packet["action"])
+    finally:
+        bot_turns_running.discard(room_name)
+
+
+@socketio.on("add_bot")
+@rooms.transactional
+def on_add_bot(data):
+    room = rooms[data["room"]]
+
+    msg = ""
+    if room.game_name not in GAMES_WITH_BOTS:
+        msg = "Bots can't play this game yet."
+    elif not registry.find_by_sid(fl.request.sid, data["room"]):
+        msg = "Join the room before adding a bot."
+    elif room.game and room.game.in_progress:
+        msg = "Cannot add a bot while a game is in progress."
+    elif room.is_full():
+        msg = "Room is full."
+
+    if msg:
+        wire.emit("chat_log", wire.chat_message(msg), to=fl.request.sid, encoding=fl.session.get("encoding", "json"))
+        return msg
 
-        # If in_progress var has changed, send update to lobby. 
-        if in_progress_before_update != game.in_progress:
-            fio.emit("update_lobby", {"action": "update_lobby_table", "row": data["room"], 
-                     "col": "in_progress", "new_value": game.in_progress}, to="lobby")
+    bot_name = thirty_one_bots.bot_name(taken={user.name for user in room.users} | set(room.bots))
+    room.bots.append(bot_name)
+    logger.info("Added bot %s to %s.", bot_name, data["room"])
+
+    wire.emit("chat_log", wire.chat_message(f"{bot_name} has joined {data['room']}."), to=data["room"])
+    fio.emit("update_gameroom", {"action": "add_players", "room": data["room"], "game": room.game_name,
+             "players": [user.name for user in room.users if user.connected] + room.bots}, to=data["room"])
+
+    room.touch()
+    snapshot_writer.save(room)
+    return "Server callback: bot added."
+
+
+@socketio.on("remove_bot")
+@rooms.transactional
+def on_remove_bot(data):
+    room = rooms[data["room"]]
+
+    if not room.bots or not registry.find_by_sid(fl.request.sid, data["room"]) \
+            or (room.game and room.game.in_progress):
+        return "Server callback: no bot removed."
+
+    bot_name = room.bots.pop()
+    bot_players.pop((data["room"], bot_name), None)
+    logger.info("Removed bot %s from %s.", bot_name, data["room"])
+
+    wire.emit("chat_log", wire.chat_message(f"{bot_name} has left {data['room']}."), to=data["room"])
+    fio.emit("update_gameroom", {"action": "remove_players", "room": data["room"], "players": [bot_name]},
+             to=data["room"])
+
+    room.touch()
+    snapshot_writer.save(room)
+    return "Server callback: bot removed."
+
+
+@socketio.on("request_state")
+@rooms.transactional
+def on_request_state(data):
+    # Client missed a board update (version gap); send a full snapshot
+    game = rooms[data["room"]].game
+    user = registry.find_by_sid(fl.request.sid, data["room"])
+
+    if not game or not user or user.name not in game.players.keys():
+        fio.emit("debug_msg", {"msg": "Server could not send game state; player not in game."}, to=fl.request.sid)
+        return
     
+    wire.emit("update_board", game.package_state(user.name), to=fl.request.sid, encoding=user.encoding)
+
+    # Log msgs up to here have been sent to the player
+    game.events.mark_read(user.name)
+
 
 @socketio.on("message")
 def message(data):
     
-    print(f"Received chat msg {data['msg']} from {data['username']}")
+    logger.debug("Received chat msg %s from %s", data["msg"], data["username"])
     
-    fio.emit("chat_log", {"msg": data["msg"], "sender": data["username"],
-             "time_stamp": strftime("%b-%d %I:%M%p", localtime())}, room=data["room"])
+    wire.emit("chat_log", wire.chat_message(data["msg"], sender=data["username"]), to=data["room"])
 
 
 @socketio.on("connect")
-def on_connect():
+def on_connect(auth=None):
     fl.session["session_cookie"] = fl.request.cookies.get("session")
 
+    # Client can ask for MessagePack instead of JSON
+    fl.session["encoding"] = wire.negotiate(auth)
+
 
 @socketio.on("debug_msg")
 def on_debug_msg(data):
-    print("debug msg\n\n")
-    print(data)
+    logger.debug("Debug msg from client: %s", data)
 
 
 @socketio.on("disconnect")
+@rooms.transactional
 def on_disconnect():
-    print(f"Session on disconnect: {fl.session}")
+    logger.debug("Session on disconnect: %s", fl.session)
 
     # Room id is unavailable;
     # Remove player from every room since disconnect implies leaving all rooms
     # DON'T REMOVE from room clients so client can reconnect
-    for room_name, room_object in rooms.items():
-        for user in room_object.users:
-
-            # Removing player name since there is no guaranteed universal usernames across the app
-            # For now using session cookie, though storing session cookie only one session cookie
-                # in flask might be problematic if user opens multiple sessions on one computer.
-            if user.session_cookie == fl.session["session_cookie"]:
-                user.connected = False
-                
-                # Remove player if no game
-                if not room_object.game:
-
-                    print(f"No game exists; Sending update to room {room_name} to remove `{user.name}`")
-                    fio.emit("update_gameroom", {"action": "remove_players", "room": room_name, 
-                             "players": [user.name]}, room=room_name, broadcast=True)
-
-                # If game, check if game is in progress
-                elif room_object.game:
-                    
-                    # If game is not running, remove player. 
-                    # Otherwise keep player until game is officially reset.
-                    if not room_object.game.in_progress:
-                        print("Game exists but is not in progress; removing player.")
-
-                        # Broadcast = True; i.e. player who is leaving does not need the remove players event
-                        fio.emit("update_gameroom", {"action": "remove_players", "room": room_name,
-                                 "players": [user.name]}, room=room_name, broadcast=True)
-
-                        print(f"Sending update to room {room_name} to remove `{user.name}`")
-                    
-                    # If game is in progress, let other clients in room know that the player has disconnected 
-                    else:
-                        print("Game exists and is in progress; sending disconnect notice to other clients.")
+    # Removing player name since there is no guaranteed universal usernames across the app
+    # For now using session cookie, though storing session cookie only one session cookie
+        # in flask might be problematic if user opens multiple sessions on one computer.
+    for room_name in list(registry.rooms_for_session(fl.session["session_cookie"])):
+        # Look up user after loading room; another worker may have saved a newer copy
+        room_object = rooms[room_name]
+        user = registry.find_by_session(fl.session["session_cookie"], room_name)
+        user.connected = False
+        room_object.touch()
+        lobby_broadcaster.changed(room_object)
+
+        # Remove player if no game
+        if not room_object.game:
+
+            logger.debug("No game exists; Sending update to room %s to remove `%s`", room_name, user.name)
+            fio.emit("update_gameroom", {"action": "remove_players", "room": room_name, 
+                     "players": [user.name]}, room=room_name, broadcast=True)
+
+        # If game, check if game is in progress
+        elif room_object.game:
+
+            # If game is not running, remove player. 
+            # Otherwise keep player until game is officially reset.
+            if not room_object.game.in_progress:
+                logger.debug("Game exists but is not in progress; removing player.")
+
+                # Broadcast = True; i.e. player who is leaving does not need the remove players event
+                fio.emit("update_gameroom", {"action": "remove_players", "room": room_name,
+                         "players": [user.name]}, room=room_name, broadcast=True)
+
+                logger.debug("Sending update to room %s to remove `%s`", room_name, user.name)
+
+            # If game is in progress, let other clients in room know that the player has disconnected 
+            else:
+                logger.debug("Game exists and is in progress; sending disconnect notice to other clients.")
 
-                        fio.emit("update_gameroom", {"action": "conn_status", "room": room_name,
-                                 "players": [user.name], "connected": False}, room=room_name,
-                                 broadcast=True)
+                fio.emit("update_gameroom", {"action": "conn_status", "room": room_name,
+                         "players": [user.name], "connected": False}, room=room_name,
+                         broadcast=True)
 # -- End FlaskSocketIO -- #
 
 
@@ -818,31 +1085,17 @@ def login():
         elif not fl.request.form.get("password"):
             return apology("Must provide a password.", 403)
 
-        db_response = {}
         # Query database for username
-        with sqlite3.connect("database.db") as conn:
-            conn.row_factory = dict_factory
-            # COLLATE NOCASE in table schema makes search case insensitive
-            db_response = conn.execute("SELECT * FROM users WHERE username = ?",    
-                                       # extra comma to make this a tuple
-                                       (fl.request.form.get("username"),))
-        
-        username = ""
-        pwhash = ""
-        user_id = ""
-        for row in db_response:
-            username = row["username"]
-            pwhash = row["pwhash"]
-            user_id = row["id"]
+        # COLLATE NOCASE in table schema makes search case insensitive
+        row = db.find_user(fl.request.form.get("username"))
 
         # Ensure username exists and password is correct
-        if len(username) == 0 or not ws.check_password_hash(
-                                     pwhash, fl.request.form.get("password", "")):
+        if row is None or not passwords.check_hash(row["pwhash"], fl.request.form.get("password", "")):
             return apology("Invalid username and/or password.", 403)
 
         # Remember which user has logged in
-        fl.session["user_id"] = user_id
-        fl.session["username"] = username
+        fl.session["user_id"] = row["id"]
+        fl.session["username"] = row["username"]
 
         # Redirect user to last page visited
         if fl.session.get("last_page"):
@@ -879,7 +1132,7 @@ def register():
         validation = validate_name_input(name=fl.request.form.get("username"), max_len=12)
         
         if not validation["accepted"]:
-            print(validation["msg"])
+            logger.info(validation["msg"])
             return apology(validation["msg"], 400)
 
         # Ensure password was submitted
@@ -893,14 +1146,9 @@ def register():
         # Attempt to register account, check for dupe username
         try:
             # If not dupe, add row to table
-            with sqlite3.connect("database.db") as conn:
-                conn.execute("""
-                            INSERT INTO users (username, pwhash, date)
-                            VALUES (?, ?, ?)
-                            """,
-                            (fl.request.form.get("username"),
-                            ws.generate_password_hash(fl.request.form.get("password", "")),
-                            int(time())))
+            db.add_user(fl.request.form.get("username"),
+                        passwords.generate_hash(fl.request.form.get("password", "")),
+                        int(time()))
 
         # Dupe username
         except sqlite3.IntegrityError:
@@ -934,35 +1182,22 @@ def change_password():
         elif fl.request.form.get("new_password") != fl.request.form.get("confirmation"):
             return apology("new password and confirmation must match", 400)
 
-        db_response = {}
         # Query database for password hash
-        with sqlite3.connect("database.db") as conn:
-            conn.row_factory = dict_factory
-            db_response = conn.execute("SELECT pwhash FROM users WHERE id = ?",
-                                       (fl.session.get("user_id"), 0))
-
-        pwhash_from_server = ""
-        
-        for row in db_response:
-            pwhash_from_server = row["pwhash"]
+        pwhash_from_server = db.get_pwhash(fl.session.get("user_id", 0))
 
         if len(pwhash_from_server) == 0:
             return apology("Error connecting to database.", 500)
 
         # Ensure old password is correct
-        if not ws.check_password_hash(pwhash_from_server, fl.request.form.get("old_password", "")):
+        if not passwords.check_hash(pwhash_from_server, fl.request.form.get("old_password", "")):
             return apology("Invalid password.", 403)
 
         # Check for dupe password
-        if ws.check_password_hash(pwhash_from_server, fl.request.form.get("new_password", "")):
+        if passwords.check_hash(pwhash_from_server, fl.request.form.get("new_password", "")):
             return apology("New password must be different from the old password.", 400)
 
         # If not dupe, update password hash in table
-        with sqlite3.connect("database.db") as conn:
-            conn.row_factory = dict_factory
-            conn.execute("UPDATE users SET pwhash = ? WHERE id = ?",
-                   (ws.generate_password_hash(fl.request.form.get("new_password", "")),
-                    fl.session.get("user_id", 0)))
+        db.set_pwhash(fl.session.get("user_id", 0), passwords.generate_hash(fl.request.form.get("new_password", "")))
 
         fl.flash("Your password has been changed!")
 
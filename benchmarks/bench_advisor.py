@@ -0,0 +1,70 @@
+"""Time to advise a crib discard for a 6 card hand: scoring every starter card by card vs cribbage_advisor.
+
+Run from the repo root: python benchmarks/bench_advisor.py
+"""
+import os
+import random
+import sys
+from itertools import combinations
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cribbage_advisor
+from cribbage_advisor import advise_discard
+from cribbage import score_show_hand
+
+
+def naive_advise(hand: list[int], own_crib: bool) -> list[tuple[float, tuple[int, ...]]]:
+    """Score each kept hand and discard with each of the 46 starters; the crib is only the discard."""
+    starters = [card for card in range(52) if card not in hand]
+
+    options = []
+    for keep in combinations(hand, 4):
+        discard = [card for card in hand if card not in keep]
+        hand_ev = sum(score_show_hand(list(keep), starter, crib=False).total for starter in starters) / len(starters)
+        crib_ev = sum(score_show_hand(discard, starter, crib=True).total for starter in starters) / len(starters)
+        options.append((hand_ev + crib_ev if own_crib else hand_ev - crib_ev, keep))
+
+    return sorted(options, reverse=True)
+
+
+def clear_caches() -> None:
+    cribbage_advisor._advise.cache_clear()
+    cribbage_advisor.expected_rank_points.cache_clear()
+
+
+def time_hands(func, hands: list[list[int]]) -> float:
+    """Seconds per hand."""
+    start = perf_counter()
+    for hand in hands:
+        func(hand)
+    return (perf_counter() - start) / len(hands)
+
+
+def main(num_hands: int=200) -> None:
+    rng = random.Random(0)
+    hands = [rng.sample(range(52), 6) for _ in range(num_hands)]
+
+    # Rank points are a static table; fill it so cold runs only time the per-hand work
+    for hand in hands:
+        advise_discard(hand, own_crib=True)
+
+    timings = {
+        "naive, starter only": lambda hand: naive_advise(hand, own_crib=True),
+        "advisor, starter only": lambda hand: (clear_caches(), advise_discard(hand, own_crib=True, others=False)),
+        "advisor, other cards": lambda hand: (clear_caches(), advise_discard(hand, own_crib=True)),
+    }
+
+    print(f"{num_hands} hands")
+    print(f"{'advise':>22} {'ms/hand':>8}")
+    for name, func in timings.items():
+        print(f"{name:>22} {time_hands(func, hands) * 1000:>8.3f}")
+
+    # Same hands again once every one is memoized
+    for hand in hands:
+        advise_discard(hand, own_crib=True)
+    print(f"{'advisor, memoized':>22} {time_hands(lambda hand: advise_discard(hand, own_crib=True), hands) * 1000:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Time to zip and unzip cards: building a Card per call (before the shared CARDS) vs table lookups.
+
+Run from the repo root: python benchmarks/bench_cards.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards_shared import (CARD_RANKS, CARD_SUITS, NUM_RANKS, RANK_TO_VALUE, RANKS, SUIT_TO_DISPLAY, SUITS,
+                          unzip_card, zip_card, zip_hand)
+
+
+class OldCard:
+    """Card before CARDS: built for every zip_card call."""
+
+    def __init__(self, rank: str, suit: str):
+        self.rank = rank
+        self.value = RANK_TO_VALUE[self.rank]
+        self.suit = suit
+        self.suit_display = SUIT_TO_DISPLAY[self.suit]
+        self.id = SUITS.index(suit) * NUM_RANKS + RANKS.index(rank)
+
+
+    def zip_card(self):
+        rank = self.rank
+        if rank == "10":
+            rank = "T"
+        return f"{rank}{self.suit[0].capitalize()}"
+
+
+def old_zip_card(card: int) -> str:
+    return OldCard(CARD_RANKS[card], CARD_SUITS[card]).zip_card()
+
+
+SUIT_LETTER_TO_INDEX = {suit[0].upper(): suit_index for suit_index, suit in enumerate(SUITS)}
+
+
+def old_unzip_card(card_str: str) -> int:
+    rank = card_str[0]
+    if rank == "T":
+        rank = "10"
+    return SUIT_LETTER_TO_INDEX[card_str[1].upper()] * NUM_RANKS + RANKS.index(rank)
+
+
+def main(num_cards: int=100000, repeat: int=5) -> None:
+    rng = random.Random(0)
+    cards = [rng.randrange(52) for _ in range(num_cards)]
+    codes = [zip_card(card) for card in cards]
+    hands = [cards[i:i + 4] for i in range(0, num_cards, 4)]
+
+    timings = {
+        "zip": (lambda: [old_zip_card(card) for card in cards], lambda: [zip_card(card) for card in cards]),
+        "unzip": (lambda: [old_unzip_card(code) for code in codes], lambda: [unzip_card(code) for code in codes]),
+        "zip_hand": (lambda: [[old_zip_card(card) for card in hand] for hand in hands],
+                     lambda: [zip_hand(hand) for hand in hands]),
+    }
+
+    print(f"{num_cards} cards")
+    print(f"{'':>9} {'old ns/card':>12} {'new ns/card':>12}")
+    for name, (old, new) in timings.items():
+        old_best = min(timeit.repeat(old, number=1, repeat=repeat)) / num_cards
+        new_best = min(timeit.repeat(new, number=1, repeat=repeat)) / num_cards
+        print(f"{name:>9} {old_best * 1e9:>12.0f} {new_best * 1e9:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Time to log messages to every player: a list per player (the old game_log) vs the shared EventLog.
+
+Run from the repo root: python benchmarks/bench_event_log.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from games_shared import EventLog, game_logger
+
+
+def list_per_player(num_players: int, num_msgs: int, send_every: int) -> int:
+    """game_log before EventLog: every msg for everyone is copied to each player's list.
+    Player 0 is disconnected and never sent anything; returns how many msgs are kept for them."""
+    logs = {f"player{n}": [] for n in range(num_players)}
+    for i in range(num_msgs):
+        game_logger.debug("(%s) %s", "all", "msg")
+        for log in logs.values():
+            log.append("msg")
+        if i % send_every == send_every - 1:
+            for name in list(logs)[1:]:
+                logs[name] = []
+    return len(logs["player0"])
+
+
+def event_log(num_players: int, num_msgs: int, send_every: int) -> int:
+    events = EventLog()
+    for i in range(num_msgs):
+        events.append("msg")
+        if i % send_every == send_every - 1:
+            for n in range(1, num_players):
+                events.unread(f"player{n}")
+                events.mark_read(f"player{n}")
+    return len(events.unread("player0"))
+
+
+def main(num_msgs: int=100000, repeat: int=3) -> None:
+    print(f"{num_msgs} msgs to all players; one player is disconnected, the others are sent their log")
+    print(f"{'players':>8} {'sent every':>10} {'lists us/msg':>13} {'kept':>7} {'event log us/msg':>17} {'kept':>5}")
+    for num_players in (2, 7):
+        for send_every in (1, 10, num_msgs):
+            results = {}
+            for name, func in (("lists", list_per_player), ("event log", event_log)):
+                kept = func(num_players, num_msgs, send_every)
+                best = min(timeit.repeat(lambda: func(num_players, num_msgs, send_every), number=1, repeat=repeat))
+                results[name] = (best / num_msgs * 1e6, kept)
+            print(f"{num_players:>8} {send_every:>10} {results['lists'][0]:>13.3f} {results['lists'][1]:>7} "
+                  f"{results['event log'][0]:>17.3f} {results['event log'][1]:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Compare thirty-one hand scoring: combinations per call vs precomputed lookup table.
+
+Run from the repo root: python benchmarks/bench_hand_score.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import thirty_one_game
+
+
+def main(num_hands: int=10000, repeat: int=5) -> None:
+    rng = random.Random(31)
+    hands = [rng.sample(range(52), rng.choice([3, 4])) for _ in range(num_hands)]
+
+    # Make sure tables are loaded so they aren't counted in the timings
+    thirty_one_game.load_hand_score_tables()
+
+    for name, func in [("combinations", thirty_one_game.score_hand_combos),
+                       ("lookup table", thirty_one_game.hand_score)]:
+        best = min(timeit.repeat(lambda: [func(hand) for hand in hands], number=1, repeat=repeat))
+        print(f"{name:>14}: {best / num_hands * 1e6:.2f} us per hand")
+
+    build_time = timeit.timeit(thirty_one_game.build_hand_score_tables, number=1)
+    print(f"{'table build':>14}: {build_time:.2f} s (once, then cached on disk)")
+
+
+if __name__ == "__main__":
+    main()
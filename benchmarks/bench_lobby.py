@@ -0,0 +1,49 @@
+"""Time to build a lobby's room list: packaging every room vs the cached LobbyIndex rows.
+
+Run from the repo root: python benchmarks/bench_lobby.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import Room, User
+from lobby import LobbyIndex
+from store import InProcessStore
+
+GAMES = ("thirty_one", "cribbage")
+
+
+def make_rooms(num_rooms: int, users_per_room: int) -> InProcessStore:
+    rooms = InProcessStore()
+    for index in range(num_rooms):
+        room = Room(name=f"room_{index}", roompw="", game_name=GAMES[index % len(GAMES)], capacity=7,
+                    date_created=1_700_000_000 + index, creator="bench")
+        # Users are kept out of the registry; only their connected flags are counted
+        room.users = [User(name=f"user_{n}", connected=n % 2 == 0) for n in range(users_per_room)]
+        rooms[room.name] = room
+    return rooms
+
+
+def main(num_rooms: int=5000, users_per_room: int=5, repeat: int=5) -> None:
+    rooms = make_rooms(num_rooms, users_per_room)
+    index = LobbyIndex()
+    index.fill(rooms)
+    room = rooms["room_0"]
+
+    timings = {
+        "rebuild": lambda: [room.package_self() for room in rooms.values() if room.game_name == "thirty_one"],
+        "cached": lambda: index.rows("thirty_one", rooms),
+        "refresh 1 row": lambda: index.refresh(room),
+    }
+
+    print(f"{num_rooms} rooms, {users_per_room} users each, {len(GAMES)} games")
+    print(f"{'lobby list':>14} {'ms':>8}")
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=10, repeat=repeat)) / 10
+        print(f"{name:>14} {best * 1e3:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
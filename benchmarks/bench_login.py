@@ -0,0 +1,76 @@
+"""Load test for /login: POST the login form from several local clients and report requests/s.
+
+Uses a copy of database.db in a temp directory, so the real database is not touched. Unknown
+usernames measure the request + database path; known usernames are dominated by the password
+hash check. Run from the repo root: python benchmarks/bench_login.py [threads] [requests per thread]
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from time import perf_counter, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+TMP = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+shutil.copy(os.path.join(REPO, "database.db"), TMP)
+os.environ["DATABASE"] = os.path.join(TMP, "database.db")
+os.environ["SESSION_DB"] = os.path.join(TMP, "sessions.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Anything else the app writes to the working directory also goes in the temp dir
+os.chdir(TMP)
+
+import sqlite3
+import werkzeug.security as ws
+
+from app import app
+
+USERNAME = "bench_user"
+PASSWORD = "bench_password"
+
+
+def add_user() -> None:
+    with sqlite3.connect(os.environ["DATABASE"]) as conn:
+        conn.execute("INSERT OR IGNORE INTO users (username, pwhash, date) VALUES (?, ?, ?)",
+                     (USERNAME, ws.generate_password_hash(PASSWORD), int(time())))
+
+
+def hammer(username: str, num_threads: int, num_requests: int) -> float:
+    """Returns requests/s over all threads."""
+    errors = []
+
+    def client_loop() -> None:
+        client = app.test_client()
+        for _ in range(num_requests):
+            response = client.post("/login", data={"username": username, "password": PASSWORD})
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(num_threads)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed")
+    return num_threads * num_requests / elapsed
+
+
+def main(num_threads: int=8, num_requests: int=250) -> None:
+    add_user()
+    print(f"{num_threads} threads x {num_requests} requests")
+    print(f"{'username':>8} {'req/s':>8}")
+    print(f"{'unknown':>8} {hammer('nobody_by_this_name', num_threads, num_requests):>8.0f}")
+    # Every request checks a real password hash; keep the count down
+    print(f"{'known':>8} {hammer(USERNAME, num_threads, max(1, num_requests // 25)):>8.0f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,71 @@
+"""Per-request latency of Flask-Session backends: filesystem vs in-memory LRU + SQLite write-behind.
+
+Each client loads a page that writes the session (like /game) and then a page that only
+reads it (like /). Run from the repo root: python benchmarks/bench_sessions.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flask as fl
+from flask_session import Session
+
+from session_store import SessionCache
+
+
+def make_app(config: dict) -> fl.Flask:
+    app = fl.Flask(__name__)
+    app.config.update(SECRET_KEY="bench", SESSION_PERMANENT=False, **config)
+    Session(app)
+
+    @app.route("/write")
+    def write():
+        fl.session["last_page"] = "/game"
+        fl.session["game"] = fl.request.args.get("game", "thirty_one")
+        fl.session["session_cookie"] = fl.request.cookies.get("session")
+        return ""
+
+    @app.route("/read")
+    def read():
+        return fl.session.get("game", "")
+
+    return app
+
+
+def run(app: fl.Flask, num_clients: int, rounds: int) -> dict[str, list[float]]:
+    clients = [app.test_client() for _ in range(num_clients)]
+    timings = {"/write": [], "/read": []}
+
+    for _ in range(rounds):
+        for client in clients:
+            for path in timings:
+                start = perf_counter()
+                client.get(path)
+                timings[path].append(perf_counter() - start)
+
+    return timings
+
+
+def main(num_clients: int=200, rounds: int=10) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "filesystem": {"SESSION_TYPE": "filesystem", "SESSION_FILE_DIR": os.path.join(tmp, "files")},
+            "lru+sqlite": {"SESSION_TYPE": "cachelib", "SESSION_CACHELIB": SessionCache(os.path.join(tmp, "s.db"))},
+        }
+
+        print(f"{num_clients} clients x {rounds} rounds")
+        print(f"{'backend':>11} {'path':>7} {'mean us':>8} {'p50 us':>8} {'p99 us':>8}")
+        for name, config in backends.items():
+            for path, samples in run(make_app(config), num_clients, rounds).items():
+                samples.sort()
+                p99 = samples[int(len(samples) * 0.99)]
+                print(f"{name:>11} {path:>7} {statistics.mean(samples) * 1e6:>8.0f} "
+                      f"{statistics.median(samples) * 1e6:>8.0f} {p99 * 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Time to shuffle a 52 card deck: the old pop-from-list shuffle vs Fisher-Yates, one at a time and batched.
+
+Run from the repo root: python benchmarks/bench_shuffle.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards_shared import Deck, shuffle_deck, shuffled_decks
+
+
+def pop_shuffle(deck: Deck, rng: random.Random) -> list[int]:
+    """shuffle_deck before Fisher-Yates: O(n^2) from list.pop in the middle of the list."""
+    cards_to_add = list(deck.unshuffled_cards)
+
+    shuffled_cards = []
+    while len(cards_to_add) > 0:
+        randindex = rng.randint(0, len(cards_to_add)-1)
+        shuffled_cards.append(cards_to_add.pop(randindex))
+
+    return shuffled_cards
+
+
+def main(num_decks: int=10000, repeat: int=5) -> None:
+    rng = random.Random(0)
+    deck = Deck()
+
+    timings = {
+        "pop": lambda: [pop_shuffle(deck, rng) for _ in range(num_decks)],
+        "fisher-yates": lambda: [shuffle_deck(deck, rng) for _ in range(num_decks)],
+        "batch": lambda: shuffled_decks(num_decks, rng),
+    }
+
+    print(f"{num_decks} decks")
+    print(f"{'shuffle':>12} {'us/deck':>8}")
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=repeat)) / num_decks
+        print(f"{name:>12} {best * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
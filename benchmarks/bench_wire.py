@@ -0,0 +1,63 @@
+"""Compare encode time and payload size of thirty-one board updates: JSON vs MessagePack.
+
+"json" is what Socket.IO sends for a JSON client (dict serialized with the json module).
+Run from the repo root: python benchmarks/bench_wire.py
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards_shared import zip_hand
+import thirty_one_game
+import wire
+
+NAMES = ["alice", "bobby", "carol", "dave", "erin", "frank", "gina"]
+
+
+def play_game(num_players: int, num_moves: int=20) -> tuple:
+    """Start a game and make some moves; returns (full state, last public delta, last player overlay)."""
+    rng = random.Random(num_players)
+    game = thirty_one_game.State("Bench")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in NAMES[:num_players]:
+            game.add_player(name)
+        game.update({"action": "start", "name": NAMES[0]})
+
+        delta = None
+        for _ in range(num_moves):
+            if game.mode == "main_phase":
+                game.update({"action": rng.choice(["draw", "pickup"]), "name": game.current_player})
+            elif game.mode == "discard":
+                card = rng.choice(zip_hand(game.players[game.current_player].hand))
+                game.update({"action": "discard", "name": game.current_player, "card": card})
+            changed_fields, changed_hands = game.changes.collect()
+            delta = game.package_public(changed_fields)
+
+    player = game.player_order[0]
+    return game.package_state(player), delta, game.package_private(player)
+
+
+def main(repeat: int=5, number: int=2000) -> None:
+    print(f"{'players':>7} {'payload':>8} {'encoding':>9} {'bytes':>6} {'us/encode':>10}")
+
+    for num_players in range(2, 8):
+        for label, payload in zip(("full", "delta", "player"), play_game(num_players)):
+            encoders = {
+                "json": lambda: json.dumps(wire.encode(payload, "json"), separators=(",", ":")).encode(),
+                "msgpack": lambda: wire.encode(payload, "msgpack"),
+            }
+            for encoding, encoder in encoders.items():
+                size = len(encoder())
+                best = min(timeit.repeat(encoder, number=number, repeat=repeat)) / number
+                print(f"{num_players:>7} {label:>8} {encoding:>9} {size:>6} {best * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
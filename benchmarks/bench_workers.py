@@ -0,0 +1,132 @@
+"""Two workers sharing emits and rooms through SQLite: checks that each sees the other's, and times it.
+
+Each worker is its own process with a Socket.IO server on the SQLite message queue
+(message_queue.py) and a SQLiteStore (store.py) on the same files, as when run by workers.py.
+Worker 1 has a client in room "table"; worker 0 emits to that room, then changes a room that
+worker 1 has cached. Exits with status 1 if worker 1 misses either.
+
+The client is registered with worker 1's server directly and its packets are recorded where
+the server would write them to the socket, so no client library or port is needed.
+
+Run from the repo root: python benchmarks/bench_workers.py
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from time import perf_counter, sleep, time
+
+import socketio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import Room, User, registry
+from message_queue import SQLitePubSubManager
+from store import SQLiteStore
+
+TIMEOUT = 10.0
+
+
+class RecordingServer(socketio.Server):
+    """Keeps the events it sends instead of writing them to a socket."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.received = []  # (time received, event name, data)
+
+
+    def _send_eio_packet(self, eio_sid, eio_pkt) -> None:
+        # Socket.IO EVENT packets are encoded as '2["event", data]'
+        event, data = json.loads(eio_pkt.data[1:])
+        self.received.append((time(), event, data))
+
+
+def make_worker(path: str, server_class=socketio.Server):
+    server = server_class(async_mode="threading",
+                          client_manager=SQLitePubSubManager(f"sqlite:///{os.path.join(path, 'queue.db')}"))
+    return server, SQLiteStore(os.path.join(path, "rooms.db"))
+
+
+def worker_0(path: str, ready, changed, num_emits: int) -> None:
+    """Emits to worker 1's room, then adds a user to the shared room."""
+    server, rooms = make_worker(path)
+    ready.wait(TIMEOUT)
+
+    for n in range(num_emits):
+        server.emit("ping", {"n": n, "sent": time()}, to="table")
+
+    with rooms.transaction():
+        rooms["shared"].add_user(User(name="bob", session_cookie="cookie_bob"))
+        rooms["shared"].capacity = 5
+    changed.set()
+
+
+def worker_1(path: str, ready, changed, results, num_emits: int) -> None:
+    """Holds a client in room "table" and a cached copy of the shared room."""
+    server, rooms = make_worker(path, RecordingServer)
+    server.manager.initialize()  # starts listening to the queue
+    sid = server.manager.connect("client_eio_sid", "/")
+    server.enter_room(sid, "table")
+    cached = rooms.peek("shared")
+
+    # The queue is only read from when the listener starts; wait until our own emit comes back
+    deadline = time() + TIMEOUT
+    while not server.received and time() < deadline:
+        server.emit("hello", {}, to="table")
+        sleep(0.05)
+    server.received.clear()
+    ready.set()
+
+    pings = []
+    deadline = time() + TIMEOUT
+    while len(pings) < num_emits and time() < deadline:
+        sleep(0.01)
+        pings = [(received, data) for received, event, data in server.received if event == "ping"]
+    latencies = sorted(received - data["sent"] for received, data in pings)
+
+    changed.wait(TIMEOUT)
+    start = perf_counter()
+    room = rooms.peek("shared")
+    reload_time = perf_counter() - start
+
+    results.put({
+        "emits": len(latencies),
+        "latency_ms": latencies[len(latencies) // 2] * 1e3 if latencies else float("nan"),
+        "reloaded": room is not cached and room.capacity == 5 and [user.name for user in room.users] == ["bob"],
+        "registry": bool(room.users) and registry.find_by_session("cookie_bob", "shared") is room.users[0],
+        "reload_ms": reload_time * 1e3,
+    })
+
+
+def main(num_emits: int=200) -> None:
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as path:
+        rooms = SQLiteStore(os.path.join(path, "rooms.db"))
+        rooms["shared"] = Room(name="shared", roompw="", game_name="thirty_one", capacity=7,
+                               date_created=int(time()), creator="bench")
+
+        ready, changed, results = ctx.Event(), ctx.Event(), ctx.Queue()
+        workers = [ctx.Process(target=worker_1, args=(path, ready, changed, results, num_emits)),
+                   ctx.Process(target=worker_0, args=(path, ready, changed, num_emits))]
+        for worker in workers:
+            worker.start()
+        result = results.get(timeout=TIMEOUT * 3)
+        for worker in workers:
+            worker.join()
+
+    print(f"{'check':>24} {'result':>8}")
+    received = f"{result['emits']}/{num_emits}"
+    print(f"{'emits received':>24} {received:>8}")
+    print(f"{'median emit latency ms':>24} {result['latency_ms']:>8.1f}")
+    print(f"{'room change reloaded':>24} {str(result['reloaded']):>8}")
+    print(f"{'registry points at it':>24} {str(result['registry']):>8}")
+    print(f"{'reload ms':>24} {result['reload_ms']:>8.3f}")
+
+    if result["emits"] < num_emits or not result["reloaded"] or not result["registry"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
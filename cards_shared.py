@@ -1,4 +1,4 @@
-from operator import attrgetter
+from math import comb
 import random
 
 # Constants
@@ -14,15 +14,92 @@ SUITS = ["spade", "heart", "diamond", "club"]
 
 SUIT_TO_DISPLAY = {"spade": "\u2660", "heart": "\u2665", "diamond": "\u2666", "club": "\u2663"}
 
+# Compact card encoding
+# Cards are ints 0-51 in the same order as an unshuffled deck: suit index * 13 + rank index
+# Hands can be represented as 52-bit masks with bit `card` set for each card in the hand
+NUM_RANKS = len(RANKS)
+NUM_CARDS = len(SUITS) * NUM_RANKS
+
+# Lookup tables indexed by card int
+CARD_RANKS = tuple(rank for suit in SUITS for rank in RANKS)
+CARD_SUITS = tuple(suit for suit in SUITS for rank in RANKS)
+CARD_RANK_INDEX = tuple(card % NUM_RANKS for card in range(NUM_CARDS))
+CARD_SUIT_INDEX = tuple(card // NUM_RANKS for card in range(NUM_CARDS))
+
+# Mask of all cards in each suit; `hand_mask & SUIT_MASKS[i]` gives cards of suit i in a hand
+SUIT_MASKS = tuple(((1 << NUM_RANKS) - 1) << (suit_index * NUM_RANKS) for suit_index in range(len(SUITS)))
+
+# Binomial coefficients for combinatorial hand indexes; BINOMIALS[k][n] = C(n, k)
+BINOMIALS = tuple(tuple(comb(n, k) for n in range(NUM_CARDS + 1)) for k in range(7))
+
+
+def value_table(rank_to_value: dict[str, int]) -> tuple[int, ...]:
+    """Build a card int -> value table; games with different values build their own."""
+    return tuple(rank_to_value[rank] for rank in CARD_RANKS)
+
+
+CARD_VALUES = value_table(RANK_TO_VALUE)
+
+
+def card_id(rank: str, suit: str) -> int:
+    return SUITS.index(suit) * NUM_RANKS + RANKS.index(rank)
+
+
+def hand_to_mask(hand: list[int]) -> int:
+    mask = 0
+    for card in hand:
+        mask |= 1 << card
+    return mask
+
+
+def mask_to_hand(mask: int) -> list[int]:
+    hand = []
+    while mask:
+        low_bit = mask & -mask
+        hand.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return hand
+
+
+def hand_index(hand) -> int:
+    """Unique index of a hand among all hands of the same size, regardless of card order."""
+    index = 0
+    for k, card in enumerate(sorted(hand), start=1):
+        index += BINOMIALS[k][card]
+    return index
+
+
 # Classes
 class Card:
+    """Display view of a card int; there is one shared, immutable Card per card (see `CARDS`)."""
+
+    __slots__ = ("rank", "value", "suit", "suit_display", "id", "code")
+
     def __init__(self, rank: str, suit: str):
-        self.rank = rank
-        self.value = RANK_TO_VALUE[self.rank]
-        self.suit = suit
-        self.suit_display = SUIT_TO_DISPLAY[self.suit]
-    
-    
+        set_field = super().__setattr__
+        set_field("rank", rank)
+        set_field("value", RANK_TO_VALUE[rank])
+        set_field("suit", suit)
+        set_field("suit_display", SUIT_TO_DISPLAY[suit])
+        set_field("id", card_id(rank, suit))
+
+        # Portable string sent to clients: 2S, 3C, AH, etc.; 10 is T so all cards are 2 chars long
+        set_field("code", f"{'T' if rank == '10' else rank}{suit[0].upper()}")
+
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError("Cards are shared and can't be changed.")
+
+
+    @classmethod
+    def from_id(cls, card: int) -> "Card":
+        return CARDS[card]
+
+
+    def __reduce__(self):
+        return (Card.from_id, (self.id,))
+
+
     def __repr__(self) -> str:
         return f"Card({self.rank}, {self.suit})"
     
@@ -33,83 +110,113 @@ class Card:
 
     def zip_card(self):
         """Create portable string to send to client."""
-        
-        # Convert 10 to T to make all cards 2 chars long
-        rank = self.rank
-        if rank == "10":
-            rank = "T"
-
-        # returns 2S, 3C, AH, etc.
-        return f"{rank}{self.suit[0].capitalize()}"
-    
+        return self.code
+
+
+# One Card per card int, and lookups built from them once
+CARDS = tuple(Card(rank, suit) for suit in SUITS for rank in RANKS)
+CARD_CODES = tuple(card.code for card in CARDS)
+CARD_DISPLAY = tuple(str(card) for card in CARDS)
+
+# Portable string -> card int; suit letter can be either case
+CODE_TO_CARD = {**{card.code[0] + card.code[1].lower(): card.id for card in CARDS},
+                **{card.code: card.id for card in CARDS}}
+
 
 class Deck:
+    """Unshuffled deck; immutable, so every game uses the shared `DECK`."""
+
     def __init__(self) -> None:
-        self.unshuffled_cards = [Card(rank, suit) for suit in SUITS for rank in RANKS]
+        self.unshuffled_cards = tuple(range(NUM_CARDS))
 
 
     def __repr__(self) -> str:
         return f"Deck({self.unshuffled_cards})"
 
 
+    def __reduce__(self):
+        # Pickled games (SQLiteStore) point back at the shared deck
+        return "DECK"
+
+
+DECK = Deck()
+
+
 # Functions
-def unzip_card(card_str: str) -> Card:
-    """Decode portable string from client."""
+def zip_card(card: int) -> str:
+    """Create portable string from card int to send to client."""
+    return CARD_CODES[card]
 
-    # Convert 10 to T to make all cards 2 chars long
-    rank = card_str[0]
-    if rank == "T":
-        rank = "10"
-    
-    suit_letter = card_str[1].lower()
-    suit = ""
 
-    for s in SUITS:
-        if suit_letter in s[0]:
-            suit = s
+def unzip_card(card_str: str) -> int|None:
+    """Decode portable string from client to a card int; None if it isn't a card."""
+    return CODE_TO_CARD.get(card_str)
+
+
+def format_card(card: int) -> str:
+    """Display string for a card int, i.e. 10♥."""
+    return CARD_DISPLAY[card]
+
 
-    # returns 2S, 3C, AH, etc.
-    return Card(rank, suit)
+def format_cards(cards) -> str:
+    return ", ".join(format_card(card) for card in cards)
 
 
 # Previously part of player class methods
-def sort_hand(hand: list[Card]) -> list[Card]:
-    """Sort hand in order of suit."""
+def sort_hand(hand: list[int], values: tuple[int, ...]=CARD_VALUES) -> list[int]:
+    """Sort hand by value, then by suit."""
 
-    return sorted(sorted(hand, key=attrgetter("suit"), reverse=True), key=attrgetter("value"), reverse=True)
+    return sorted(hand, key=lambda card: (values[card], CARD_SUITS[card]), reverse=True)
 
 
-def zip_hand(hand: list[Card]) -> list[str]:
+def zip_hand(hand: list[int]) -> list[str]:
     """Convert hand to portable strings to send to client."""
     
-    cards = []
-    for c in hand:
-        cards.append(c.zip_card())
+    return [CARD_CODES[card] for card in hand]
+
+# Previously part of State class methods
+def shuffle_deck(deck: Deck, rng: random.Random=random) -> list[int]:
+    """Shuffled copy of the deck's cards; pass a game's own `rng` to make it reproducible."""
+    return shuffle_cards(list(deck.unshuffled_cards), rng)
+
+
+def shuffle_cards(cards: list[int], rng: random.Random=random) -> list[int]:
+    """Fisher-Yates shuffle in place; returns `cards`."""
+    rand = rng.random
+    for i in range(len(cards) - 1, 0, -1):
+        j = int(rand() * (i + 1))
+        cards[i], cards[j] = cards[j], cards[i]
     
     return cards
 
-# Previously part of State class methods
-def shuffle_deck(deck: Deck) -> list[Card]:
-    cards_to_add = deck.unshuffled_cards.copy()
 
-    shuffled_cards = []
-    while len(cards_to_add) > 0:
-        randindex = random.randint(0, len(cards_to_add)-1)
-        shuffled_cards.append(cards_to_add.pop(randindex))
+def shuffled_decks(count: int, rng: random.Random=random, cards: list[int]|None=None) -> list[list[int]]:
+    """`count` independently shuffled copies of `cards` (a full deck by default); for simulations and tests."""
+    cards = list(range(NUM_CARDS)) if cards is None else cards
+    swaps = tuple((i, i + 1) for i in range(len(cards) - 1, 0, -1))
+    rand = rng.random
+
+    decks = []
+    for _ in range(count):
+        deck = cards.copy()
+        for i, span in swaps:
+            j = int(rand() * span)
+            deck[i], deck[j] = deck[j], deck[i]
+        decks.append(deck)
     
-    return shuffled_cards
+    return decks
 
 
-def draw_card(shuffled_cards: list[Card]) -> Card:
+def draw_card(shuffled_cards: list[int]) -> int:
     return shuffled_cards.pop()
 
 
-def deal(player_object, shuffled_cards, num_cards: int) -> None:
+def deal(player_object, shuffled_cards, num_cards: int, values: tuple[int, ...]=CARD_VALUES) -> None:
     """Deal starting hands."""
 
     for i in range(num_cards):
         player_object.hand.append(draw_card(shuffled_cards))
-    player_object.hand = sort_hand(player_object.hand)
+    player_object.hand = sort_hand(player_object.hand, values)
 
 
 # Unicode suit reference
@@ -1,15 +1,85 @@
 from collections import namedtuple
+from functools import lru_cache
 from itertools import combinations
+import logging
 import random
 
 from cards_shared import *
 from games_shared import *
+from log_config import lazy
+
+logger = logging.getLogger(__name__)
 
 # Custom namedtuple for cribbage
 Play = namedtuple("Play", ["player", "card"])
 
+# Card int -> rank order for runs; aces are low (A=0 ... K=12)
+RUN_RANKS = tuple((rank_index + 1) % NUM_RANKS for rank_index in CARD_RANK_INDEX)
+
+# Run rank -> value for counting 15s
+RUN_RANK_VALUES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)
+
+# Result of scoring a hand or crib in the show
+    # fifteens, pairs, runs: tuples of card int tuples that scored
+    # flush: points for a flush (0, 4 or 5)
+    # nobs: jack matching the starter's suit, or None
+ShowScore = namedtuple("ShowScore", ["total", "fifteens", "pairs", "runs", "flush", "nobs"])
+
+WINNING_SCORE = 121
+
 # Idea for front-end - when scoring, highlight cards used in the score to show which cards are being used
 
+class PeggingTracker:
+    """Running count, pair streak and run window for the current play; updated once per card."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+
+    def reset(self) -> None:
+        self.count = 0
+        self.pair_rank = None  # rank of the most recent card
+        self.pair_streak = 0  # number of cards in a row matching `pair_rank`
+        self.run_window = []  # run ranks of cards in the current play, oldest first
+
+
+    def add(self, card: int) -> None:
+        rank = RUN_RANKS[card]
+
+        self.count += CARD_VALUES[card]
+
+        if rank == self.pair_rank:
+            self.pair_streak += 1
+        else:
+            self.pair_rank = rank
+            self.pair_streak = 1
+
+        self.run_window.append(rank)
+
+
+    def run_length(self) -> int:
+        """Length of the longest run (min 3) ending with the most recent card, or 0."""
+
+        # Walk back from most recent card; a run of n cards has n distinct ranks spanning n - 1
+        longest = 0
+        seen = set()
+        low = high = self.run_window[-1] if self.run_window else 0
+        for num_cards, rank in enumerate(reversed(self.run_window), start=1):
+            if rank in seen:
+                break
+            seen.add(rank)
+            low = min(low, rank)
+            high = max(high, rank)
+            if num_cards >= 3 and high - low == num_cards - 1:
+                longest = num_cards
+        
+        return longest
+
+
+    def can_play(self, card: int) -> bool:
+        return self.count + CARD_VALUES[card] <= 31
+
+
 class Player:
     def __init__(self, name="") -> None:
         self.name = name
@@ -18,7 +88,6 @@ class Player:
         self.score = 0
         self.unplayed_cards = []  # For the play
         self.played_cards = []  # For the play
-        self.log = []
     
 
     def __repr__(self) -> str:
@@ -26,7 +95,7 @@ class Player:
 
 
 class State:
-    def __init__(self, room_name: str) -> None:
+    def __init__(self, room_name: str, seed: int|None=None, quiet: bool=False) -> None:
 
         # Room
         self.room_name = room_name
@@ -36,11 +105,19 @@ class State:
         self.MIN_PLAYERS = 2
 
         # Game pieces
-        self.deck = Deck()
+        self.deck = DECK
         self.shuffled_cards = []
         self.players = {}  # Static; {player name: player object}
         self.player_order = []  # Dynamic; adjusted during the play
 
+        # All randomness comes from `rng` so a game can be replayed from its seed; see journal.py
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+
+        # Player-facing log; quiet games keep none, e.g. for simulations; see cribbage_sim.py
+        self.events = EventLog()
+        self.quiet = quiet
+
         self.mode = "start"
         self.in_progress = False
         
@@ -60,36 +137,52 @@ class State:
         self.go = []  # names of players; list for > 2 players
         self.go_scored = False
         self.current_plays = []  # list of Plays for a single play
+        self.pegging = PeggingTracker()  # count, pairs and runs for a single play
         self.all_plays = []  # list of Plays for all plays of round
         self.has_played_show = set() # names of players
     
 
+    def log(self, msg: str, player: str="all") -> None:
+        """Add msg to the game log for everyone or one player, unless the game is quiet."""
+        if not self.quiet:
+            self.events.append(msg, player)
+
+
+    def reseed(self, seed: int) -> None:
+        """Continue with a new seed, e.g. after restoring from a snapshot."""
+        self.seed = seed
+        self.rng.seed(seed)
+
+
     def new_play(self):
         """Reset play variables between rounds of the play."""
-        if len(self.go) > 0:
-            self.current_player = self.go[0]
         self.go = []
         self.go_scored = False
         self.current_plays = []
+        self.pegging.reset()
+
+
+    def add_player(self, name) -> None:
+        """Initializes a player and adds to players dict."""
+        self.players[name] = Player(name)
 
     
     def start_game(self) -> None:
         
         # Validations
         if self.in_progress:
-            print("Cannot start game while a game is in progress.")
+            logger.info("Cannot start game while a game is in progress.")
             return
         
         # Check number of players
         if not (self.MIN_PLAYERS <= len(self.players.keys()) <= self.MAX_PLAYERS):
-            print(f"Need between {self.MIN_PLAYERS} and {self.MAX_PLAYERS} players to begin.")
+            logger.info("Need between %s and %s players to begin.", self.MIN_PLAYERS, self.MAX_PLAYERS)
             return
         
         # Reset game vars
         self.player_order = []
         self.round_num = 0
-        for p_object in self.players.values():
-            p_object.log = []  # Start log as empty list for each player
+        self.events.clear()
 
         # Set player order - eventually should be random
         self.player_order = [p_name for p_name in self.players.keys()]
@@ -116,7 +209,7 @@ class State:
         self.dealer = self.player_order[first_player_index-1]
         
         # Shuffle cards
-        self.shuffled_cards = shuffle_deck(self.deck)
+        self.shuffled_cards = shuffle_deck(self.deck, self.rng)
         
         # Deal and reset player vars
         for p_name, p_object in self.players.items():
@@ -140,37 +233,47 @@ class State:
             p_object.played_cards = []
             p_object.unplayed_cards = []
         
-        # Reset all plays for round
+        # Reset crib, starter and show; reset all plays for round
+        self.crib = []
+        self.starter = None
+        self.has_played_show = set()
         self.all_plays = []
         
         # Reset other play vars that get reset between plays within a round
         self.new_play()
         
-        print(f"--- ROUND {self.round_num} ---\n")
-        print("\n--- DEALING ---")
+        logger.debug("--- ROUND %s --- DEALING ---", self.round_num)
 
         self.start_turn()
 
 
     def end_round(self):
 
-        print_and_log(f"\n--- END OF ROUND {self.round_num} ---\n", self.players)
+        self.log(f"\n--- END OF ROUND {self.round_num} ---\n")
 
         # Start string that will capture total hand scores
-        print_and_log("---     SCORES     ---\n", self.players)
+        self.log("---     SCORES     ---\n")
 
         for player in self.player_order:
-            print_and_log(f"{player}: {self.players[player].score}", self.players)
+            self.log(f"{player}: {self.players[player].score}")
     
         # Check if any player has scored enough to win
-        if any(p_object.score == 121 for p_object in self.players.values()):
-            self.mode = "end_game"
+        if any(p_object.score >= WINNING_SCORE for p_object in self.players.values()):
+            self.end_game()
         
         # No win, continue game. Wait for user input to continue so players have time to view scores.
         else:
             self.mode = "end_round"
 
 
+    def end_game(self) -> None:
+        """Game ends as soon as someone reaches the winning score, even during the play."""
+        winner = max(self.players.values(), key=lambda p_object: p_object.score)
+        self.log(f"\n{winner.name} wins with {winner.score} points!")
+        self.mode = "end_game"
+        self.in_progress = False
+
+
     def start_turn(self):
         # Set vars and complete actions for certain modes
         self.mode_maintenance()
@@ -180,8 +283,21 @@ class State:
 
 
     def end_turn(self) -> None:
-        # Set current player (must happen BEFORE turn num incrementing for current algorithm)
-        self.current_player = self.get_next_player()
+        # Play ends at 31 or when everyone has said go; next play starts after whoever played the last card
+        if self.mode == "play" and (self.pegging.count == 31 or len(self.go) == len(self.player_order)):
+            last_player = self.current_plays[-1].player if self.current_plays else self.current_player
+            self.new_play()
+            self.current_player = self.get_next_player(after=last_player)
+            self.log(f"Play ending, {self.current_player} will start the next play.")
+
+        # Show starts with the first player of the round; dealer is last. Clear the last play
+        # so nobody who said go in it is skipped in the show.
+        elif self.mode == "show" and len(self.has_played_show) == 0:
+            self.new_play()
+            self.current_player = self.first_player
+
+        else:
+            self.current_player = self.get_next_player()
 
         self.start_turn()
 
@@ -191,61 +307,36 @@ class State:
 
         if self.mode == "play":
             # set starter (one-time action when play starts)
-            if self.starter.value == 0:
+            if self.starter is None:
                 self.starter = draw_card(self.shuffled_cards)
-                print_and_log(f"The starter is {self.starter}.", self.players)
+                self.log(f"The starter is {format_card(self.starter)}.")
 
-                if self.starter.rank == "J":
-                    print_and_log(f"The dealer ({self.dealer}) scores 2 points because the starter is a {self.starter}.", self.players)
+                if CARD_RANKS[self.starter] == "J":
+                    self.log(f"The dealer ({self.dealer}) scores 2 points because the starter is a {format_card(self.starter)}.")
                     self.add_score_log(self.dealer, 2, "his heels (starter is a J)")
 
             # Set unplayed_cards
             for player in self.players.values():
                 player.unplayed_cards = [card for card in player.hand if card not in player.played_cards]
 
-            # Reset play vars:
-                # for 31 count after end of play is checked
-                # if all players in round have said go and go has been scored
-            if sum([play.card.value for play in self.current_plays]) == 31 or len(self.player_order) == len(self.go) and self.go_scored:
-                self.new_play()
-                print_and_log(f"Round ending, {self.current_player} will start the next round.", self.players)
-            # 3 total players, 1 is out of cards starting the round - they will actually need to say go and be counted in self.go so this will have the same result
-
         elif self.mode == "show":
             # Reset turn_num to 0 at beginning of show 
             if len(self.has_played_show) == 0:
                 self.turn_num = 0
 
 
-    def get_next_player(self) -> str:
-        """Get the next player."""
-
-        # Make copy of player order since order will be constantly changing during the play.
-        player_order = self.player_order.copy()
-        
-        if self.mode == "play" and len(self.go) > 0:
-            for player in self.go:
-                player_order.remove(player)
-        
-        # Player order must not be empty or there will be modulo by 0 error
-        assert len(player_order) > 0, "Player order should be greater than 0, might have to catch end of play sooner."
+    def get_next_player(self, after: str="") -> str:
+        """Next player in seat order after `after` (default: current player), skipping players who said go."""
 
-        next_player = ""
+        after = after or self.current_player
+        index = self.player_order.index(after)
 
-        # At the end of a round, next player would be first player, but second player is new first player
-        if self.mode == "end_round":
-            first_player_index = self.player_order.index(self.first_player)
-            next_player = player_order[(first_player_index + 1) % len(player_order)]
+        for offset in range(1, len(self.player_order) + 1):
+            next_player = self.player_order[(index + offset) % len(self.player_order)]
+            if next_player not in self.go:
+                return next_player
 
-        # Beginning of show only - make sure show starts with original first player of round
-        elif self.mode == "show" and len(self.has_played_show) == 0:
-            next_player = self.first_player
-        
-        # Otherwise get next player normally using turn number
-        else:
-            next_player = player_order[((self.turn_num + ((self.round_num-1) % len(player_order))) % len(player_order))]
-        
-        return next_player
+        raise AssertionError("Every player has said go; the play should have ended.")
 
 
     # Will have to recreate this on front-end
@@ -259,22 +350,22 @@ class State:
             for p_name in self.player_order:
                 if play.player == p_name:
                     # have to account for 10 (double digits)
-                    if play.card.rank == "10":
-                        msgs_per_player[p_name] += f"{play.card}|"
+                    if CARD_RANKS[play.card] == "10":
+                        msgs_per_player[p_name] += f"{format_card(play.card)}|"
                     else:
-                        msgs_per_player[p_name] += f"{play.card} |"
+                        msgs_per_player[p_name] += f"{format_card(play.card)} |"
                 else:
                     msgs_per_player[p_name] += "   |"
         return msgs_per_player
 
 
-    def score_play(self, played_card: Card, go: bool) -> None:
+    def score_play(self, played_card: int|None, go: bool) -> None:
         
         # On go
         if go:
-            assert len(card) == 0, "Card should not be present if go is True."
+            assert played_card is None, "Card should not be present if go is True."
             self.go.append(self.current_player)
-            print_and_log(f"{self.current_player} has said 'Go'.", self.players)
+            self.log(f"{self.current_player} has said 'Go'.")
             # score a go
             if len(set(self.player_order) - set(self.go)) == 1:
                 player_left = next(iter(set(self.player_order) - set(self.go)))
@@ -283,37 +374,34 @@ class State:
 
         # On playing a card
         else:
-            # Placeholder for `Play` object to be assigned in loop
+            # Placeholder for `Play` object
             play = None
 
-            # Find played card in hand - compare rank and suit to card given
-            for card in self.players[self.current_player].unplayed_cards:
-                if card.suit == played_card.suit and card.rank == played_card.rank:
-                    
-                    # Get played card by removing from player's unplayed list; add to played list
-                    self.players[self.current_player].unplayed_cards.remove(card)
-                    self.players[self.current_player].played_cards.append(card)
-            
-                    # Assign `Play` object
-                    play = Play(self.current_player, card)
-                    
-                    # Break loop on finding card
-                    break
+            # Find played card in hand
+            if played_card in self.players[self.current_player].unplayed_cards:
+
+                # Get played card by removing from player's unplayed list; add to played list
+                self.players[self.current_player].unplayed_cards.remove(played_card)
+                self.players[self.current_player].played_cards.append(played_card)
+        
+                # Assign `Play` object
+                play = Play(self.current_player, played_card)
             
             assert play is not None, "Play must not be None at this point."
 
             # Add to lists: all plays, current plays 
             self.all_plays.append(play)
             self.current_plays.append(play)
+            self.pegging.add(play.card)
 
             # Notify users about play
-            print_and_log(f"{play.player} played: {play.card}.", self.players)
+            self.log(f"{play.player} played: {format_card(play.card)}.")
 
             # Check count for 15, 31
-            if sum([play.card.value for play in self.current_plays]) == 15:
+            if self.pegging.count == 15:
                 self.add_score_log(self.current_player, 2, "a 15")
             
-            elif sum([play.card.value for play in self.current_plays]) == 31:
+            elif self.pegging.count == 31:
                 if self.go_scored:
                     self.add_score_log(self.current_player, 1, "a 31")
                 
@@ -321,31 +409,23 @@ class State:
                     self.add_score_log(self.current_player, 2, "a 31 and a go")
 
             # Check for pairs
-            play_ranks = [play.card.rank for play in self.current_plays]
-            
-            pairs = [play_ranks[-1]]
-            for rank in reversed(play_ranks[:-1]):
-                if rank in pairs:
-                    pairs.append(rank)
-                else:
-                    break
-
-            if len(pairs) == 2:
+            if self.pegging.pair_streak == 2:
                 self.add_score_log(self.current_player, 2, "a pair")
             
-            elif len(pairs) == 3:
+            elif self.pegging.pair_streak == 3:
                 self.add_score_log(self.current_player, 6, "three of a kind")
             
-            elif len(pairs) == 4:
+            elif self.pegging.pair_streak == 4:
                 self.add_score_log(self.current_player, 12, "four of a kind")
             
             # Check for runs (min 3)
-            for i in range(len(play_ranks)-2):
-                if is_run(play_ranks[i:]):
-                    # Need both add score log and print and log to print the exact run
-                    self.add_score_log(self.current_player, len(play_ranks[i:]), "a run")
-                    print_and_log(f"Run: {sorted(play_ranks[i:])}", self.players)
-                    break
+            run_length = self.pegging.run_length()
+            if run_length > 0:
+                run_cards = [play.card for play in self.current_plays[-run_length:]]
+                
+                # Need both add score log and print and log to print the exact run
+                self.add_score_log(self.current_player, run_length, "a run")
+                self.log(f"Run: {format_cards(sorted(run_cards, key=lambda card: RUN_RANKS[card]))}")
             
             # Check for end of round
             if all(len(player.unplayed_cards) == 0 for player in self.players.values()):
@@ -353,71 +433,31 @@ class State:
         
 
     def score_show(self, four_card_hand: list, crib: bool):
-        # check for pairs and runs. 6, 7, 7, 8 -> catch double (or triple) 7, calculate 15s and runs with each of the sevens. can use suit to differentiate
-        show_hand = four_card_hand + [self.starter]
-        
-        # Keep running tally of score; ONLY add once at the end
-        score = 0
+        # Pairs and runs are counted by card, so 6, 7, 7, 8 scores a run with each of the sevens
+        logger.debug("%s = %s; Starter = %s", "Crib" if crib else "Hand", lazy(format_cards, four_card_hand),
+                     lazy(format_card, self.starter))
 
-        if not crib:
-            print(f"Hand = {four_card_hand}")
-        elif crib:
-            print(f"Crib = {four_card_hand}")
-
-        print(f"Starter = {self.starter}\n")
-
-        # Count 15s
-        for i in range(2, len(show_hand)+1):
-            for j in combinations(show_hand, i):
-
-                if sum(card.value for card in j) == 15:
-                    # 15 found; report the cards involved
-                    print_and_log(f"2 points for a 15: {j}.", self.players)
-                    
-                    # Add to tally to score at end
-                    score += 2
-
-        # Count pairs - processes 3 or 4 of a kind as multiples of pairs
-        for cards in combinations(show_hand, 2):
-            if cards[0].rank == cards[1].rank:
-                print_and_log(f"2 points for a pair: {cards}.", self.players)
-                score += 2
+        show_score = score_show_hand(four_card_hand, self.starter, crib)
+
+        # Log each part of the score from the breakdown
+        for fifteen in show_score.fifteens:
+            self.log(f"2 points for a 15: {format_cards(fifteen)}.")
+
+        for pair in show_score.pairs:
+            self.log(f"2 points for a pair: {format_cards(pair)}.")
         
-        # Jack matching suits with starter
-        for card in four_card_hand:
-            if card.rank == "J" and card.suit == self.starter.suit:
-                print_and_log(f"1 point for his knobs ({card} matches the suit of the starter).", self.players)
-                score += 1
+        if show_score.nobs is not None:
+            self.log(f"1 point for his knobs ({format_card(show_score.nobs)} matches the suit of the starter).")
         
-        # Find runs
-        runs = []
-        for i in range(3, len(show_hand)+1):
-            for pot_run in combinations(show_hand, i):
-                if is_run(card.rank for card in pot_run):
-                    runs.append(pot_run)
-
-        # If run was found
-        if len(runs) > 0:
-            max_len = max(len(run) for run in runs)
-            runs = [run for run in runs if len(run) == max_len]
-            for run in runs:
-                print_and_log(f"{len(run)} points for a run: {sorted(run, key=lambda x: x.value)}.", self.players)
-                score += len(run)
+        for run in show_score.runs:
+            self.log(f"{len(run)} points for a run: {format_cards(run)}.")
 
-        # Find flush; process end of show
+        if show_score.flush > 0:
+            self.log(f"{show_score.flush} points for a flush.")
 
-        # Flush - 4 cards for non-crib; 5 cards only for crib
-        if not crib:
-            # Check 5 card flush first
-            if len(set(card.suit for card in show_hand)) == 1:
-                print_and_log("5 points for a flush.", self.players)
-                score += 5
-            # Check 4 card flush - elif implies no 5 card flush
-            elif len(set(card.suit for card in four_card_hand)) == 1:
-                # print_and_log(f"{len(four_card_hand)} points for a flush.", self.players)
-                print_and_log("4 points for a flush.", self.players)
-                score += 4
+        score = show_score.total
 
+        if not crib:
             # END OF SHOW FOR NON-CRIB
 
             # Add total score for show
@@ -428,10 +468,6 @@ class State:
                 self.has_played_show.add(self.current_player)
 
         if crib:
-            if len(set(card.suit for card in show_hand)) == 1:
-                print_and_log(f"5 points for a flush.", self.players)
-                score += 5
-
             # END OF SHOW FOR CRIB
 
             # Add total score for crib
@@ -441,57 +477,16 @@ class State:
             self.has_played_show.add(self.current_player)
 
 
-    # Convert to front-end code
-    def get_user_input(self) -> dict:
-
-                
-        if self.mode == "discard":
-            # Accept inputs from ALL players during discard
-            # num_to_discard = len(self.players[self.current_player].hand) - 4
-            # Check if 
-            print_and_log(f"Please pick {len(self.players[self.current_player].hand) - 4} card(s) to add to the crib. The dealer is {self.dealer}.", self.players)
-            
-        elif self.mode == "play":
-            
-            current_count = sum([play.card.value for play in self.current_plays])
-
-            # If player cannot play a card without exceeding 31, force them to say go
-            if all(current_count + card.value > 31 for card in self.players[self.current_player].unplayed_cards):
-
-                # Everyone else has said go; round should end
-                if len(self.player_order) - len(self.go) == 1:
-                    go_players = ""
-                    for player in self.go:
-                        if len(go_players) == 1:
-                            go_players += " and "
-                        go_players += player
-                    print_and_log(f"{go_players} said 'Go'. You cannot play any more cards.", self.players)
-
-                # Say go but proceed as there are still other players to check for go
-                else:
-                    print_and_log("You cannot play any more cards and must say 'Go'.", self.players)
-
-
-            print(f"Current count: {current_count}")
-
-            # User input should be a card
-            packet = self.user_input_to_packet(action="play", msg=user_input)
+    def cards_to_discard(self, name: str) -> int:
+        """Number of cards the player still has to put in the crib (0 outside the discard)."""
+        if self.mode != "discard":
+            return 0
+        return max(len(self.players[name].hand) - 4, 0)
 
-            # Check if chosen card will put count over 31
-            if len(user_input) > 0 and current_count + self.players[self.current_player].unplayed_cards[int(user_input)-1].value > 31:
-                print("You cannot exceed 31. Please choose another card")
 
-        elif self.mode == "show":
-            # Had action as continue, but I think it could automatically proceed at the end of the play
-            packet = self.user_input_to_packet(action="continue", msg="")
-
-        elif self.mode == "end_round":
-            # Can automate end turns and end rounds
-            pass
-
-        elif self.mode == "end_game":
-            pass
-            # Allow user to start new game
+    def playable_cards(self, name: str) -> list[int]:
+        """Unplayed cards that keep the count at 31 or under; empty means the player must say go."""
+        return [card for card in self.players[name].unplayed_cards if self.pegging.can_play(card)]
 
 
     def update(self, packet: dict):
@@ -516,29 +511,36 @@ class State:
         ### Turn modes: "discard", "play", "show"
 
         elif self.mode == "discard" and packet["action"] == "discard":
-            # Cards to discard can be sent as packet["cards"]
+            # Cards to discard can be sent as packet["cards"]; any player can discard during the discard
+            cards = [unzip_card(card) for card in packet["cards"]]
+            hand = self.players[packet["name"]].hand
+
+            # Must discard exactly the right number of distinct cards from own hand
+            if len(set(cards)) != len(cards) or len(cards) != self.cards_to_discard(packet["name"]) \
+                    or any(card not in hand for card in cards):
+                return "reject"
             
-            # Iterate through cards to discard
-            for discard_card in packet["cards"]:
-                unzipped_card = unzip_card(discard_card)
-                
-                # Iterate through cards in hand
-                for card in self.players[packet["name"]].hand:
-                    
-                    # Check for match in hand
-                    if card.suit == unzipped_card.suit and card.rank == unzipped_card.rank:
-                        
-                        # Remove from hand and add to crib on match
-                        self.crib.append(card)
-                        self.players[self.current_player].hand.remove(card)
-                        break
+            # Remove from hand and add to crib
+            for card in cards:
+                self.crib.append(card)
+                hand.remove(card)
             
-            # Check for end of discard
+            # Check for end of discard; cut the starter and start the play with the first player
             if len(self.crib) == 4:
-                self.mode = "play"                
+                self.mode = "play"
+                self.mode_maintenance()
             
         elif self.mode == "play" and packet["action"] == "play":
-            self.score_play(packet["card"], packet["go"])
+            # Card is not sent when saying go
+            go = packet.get("go", False)
+            played_card = None if go else unzip_card(packet["card"])
+
+            # Can only say go without a playable card, and can only play a playable card
+            playable_cards = self.playable_cards(self.current_player)
+            if (go and len(playable_cards) > 0) or (not go and played_card not in playable_cards):
+                return "reject"
+
+            self.score_play(played_card, go)
 
             if 4*len(self.players.keys()) == len(self.all_plays):
                 self.mode = "show"
@@ -559,6 +561,10 @@ class State:
             else:
                 self.end_turn()
 
+        # Reaching the winning score ends the game right away, even in the middle of the play
+        if self.in_progress and any(p_object.score >= WINNING_SCORE for p_object in self.players.values()):
+            self.end_game()
+
         # If not returned early, move was accepted
         return "accept"
 
@@ -572,7 +578,7 @@ class State:
 
 
     def add_score_log(self, player: str, points: int, reason: str):
-        print_and_log(f"{player} scored {points} for {reason}.", self.players)
+        self.log(f"{player} scored {points} for {reason}.")
         self.players[player].score += points
 
 
@@ -592,6 +598,7 @@ class State:
                 hand_sizes.append(len(self.players[p_name].hand))
 
             elif self.mode == "play":
+                hand_sizes.append(len(self.players[p_name].unplayed_cards))
 
             elif self.mode == "show":
                 final_hands.append(zip_hand(self.players[p_name].hand))
@@ -608,24 +615,88 @@ class State:
             "current_player": self.current_player,  # current player's name
             "hand_sizes": hand_sizes,  # number of cards in each players' hands
             "dealer": self.dealer,  # dealer of round
-            "knocked": self.knocked,  # player who knocked (empty string until a knock)
+            "starter": None if self.starter is None else zip_card(self.starter),  # starter card once cut
             "final_hands": final_hands,  # reveal all hands to all players
-            "final_scores": final_scores,  # reveal all scores to all players
+            "scores": [self.players[p_name].score for p_name in self.player_order],  # scores of all players
+            "count": self.pegging.count,  # count of the current play
+            "plays": [[play.player, zip_card(play.card)] for play in self.current_plays],  # cards in the current play
 
             # Specific to player
             "recipient": player_name,
-            "hand": self.players[player_name].zip_hand(),  # hand for self only
-            "hand_score": self.calc_hand_score(self.players[player_name]),  # hand score for self
-            "log": self.players[player_name].log,  # new log msgs - split up for each player
+            "hand": zip_hand(self.players[player_name].hand),  # hand for self only
+            "log": self.events.unread(player_name),  # new log msgs - split up for each player
         }
     
 
 
-# Other helper functions
-def is_run(potential_run):
-    indices = sorted([["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"].index(card) for card in potential_run])
+# Show scoring engine
+@lru_cache(maxsize=None)
+def rank_breakdown(ranks: tuple[int, ...]) -> tuple[tuple, tuple, tuple]:
+    """
+    Find fifteens, pairs and runs for a sorted tuple of run ranks.
+    
+    Only depends on ranks, so there are at most 6188 distinct 5 card entries. Results are
+    positions in `ranks` so they can be mapped back to the actual cards.
+    """
+
+    positions = range(len(ranks))
+
+    # Count 15s
+    fifteens = []
+    for i in range(2, len(ranks)+1):
+        for combo in combinations(positions, i):
+            if sum(RUN_RANK_VALUES[ranks[j]] for j in combo) == 15:
+                fifteens.append(combo)
+
+    # Count pairs - processes 3 or 4 of a kind as multiples of pairs
+    pairs = [combo for combo in combinations(positions, 2) if ranks[combo[0]] == ranks[combo[1]]]
+
+    # Find runs, keeping only the longest; ranks are sorted so combos are in rank order
+    runs = []
+    for i in range(len(ranks), 2, -1):
+        for combo in combinations(positions, i):
+            if all(ranks[combo[j+1]] - ranks[combo[j]] == 1 for j in range(i-1)):
+                runs.append(combo)
+        if len(runs) > 0:
+            break
+
+    return tuple(fifteens), tuple(pairs), tuple(runs)
+
+
+def score_show_hand(hand: list[int], starter: int, crib: bool) -> ShowScore:
+    """Score a 4 card hand or crib with the starter."""
+
+    # Sort by rank so positions from `rank_breakdown` line up with cards
+    cards = sorted(hand + [starter], key=lambda card: RUN_RANKS[card])
+    fifteens, pairs, runs = rank_breakdown(tuple(RUN_RANKS[card] for card in cards))
+
+    fifteens = tuple(tuple(cards[i] for i in combo) for combo in fifteens)
+    pairs = tuple(tuple(cards[i] for i in combo) for combo in pairs)
+    runs = tuple(tuple(cards[i] for i in combo) for combo in runs)
+    
+    # Flush - 4 cards for non-crib; 5 cards only for crib
+    hand_mask = hand_to_mask(hand)
+    flush = 0
+    if is_flush(hand_mask | (1 << starter)):
+        flush = 5
+    elif not crib and is_flush(hand_mask):
+        flush = 4
+
+    # Jack matching suits with starter
+    nobs = None
+    for card in hand:
+        if CARD_RANKS[card] == "J" and CARD_SUIT_INDEX[card] == CARD_SUIT_INDEX[starter]:
+            nobs = card
+
+    total = 2 * len(fifteens) + 2 * len(pairs) + sum(len(run) for run in runs) + flush + (nobs is not None)
 
-    return all(indices[i+1] - indices[i] == 1 for i in range(len(indices)-1))
+    return ShowScore(total, fifteens, pairs, runs, flush, nobs)
+
+
+# Other helper functions
+def is_flush(hand_mask: int) -> bool:
+    """Check if every card in a hand mask has the same suit."""
+    return any(hand_mask & suit_mask == hand_mask for suit_mask in SUIT_MASKS)
 
 
 ### Notes
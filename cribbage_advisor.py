@@ -0,0 +1,182 @@
+"""Expected value of every crib discard, for cribbage's discard mode.
+
+For a 6 card hand (or 5 cards in a 3 player game) each choice of discard is scored by the
+expected show score of the kept cards over every possible starter, plus or minus the expected
+crib score (plus for your own crib). The crib is scored over every starter and, by default,
+over every set of cards the other players could throw in with yours.
+
+Scores are additive, so the expectation is split instead of scoring every deal:
+    15s, pairs and runs   only depend on ranks; unknown cards are grouped by rank and weighted
+                          by how many of each rank are left, e.g. 455 rank multisets instead
+                          of 45540 (opponent's 2 cards, starter) deals for a 2 player crib.
+                          Points per rank multiset are kept in `RANK_POINTS`.
+    flush and nobs        worked out directly from how many cards of each suit are left.
+
+Results are memoized by a canonical form of the hand (suits relabelled), so hands that only
+differ by suit share an entry:
+    advise_discard(hand, own_crib=True)[0].discard
+"""
+from collections import Counter, namedtuple
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+
+from cards_shared import BINOMIALS, CARD_RANK_INDEX, CARD_SUIT_INDEX, NUM_RANKS, SUITS
+from cribbage import RUN_RANKS, rank_breakdown
+
+# One choice of discard; cards are ints in the caller's suits
+    # hand_ev: expected show score of the kept cards
+    # crib_ev: expected score of the crib the discard goes into
+    # ev: hand_ev + crib_ev for your own crib, hand_ev - crib_ev for an opponent's
+DiscardOption = namedtuple("DiscardOption", ["discard", "keep", "hand_ev", "crib_ev", "ev"])
+
+# Rank multisets are keyed by sum(5 ** rank); at most 4 cards of a rank so keys are unique
+RANK_CODES = tuple(5 ** rank for rank in range(NUM_RANKS))
+
+JACK_RUN_RANK = 10
+
+
+class RankPoints(dict):
+    """15s, pairs and runs for a multiset of run ranks, keyed by its rank code; filled in on first use."""
+
+    def __missing__(self, code: int) -> int:
+        ranks = tuple(rank for rank in range(NUM_RANKS) for _ in range(code // RANK_CODES[rank] % 5))
+        fifteens, pairs, runs = rank_breakdown(ranks)
+
+        points = self[code] = 2 * len(fifteens) + 2 * len(pairs) + sum(len(run) for run in runs)
+        return points
+
+
+RANK_POINTS = RankPoints()
+
+
+def rank_code(cards) -> int:
+    return sum(RANK_CODES[RUN_RANKS[card]] for card in cards)
+
+
+def canonical_hand(hand: list[int]) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """
+    Hand with suits relabelled in a fixed order of their ranks, and the relabelling used as
+    (suit -> canonical suit). Hands that only differ by suit have the same canonical form.
+    """
+    suit_ranks = [sorted(CARD_RANK_INDEX[card] for card in hand if CARD_SUIT_INDEX[card] == suit)
+                  for suit in range(len(SUITS))]
+
+    # Suits with the same ranks are interchangeable, so ties can go in any order
+    suit_order = sorted(range(len(SUITS)), key=lambda suit: (-len(suit_ranks[suit]), suit_ranks[suit]))
+    suit_map = tuple(suit_order.index(suit) for suit in range(len(SUITS)))
+
+    canonical = tuple(sorted(suit_map[CARD_SUIT_INDEX[card]] * NUM_RANKS + CARD_RANK_INDEX[card] for card in hand))
+    return canonical, suit_map
+
+
+# Rank multisets of 1 to 4 unknown cards, precomputed once: [(rank code, ((rank, count), ...))]
+UNKNOWN_RANKS = tuple(
+    tuple((sum(RANK_CODES[rank] for rank in ranks), tuple(Counter(ranks).items()))
+          for ranks in combinations_with_replacement(range(NUM_RANKS), num_cards))
+    for num_cards in range(5)
+)
+
+
+@lru_cache(maxsize=1 << 16)
+def expected_rank_points(known_code: int, hand_code: int, num_unknown: int) -> float:
+    """
+    Expected 15s, pairs and runs for known cards (`known_code`) plus `num_unknown` cards, then a
+    starter, drawn from the cards not in the hand (`hand_code`).
+    """
+    left = [4 - hand_code // RANK_CODES[rank] % 5 for rank in range(NUM_RANKS)]
+    num_left = sum(left)
+
+    # 15s, pairs and runs don't care which card is the starter, so every set of unknown cards
+    # plus starter is one draw of num_unknown + 1 cards; weight each rank multiset by its ways
+    total = 0
+    for unknown_code, counts in UNKNOWN_RANKS[num_unknown + 1]:
+        ways = 1
+        for rank, count in counts:
+            ways *= BINOMIALS[count][left[rank]]
+        if ways:
+            total += ways * RANK_POINTS[known_code + unknown_code]
+
+    return total / BINOMIALS[num_unknown + 1][num_left]
+
+
+def expected_hand(keep: tuple[int, ...], hand_code: int, suits_left: list[int], num_left: int) -> float:
+    """Expected show score of kept cards over every starter."""
+    points = expected_rank_points(rank_code(keep), hand_code, 0)
+
+    # 4 card flush, 5 with a starter of the same suit
+    suit = CARD_SUIT_INDEX[keep[0]]
+    if all(CARD_SUIT_INDEX[card] == suit for card in keep):
+        points += 4 + suits_left[suit] / num_left
+
+    # Nobs: starter has the suit of a kept jack
+    points += sum(suits_left[CARD_SUIT_INDEX[card]] for card in keep if RUN_RANKS[card] == JACK_RUN_RANK) / num_left
+
+    return points
+
+
+def expected_crib(discard: tuple[int, ...], hand_code: int, suits_left: list[int], num_left: int,
+                  jack_suits_left: list[int], others: bool) -> float:
+    """
+    Expected crib score over every starter and, if `others`, every set of cards the other
+    players throw in; otherwise only the discard and the starter are scored.
+    """
+    num_unknown = 4 - len(discard) if others else 0
+    points = expected_rank_points(rank_code(discard), hand_code, num_unknown)
+
+    # Nobs with a jack in the discard; the starter is equally likely to be any card left
+    points += sum(suits_left[CARD_SUIT_INDEX[card]] for card in discard
+                  if RUN_RANKS[card] == JACK_RUN_RANK) / num_left
+
+    if not num_unknown:
+        return points
+
+    # Nobs with a jack from another player: that jack is thrown in, then a starter of its suit
+    points += sum(num_unknown / num_left * (suits_left[suit] - 1) / (num_left - 1) for suit in jack_suits_left)
+
+    # Crib flush needs all 5 cards, starter included, in one suit
+    suit = CARD_SUIT_INDEX[discard[0]]
+    if all(CARD_SUIT_INDEX[card] == suit for card in discard):
+        points += 5 * (BINOMIALS[num_unknown][suits_left[suit]] * max(suits_left[suit] - num_unknown, 0)
+                       / (BINOMIALS[num_unknown][num_left] * (num_left - num_unknown)))
+
+    return points
+
+
+@lru_cache(maxsize=1 << 16)
+def _advise(hand: tuple[int, ...], own_crib: bool, others: bool) -> tuple[DiscardOption, ...]:
+    """Options for a canonical hand, best first."""
+    hand_code = rank_code(hand)
+    suits_left = [NUM_RANKS - sum(CARD_SUIT_INDEX[card] == suit for card in hand) for suit in range(len(SUITS))]
+    num_left = sum(suits_left)
+    jack_suits_left = [suit for suit in range(len(SUITS))
+                       if not any(RUN_RANKS[card] == JACK_RUN_RANK and CARD_SUIT_INDEX[card] == suit for card in hand)]
+
+    options = []
+    for keep in combinations(hand, 4):
+        discard = tuple(card for card in hand if card not in keep)
+        hand_ev = expected_hand(keep, hand_code, suits_left, num_left)
+        crib_ev = expected_crib(discard, hand_code, suits_left, num_left, jack_suits_left, others)
+        options.append(DiscardOption(discard, keep, hand_ev, crib_ev,
+                                     hand_ev + crib_ev if own_crib else hand_ev - crib_ev))
+
+    options.sort(key=lambda option: option.ev, reverse=True)
+    return tuple(options)
+
+
+def advise_discard(hand: list[int], own_crib: bool, others: bool=True) -> list[DiscardOption]:
+    """
+    Every discard from a 5 or 6 card hand, best first. `own_crib` is True for the dealer;
+    `others` also averages over the cards other players throw in (slower on a cache miss).
+    """
+    if len(hand) not in (5, 6) or len(set(hand)) != len(hand):
+        raise ValueError(f"Need 5 or 6 different cards to advise a discard, got {hand}.")
+
+    canonical, suit_map = canonical_hand(hand)
+
+    # Map canonical cards back to the caller's suits
+    suit_unmap = {canonical_suit: suit for suit, canonical_suit in enumerate(suit_map)}
+    def uncanonical(cards):
+        return tuple(suit_unmap[CARD_SUIT_INDEX[card]] * NUM_RANKS + CARD_RANK_INDEX[card] for card in cards)
+
+    return [option._replace(discard=uncanonical(option.discard), keep=uncanonical(option.keep))
+            for option in _advise(canonical, own_crib, others)]
@@ -0,0 +1,273 @@
+"""Headless cribbage self-play.
+
+Bots play whole games through `State.update` (discard to the crib, the play and the show)
+with no Socket.IO and no player logs (`quiet`). Batches of games run in parallel processes
+and their statistics are added up:
+    python cribbage_sim.py --games 20000 --players 2 --policy ev greedy
+
+Reported: hand and crib score distributions, crib points by the ranks thrown into it (for
+your own crib and an opponent's), and pegging points per round by seat relative to the dealer.
+With --validate every move is also packaged for every player and checked.
+
+Games are reproducible: the same --seed and --batch-size give the same results for any
+number of processes.
+"""
+from abc import abstractmethod
+import argparse
+from collections import Counter
+import copy
+from itertools import combinations
+import multiprocessing
+import random
+from time import perf_counter
+
+from cards_shared import CARD_RANKS, CARD_VALUES, hand_to_mask, zip_card
+from cribbage import RUN_RANKS, WINNING_SCORE, PeggingTracker, State, is_flush, rank_breakdown, score_show_hand
+from cribbage_advisor import advise_discard
+from sims_shared import Policy
+
+# Moves without the game ending before it is counted as stalled and abandoned
+MAX_MOVES = 5000
+
+PAIR_POINTS = {2: 2, 3: 6, 4: 12}
+
+
+def pegging_points(tracker: PeggingTracker, card: int) -> int:
+    """Points for playing `card` now, not counting a go or the last card."""
+    trial = copy.copy(tracker)
+    trial.run_window = tracker.run_window.copy()
+    trial.add(card)
+
+    return 2 * (trial.count in (15, 31)) + PAIR_POINTS.get(trial.pair_streak, 0) + trial.run_length()
+
+
+def kept_points(cards: tuple[int, ...]) -> int:
+    """Points in kept cards before the starter is cut: 15s, pairs, runs and a 4 card flush."""
+    cards = sorted(cards, key=lambda card: RUN_RANKS[card])
+    fifteens, pairs, runs = rank_breakdown(tuple(RUN_RANKS[card] for card in cards))
+
+    flush = len(cards) if len(cards) == 4 and is_flush(hand_to_mask(cards)) else 0
+    return 2 * len(fifteens) + 2 * len(pairs) + sum(len(run) for run in runs) + flush
+
+
+class CribbagePolicy(Policy):
+    """`discard` returns cards for the crib, `play` a card or None to say go."""
+
+    @abstractmethod
+    def play(self, game: State, name: str) -> int|None:
+        ...
+
+
+class RandomPolicy(CribbagePolicy):
+    """Random discards and random legal plays."""
+
+    def discard(self, game: State, name: str) -> list[int]:
+        return self.rng.sample(game.players[name].hand, game.cards_to_discard(name))
+
+
+    def play(self, game: State, name: str) -> int|None:
+        playable_cards = game.playable_cards(name)
+        return self.rng.choice(playable_cards) if playable_cards else None
+
+
+class GreedyPolicy(CribbagePolicy):
+    """Keeps the cards worth the most before the cut; plays the card that pegs the most right now."""
+
+    def discard(self, game: State, name: str) -> list[int]:
+        hand = game.players[name].hand
+        keep = max(combinations(hand, 4), key=kept_points)
+        return [card for card in hand if card not in keep]
+
+
+    def play(self, game: State, name: str) -> int|None:
+        playable_cards = game.playable_cards(name)
+        if not playable_cards:
+            return None
+
+        # Of equal points, avoid leaving 5 or 21 (easy 15s and 31s), then lead high
+        return max(playable_cards, key=lambda card: (pegging_points(game.pegging, card),
+                                                     game.pegging.count + CARD_VALUES[card] not in (5, 21),
+                                                     CARD_VALUES[card]))
+
+
+class ExpectedValuePolicy(GreedyPolicy):
+    """Discards for the best expected hand and crib score (see cribbage_advisor); plays like greedy."""
+
+    def discard(self, game: State, name: str) -> list[int]:
+        return list(advise_discard(game.players[name].hand, own_crib=name == game.dealer)[0].discard)
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "ev": ExpectedValuePolicy}
+
+
+def discard_key(cards: list[int]) -> str:
+    """Ranks thrown into the crib, e.g. "5-J"; order doesn't matter."""
+    return "-".join(CARD_RANKS[card] for card in sorted(cards, key=lambda card: RUN_RANKS[card]))
+
+
+def check_state(game: State) -> None:
+    """Package the board for every player and check it; used with --validate."""
+    for p_name in game.players:
+        board = game.package_state(p_name)
+        assert 0 <= board["count"] <= 31, board
+        assert len(game.crib) <= 4, game.crib
+        assert len(board["hand"]) <= 6, board
+        assert game.mode != "show" or len(board["final_hands"]) == len(game.player_order), board
+
+
+def seat_from_dealer(game: State, name: str) -> int:
+    """0 for the dealer, 1 for the player after the dealer and so on."""
+    return (game.player_order.index(name) - game.player_order.index(game.dealer)) % len(game.player_order)
+
+
+def play_game(policies: dict[str, CribbagePolicy], seed: int, stats: Counter, validate: bool=False) -> None:
+    """Play one game to the end; `policies` is {player name: policy} in seat order."""
+    game = State("simulation", seed=seed, quiet=True)
+    for name in policies:
+        game.add_player(name)
+
+    game.update({"action": "start"})
+
+    discards = {}  # {player name: cards} for this round
+    play_start_scores = {}
+    moves = 0
+
+    while game.in_progress:
+        if moves >= MAX_MOVES:
+            stats["stalled"] += 1
+            return
+        moves += 1
+
+        mode = game.mode
+
+        if mode == "discard":
+            name = next(name for name in game.player_order if game.cards_to_discard(name) > 0)
+            cards = policies[name].discard(game, name)
+            discards[name] = cards
+            game.update({"action": "discard", "name": name, "cards": [zip_card(card) for card in cards]})
+
+            # Discard done; starter is cut and the play starts
+            if game.mode == "play":
+                play_start_scores = {name: game.players[name].score for name in game.player_order}
+
+        elif mode == "play":
+            name = game.current_player
+            card = policies[name].play(game, name)
+            game.update({"action": "play", "name": name, "go": card is None,
+                         "card": None if card is None else zip_card(card)})
+
+            # Play done; count the pegging and score the hands once before the show
+            if game.mode == "show":
+                record_round(game, discards, play_start_scores, stats)
+
+        elif mode in ("show", "end_round"):
+            game.update({"action": "continue"})
+
+        if validate:
+            check_state(game)
+
+    stats["games"] += 1
+    winner = max(game.player_order, key=lambda name: game.players[name].score)
+    stats[f"wins_seat_{list(policies).index(winner)}"] += 1
+
+    # Skunked: finished 31 or more points short of the winning score
+    stats["skunks"] += sum(game.players[name].score <= WINNING_SCORE - 31 for name in game.player_order)
+
+
+def record_round(game: State, discards: dict[str, list[int]], play_start_scores: dict[str, int], stats: Counter) -> None:
+    stats["rounds"] += 1
+
+    for name in game.player_order:
+        seat = seat_from_dealer(game, name)
+        stats[f"peg_seat_{seat}"] += game.players[name].score - play_start_scores[name]
+        stats[("hand", score_show_hand(game.players[name].hand, game.starter, crib=False).total)] += 1
+
+    crib_score = score_show_hand(game.crib, game.starter, crib=True).total
+    stats[("crib", crib_score)] += 1
+
+    for name, cards in discards.items():
+        whose = "own" if name == game.dealer else "opponent"
+        stats[("crib_points", whose, discard_key(cards))] += crib_score
+        stats[("crib_rounds", whose, discard_key(cards))] += 1
+
+
+def run_batch(num_games: int, num_players: int, policy_names: tuple[str, ...], seed: int,
+              validate: bool=False) -> Counter:
+    rng = random.Random(seed)
+    policies = {f"bot{seat}": POLICIES[policy_names[seat % len(policy_names)]](rng) for seat in range(num_players)}
+
+    stats = Counter()
+    for _ in range(num_games):
+        play_game(policies, rng.getrandbits(64), stats, validate)
+    return stats
+
+
+def simulate(num_games: int, num_players: int=2, policy_names: tuple[str, ...]=("greedy",),
+             processes: int|None=None, seed: int=0, batch_size: int=500, validate: bool=False) -> Counter:
+    """Play `num_games` games; policies are given to seats in turn."""
+
+    batches = [(min(batch_size, num_games - start), num_players, tuple(policy_names), seed * 1_000_003 + index, validate)
+               for index, start in enumerate(range(0, num_games, batch_size))]
+
+    if processes == 1:
+        results = [run_batch(*batch) for batch in batches]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run_batch, batches)
+
+    return sum(results, Counter())
+
+
+def distribution(stats: Counter, kind: str) -> tuple[float, str]:
+    """Mean and "score: share" for hand or crib scores."""
+    counts = {score: n for key, n in stats.items() if isinstance(key, tuple) and key[0] == kind for score in [key[1]]}
+    total = sum(counts.values()) or 1
+    mean = sum(score * n for score, n in counts.items()) / total
+    return mean, " ".join(f"{score}:{n / total:.1%}" for score, n in sorted(counts.items()) if n / total >= 0.005)
+
+
+def report(stats: Counter, num_players: int, elapsed: float, top: int=5, min_rounds: int=50) -> None:
+    games, rounds = stats["games"], max(stats["rounds"], 1)
+
+    print(f"games            {games} ({games / elapsed:.0f}/s), stalled {stats['stalled']}")
+    print(f"skunked players  {stats['skunks']}")
+    print(f"rounds per game  {stats['rounds'] / max(games, 1):.2f}")
+    print("wins by seat     " + ", ".join(f"{stats[f'wins_seat_{seat}'] / max(games, 1):.1%}"
+                                          for seat in range(num_players)))
+    print("pegging / round  " + ", ".join(f"{'dealer' if seat == 0 else f'dealer+{seat}'} "
+                                          f"{stats[f'peg_seat_{seat}'] / rounds:.2f}" for seat in range(num_players)))
+
+    for kind in ("hand", "crib"):
+        mean, shares = distribution(stats, kind)
+        print(f"{kind} score       mean {mean:.2f}  {shares}")
+
+    for whose in ("own", "opponent"):
+        crib_ev = {key[2]: stats[key] / n for key, n in stats.items()
+                   if isinstance(key, tuple) and key[:2] == ("crib_rounds", whose) and n >= min_rounds
+                   for key in [("crib_points", whose, key[2])]}
+        ranked = sorted(crib_ev.items(), key=lambda item: item[1], reverse=True)
+        print(f"crib EV ({whose} crib), best:  " + ", ".join(f"{cards} {ev:.2f}" for cards, ev in ranked[:top]))
+        print(f"crib EV ({whose} crib), worst: " + ", ".join(f"{cards} {ev:.2f}"
+                                                             for cards, ev in ranked[max(top, len(ranked) - top):]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate cribbage games between bots.")
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3))
+    parser.add_argument("--policy", nargs="+", default=["greedy"], choices=POLICIES,
+                        help="policies given to seats in turn")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--validate", action="store_true", help="package and check the board after every move")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    stats = simulate(args.games, args.players, tuple(args.policy), args.processes, args.seed,
+                     args.batch_size, args.validate)
+    report(stats, args.players, perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Data access for database.db (accounts and rooms).
+
+Each worker keeps a small pool of open connections instead of connecting per request.
+Connections return `sqlite3.Row`s and keep sqlite3's per-connection cache of prepared
+statements, so the fixed queries below are only compiled once per connection.
+
+The pool's first connection in each process switches the database to WAL mode, like the room
+store and session cache do for their files. WAL mode is saved in the database file, so later
+connections don't need to ask again.
+"""
+from contextlib import contextmanager
+import os
+import sqlite3
+
+DATABASE = os.environ.get("DATABASE", "database.db")
+
+
+class ConnectionPool:
+    """Connections for one worker process; a connection is used by one greenlet at a time."""
+
+    def __init__(self, path: str, size: int=4, cached_statements: int=64) -> None:
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.idle = []
+        self.pid = os.getpid()
+        self.wal = False  # set once this process has switched the database to WAL mode
+
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        if not self.wal:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.wal = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+
+        # Connections can't be shared with a forked child
+        if os.getpid() != self.pid:
+            self.idle = []
+            self.pid = os.getpid()
+            self.wal = False
+
+        conn = self.idle.pop() if self.idle else self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+            else:
+                conn.close()
+
+
+pool = ConnectionPool(DATABASE)
+
+
+# -- Users --
+def find_user(username: str) -> sqlite3.Row|None:
+    """Row with id, username, pwhash; username match is case insensitive."""
+    with pool.connection() as conn:
+        return conn.execute("SELECT id, username, pwhash FROM users WHERE username = ?", (username,)).fetchone()
+
+
+def add_user(username: str, pwhash: str, date: int) -> None:
+    """Raises sqlite3.IntegrityError if the username is taken."""
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO users (username, pwhash, date) VALUES (?, ?, ?)", (username, pwhash, date))
+
+
+def get_pwhash(user_id: int) -> str:
+    with pool.connection() as conn:
+        row = conn.execute("SELECT pwhash FROM users WHERE id = ?", (user_id,)).fetchone()
+    return row["pwhash"] if row else ""
+
+
+def set_pwhash(user_id: int, pwhash: str) -> None:
+    with pool.connection() as conn:
+        conn.execute("UPDATE users SET pwhash = ? WHERE id = ?", (pwhash, user_id))
+
+
+# -- Rooms --
+def add_room(name: str, roompw: str, game_name: str, date_created: int, capacity: int, creator: str) -> None:
+    """Raises sqlite3.IntegrityError if a room with the same name (case insensitive) exists."""
+    with pool.connection() as conn:
+        conn.execute("""
+                     INSERT INTO rooms (room, roompw, game, date_created, date_last_used, capacity, creator)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)
+                     """,
+                     (name, roompw, game_name, date_created, date_created, capacity, creator))
+
+
+def load_rooms() -> list[sqlite3.Row]:
+    with pool.connection() as conn:
+        return conn.execute("""
+                            SELECT room, roompw, game, date_created, date_last_used, capacity, creator
+                            FROM rooms
+                            """).fetchall()
+
+
+def touch_rooms(last_used: list[tuple[str, int]]) -> None:
+    """Save (room name, time last used) for each room."""
+    with pool.connection() as conn:
+        conn.executemany("UPDATE rooms SET date_last_used = ? WHERE room = ?",
+                         ((time_last_used, name) for name, time_last_used in last_used))
+
+
+def delete_room(name: str) -> None:
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM rooms WHERE room = ?", (name,))
@@ -1,14 +1,81 @@
 ### Functions shared by all games
+import logging
 
-def print_and_log(msg, players_dict, player="all") -> None:
-    print(msg)
+# Copy of messages shown to players; off unless LOG_LEVELS includes game_log=DEBUG
+game_logger = logging.getLogger("game_log")
 
-    # Send to all clients
-    if player == "all":
-        # Use all players so players receive msg even after knockout
-        for p_object in players_dict.values():
-            p_object.log.append(msg)
 
-    # Send to one specific client
-    else:
-        players_dict[player].log.append(msg)
+# Log entries kept per game; players who fall further behind (e.g. disconnected) miss the oldest
+EVENT_LOG_SIZE = 256
+
+
+class EventLog:
+    """Player-facing game log shared by all players: entries for everyone ("all") or for one
+    player, and a read cursor per player. Sent to clients with the next update.
+
+    Only the last `size` entries are kept for players who fall behind; the list is trimmed once
+    it doubles, so appends stay O(1) (amortized) however many players there are."""
+
+    def __init__(self, size: int=EVENT_LOG_SIZE) -> None:
+        self.size = size
+        self.entries = []  # ("all" or player name, msg)
+        self.first_seq = 0  # sequence number of entries[0]
+        self.cursors = {}  # {player name: sequence number of the first entry not yet sent}
+
+
+    @property
+    def next_seq(self) -> int:
+        return self.first_seq + len(self.entries)
+
+
+    def append(self, msg: str, player: str="all") -> None:
+        game_logger.debug("(%s) %s", player, msg)
+        self.entries.append((player, msg))
+
+        if len(self.entries) >= 2 * self.size:
+            self.first_seq += len(self.entries) - self.size
+            del self.entries[:-self.size]
+
+
+    def unread(self, player: str) -> list[str]:
+        """Msgs for `player` not yet marked read, oldest first."""
+        start = max(self.cursors.get(player, 0) - self.first_seq, 0, len(self.entries) - self.size)
+        return [msg for visible_to, msg in self.entries[start:] if visible_to == "all" or visible_to == player]
+
+
+    def mark_read(self, player: str) -> None:
+        self.cursors[player] = self.next_seq
+
+
+    def clear(self) -> None:
+        self.first_seq = self.next_seq
+        self.entries = []
+
+
+class ChangeTracker:
+    """Board version and fields changed since the last broadcast; lets clients receive only what changed."""
+
+    def __init__(self) -> None:
+        self.version = 0
+        self.fields = set()  # names of public fields in package_state
+        self.hands = set()  # names of players whose hand changed
+
+
+    def mark(self, *fields: str) -> None:
+        self.fields.update(fields)
+
+
+    def mark_hand(self, *players: str) -> None:
+        self.hands.update(players)
+
+
+    def collect(self) -> tuple[set, set]:
+        """Take changed fields and hands; increments version if anything changed."""
+        fields, hands = self.fields, self.hands
+        
+        if len(fields) > 0 or len(hands) > 0:
+            self.version += 1
+        
+        self.fields, self.hands = set(), set()
+        
+        return fields, hands
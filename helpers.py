@@ -1,9 +1,19 @@
+from collections import OrderedDict
 from flask import session, redirect
 from functools import wraps
+import logging
 import random
 import re
-from time import strftime, localtime
-from werkzeug.security import check_password_hash
+from time import strftime, localtime, time
+
+import passwords
+from wire import LobbyRow
+
+logger = logging.getLogger(__name__)
+
+# Sessions that entered a room password correctly are not asked (or hashed) again for this long
+PASSWORD_CACHE_SECONDS = 3600
+PASSWORD_CACHE_SIZE = 64
 
 # Names to randomly assign
 NAMES = ["Henk", "Jenkins", "Stone", "Bubbles", "Pickles", "Skwisgaar", "Gertrude", "Marmaduke", "Geraldine", "Squirrel", "Zacefron", "Ringo", "Thanos"]
@@ -13,8 +23,19 @@ class User:
     def __init__(self, name: str="", session_cookie: str="", sid: str="", connected: bool=False):
         self.name = name
         self.session_cookie = session_cookie
-        self.sid = sid  # A `user` object is unique to a room, so only one sid is needed per `user`
-        self.connected = connected  # Indicate whether user is connected or disconnected
+        self._sid = sid  # A `user` object is unique to a room, so only one sid is needed per `user`
+        self._connected = connected  # Indicate whether user is connected or disconnected
+        self.time_disconnected = time()  # Last time `connected` went from True to False
+        self.room_name = ""  # Set by `Room.add_user`; used to keep the registry in sync
+        self.encoding = "json"  # Wire encoding of the user's socket; see `wire.negotiate`
+
+
+    def __setstate__(self, state: dict) -> None:
+        # Users pickled (by SQLiteStore) before `connected` was a property
+        if "connected" in state:
+            state["_connected"] = state.pop("connected")
+        state.setdefault("time_disconnected", time())
+        self.__dict__.update(state)
 
 
     def __repr__(self) -> str:
@@ -25,6 +46,99 @@ class User:
         return self.name
 
 
+    @property
+    def sid(self) -> str:
+        return self._sid
+
+
+    @sid.setter
+    def sid(self, new_sid: str) -> None:
+        # Re-index user under new sid if user has been added to a room
+        if len(self.room_name) > 0:
+            registry.update_sid(self, old_sid=self._sid, new_sid=new_sid)
+        self._sid = new_sid
+
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+
+    @connected.setter
+    def connected(self, connected: bool) -> None:
+        if self._connected and not connected:
+            self.time_disconnected = time()
+        self._connected = connected
+
+
+class UserRegistry:
+    """Indexes of every user in every room; replaces looping through `Room.users`."""
+
+    def __init__(self) -> None:
+        self.by_sid = {}  # {sid: {room name: User}}
+        self.by_session = {}  # {session cookie: {room name: User}}
+        self.by_name = {}  # {username: {room name: User}}
+        self.by_room_name = {}  # {(room name, username): User}
+
+
+    def add(self, user: User) -> None:
+        if len(user.sid) > 0:
+            self.by_sid.setdefault(user.sid, {})[user.room_name] = user
+        self.by_session.setdefault(user.session_cookie, {})[user.room_name] = user
+        self.by_name.setdefault(user.name, {})[user.room_name] = user
+        self.by_room_name[(user.room_name, user.name)] = user
+
+
+    def remove(self, user: User) -> None:
+        _discard(self.by_sid, user.sid, user)
+        _discard(self.by_session, user.session_cookie, user)
+        _discard(self.by_name, user.name, user)
+        if self.by_room_name.get((user.room_name, user.name)) is user:
+            del self.by_room_name[(user.room_name, user.name)]
+
+
+    def update_sid(self, user: User, old_sid: str, new_sid: str) -> None:
+        _discard(self.by_sid, old_sid, user)
+        if len(new_sid) > 0:
+            self.by_sid.setdefault(new_sid, {})[user.room_name] = user
+
+
+    def find_by_sid(self, sid: str, room_name: str) -> User|None:
+        return self.by_sid.get(sid, {}).get(room_name)
+
+
+    def find_by_session(self, session_cookie: str, room_name: str) -> User|None:
+        return self.by_session.get(session_cookie, {}).get(room_name)
+
+
+    def find_by_name(self, room_name: str, name: str) -> User|None:
+        return self.by_room_name.get((room_name, name))
+
+
+    def rooms_for_session(self, session_cookie: str) -> dict[str, User]:
+        """Returns {room name: User} for every room the session has joined."""
+        return self.by_session.get(session_cookie, {})
+
+
+    def name_taken(self, name: str, session_cookie: str) -> bool:
+        """True if another session is using `name` in any room."""
+        return any(user.session_cookie != session_cookie for user in self.by_name.get(name, {}).values())
+
+
+def _discard(index: dict, key: str, user: User) -> None:
+    """Remove user's room entry from an index, unless it now points at another user; drop the key once it's empty."""
+    users = index.get(key)
+    if users is None or users.get(user.room_name) is not user:
+        return
+    del users[user.room_name]
+    if len(users) == 0:
+        del index[key]
+
+
+# Single registry shared by all rooms
+registry = UserRegistry()
+
+
 class Room:
     def __init__(self, name: str, roompw: str, game_name: str, capacity: int, date_created: int, creator: str):
         self.name = name
@@ -37,32 +151,73 @@ class Room:
 
         # Was storing these in standalone dicts, can move to this class
         self.users = []
+        self.bots = []  # Names of bot players filling empty seats; see thirty_one_bots.py
 
         # An instance of game state - 1 per room
         self.game = None
 
+        # {session cookie: time verified}; oldest first
+        self.verified_sessions = OrderedDict()
+
+
+    def add_user(self, user: User) -> None:
+        """Add user to room and to the registry."""
+        user.room_name = self.name
+        self.users.append(user)
+        registry.add(user)
+
+
+    def remove_user(self, user: User) -> None:
+        """Remove user from room and from the registry."""
+        self.users.remove(user)
+        registry.remove(user)
+
+
+    def password_verified(self, session_cookie: str) -> bool:
+        """True if the session entered the room password correctly recently; it isn't checked again."""
+        verified = self.verified_sessions.get(session_cookie)
+        return verified is not None and time() - verified < PASSWORD_CACHE_SECONDS
+
+
+    def check_password(self, password: str) -> bool:
+        """Hash and compare; doesn't change the room, so it can run outside a room transaction."""
+        # Raises passwords.PoolBusy if too many hashes are queued
+        return passwords.check_hash(self.roompw, password)
+
+
+    def remember_password(self, session_cookie: str) -> None:
+        self.verified_sessions[session_cookie] = time()
+        self.verified_sessions.move_to_end(session_cookie)
+        while len(self.verified_sessions) > PASSWORD_CACHE_SIZE:
+            self.verified_sessions.popitem(last=False)
+
+
+    def touch(self) -> None:
+        """Mark the room as used now; idle rooms are deleted by the reaper (see reaper.py)."""
+        self.time_last_used = int(time())
+
 
     def is_full(self) -> bool:
-        return len(self.users) >= self.capacity
+        return len(self.users) + len(self.bots) >= self.capacity
     
 
     def get_num_connected(self) -> int:
         return len([user for user in self.users if user.connected])
     
     
-    def package_self(self) -> dict:
-        """Put variables to send to client into a dict."""
+    def package_self(self) -> LobbyRow:
+        """Row for this room in the lobby table."""
 
-        return {
-            "name": self.name,
-            "pw_flag": len(self.roompw) != 0,  # True if pw, False if no pw
-            "game_name": self.game_name,
-            "capacity": self.capacity,
-            "date_created": strftime('%D %I:%M %p', localtime(self.date_created)),
-            "creator": self.creator,
-            "clients_connected": self.get_num_connected(),
-            "in_progress": False if not self.game else self.game.in_progress
-        }
+        return LobbyRow(
+            name=self.name,
+            pw_flag=len(self.roompw) != 0,
+            game_name=self.game_name,
+            capacity=self.capacity,
+            date_created=strftime('%D %I:%M %p', localtime(self.date_created)),
+            creator=self.creator,
+            clients_connected=self.get_num_connected(),
+            in_progress=False if not self.game else self.game.in_progress
+        )
 
 
 def login_required(f):
@@ -108,12 +263,6 @@ def get_random_name(exclude: set=set()) -> str:
     return list(rand_names_set)[random.randint(0, len(rand_names_set) - 1)]
 
 
-def dict_factory(cursor, row):
-    """Returns SQL query as a dict."""
-    fields = [column[0] for column in cursor.description]
-    return {key: value for key, value in zip(fields, row)}
-
-
 def to_percent(n: float) -> str:
     """Format as a percentage with 1 decimal place."""
     return f"{(n * 100.0):,.1f}%"
@@ -157,17 +306,12 @@ def validate_name_input(name: str, max_len: str) -> dict[str, str|bool]:
     return response
 
 
-def check_room_password(actual_roompw, user_roompw):        
-    # Check if room password provided is correct
-    return check_password_hash(actual_roompw, user_roompw)
-
-
 def check_username_request(req_username, cookie_to_compare, rooms):
     
     validation = validate_name_input(name=req_username, max_len=12)
 
     if not validation["accepted"]:
-        print(validation["msg"])
+        logger.info(validation["msg"])
         return False
     
     # TODO username validation - check db for duplicate, check existing rooms for duplicate
@@ -177,18 +321,10 @@ def check_username_request(req_username, cookie_to_compare, rooms):
     # On cleanup (every 3 hours?) users who are in DB without a password who were created over 24 hours ago can be deleted. First check if they are currently in any room.
 
     # Check for dupe name in all rooms
-    # This double loop is inefficient -
-        # Can optimize by storing all users not in db in a set to check against
-        # This would eliminate duplicates between rooms
-        # Maybe store all usernames in a db, with temporary flag for those who did not create an account? and temporary entry is deleted .. 24 hours after last disconnect?
-        # When this cleanup is run, rooms not used for 24 hours should also be deleted
-    
-    for room in rooms.values():
-        for user in room.users:
-            # Need to check cookie, otherwise did not allow any rejoin
-            if user.name == req_username and user.session_cookie != cookie_to_compare:
-                print("Canceling Set Username request: username already taken.")
-                return False
+    # Need to check cookie, otherwise did not allow any rejoin
+    if rooms.name_taken(req_username, cookie_to_compare):
+        logger.info("Canceling Set Username request: username already taken.")
+        return False
     
     return True
 
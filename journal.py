@@ -0,0 +1,158 @@
+"""Append-only journal of game moves, and replay.
+
+A game's state only depends on the packets given to `State.update`, the players added to it
+and the seed of its RNG. Those are appended to one file per room (journal/<room>.log), so any
+game can be rebuilt at any move by replaying its journal; no snapshot is needed per move.
+
+Each record is a 4 byte big-endian length followed by a MessagePack array [time, kind, data]:
+    "new"         {"game": game name, "room": room name, "seed": int}   new State for the room
+    "seed"        int       game was restored from a snapshot and continues with this seed
+    "add_player"  name
+    "move"        packet given to `State.update`
+
+Handlers call `record`, which only encodes and queues; a background task appends queued
+records in batches every `flush_interval` seconds, and when the process exits.
+
+Replay a journal from the command line:
+    python journal.py journal/Test_1.log [--move N]
+"""
+import argparse
+import atexit
+import logging
+import os
+import struct
+import threading
+from time import perf_counter, time
+
+import msgspec
+
+import cribbage
+from cards_shared import format_cards
+import thirty_one_game
+
+logger = logging.getLogger(__name__)
+
+GAME_STATES = {"thirty_one": thirty_one_game.State, "cribbage": cribbage.State}
+
+RECORD_LENGTH = struct.Struct(">I")
+
+_encoder = msgspec.msgpack.Encoder()
+
+
+class MoveJournal:
+
+    def __init__(self, directory: str="journal", flush_interval: float=1.0) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pending = {}  # {room name: [encoded records]} not yet written
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+
+    def path(self, room_name: str) -> str:
+        return os.path.join(self.directory, f"{room_name}.log")
+
+
+    def record(self, room_name: str, kind: str, data) -> None:
+        record = _encoder.encode((time(), kind, data))
+        self.pending.setdefault(room_name, []).append(RECORD_LENGTH.pack(len(record)) + record)
+
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            for room_name, records in pending.items():
+                try:
+                    with open(self.path(room_name), "ab") as f:
+                        f.write(b"".join(records))
+                except OSError:
+                    logger.exception("Could not write journal for room %s", room_name)
+
+
+    def run(self, sleep) -> None:
+        """Background task; `sleep` is `socketio.sleep` so this works with eventlet or threads."""
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+
+
+def read_journal(path: str) -> list[tuple[float, str, object]]:
+    """Records in a journal file; a record cut off by a crash ends the journal."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    records = []
+    offset = 0
+    while offset + RECORD_LENGTH.size <= len(data):
+        (length,) = RECORD_LENGTH.unpack_from(data, offset)
+        offset += RECORD_LENGTH.size
+        if offset + length > len(data):
+            break
+        records.append(tuple(msgspec.msgpack.decode(data[offset:offset + length])))
+        offset += length
+
+    if offset != len(data):
+        logger.warning("Journal %s ends with a partial record", path)
+
+    return records
+
+
+def replay(records, move: int|None=None):
+    """Rebuild the game after `move` moves (all moves if None); returns (State or None, moves applied)."""
+    game = None
+    moves = 0
+
+    for _, kind, data in records:
+        if kind == "new":
+            game = GAME_STATES[data["game"]](data["room"], seed=data["seed"])
+            continue
+
+        if game is None:
+            raise ValueError(f"Journal has a `{kind}` record before its game was created.")
+
+        if kind == "seed":
+            game.reseed(data)
+
+        elif kind == "add_player":
+            game.add_player(data)
+
+        elif kind == "move":
+            if move is not None and moves == move:
+                break
+            game.update(data)
+            moves += 1
+
+    return game, moves
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a room's move journal.")
+    parser.add_argument("path", help="journal file, e.g. journal/Test_1.log")
+    parser.add_argument("--move", type=int, default=None, help="stop after this many moves (default: all)")
+    args = parser.parse_args()
+
+    records = read_journal(args.path)
+
+    start = perf_counter()
+    game, moves = replay(records, args.move)
+    elapsed = perf_counter() - start
+
+    if game is None:
+        print("No game in journal.")
+        return
+
+    played = records[-1][0] - records[0][0] if records else 0
+    print(f"Replayed {moves} moves in {elapsed * 1000:.1f} ms (played over {played:.0f} s)")
+    print(f"Round {game.round_num}, mode {game.mode}, current player {game.current_player}")
+    for p_name, p_object in game.players.items():
+        score = getattr(p_object, "lives", getattr(p_object, "score", ""))
+        print(f"  {p_name}: {format_cards(p_object.hand)} ({score})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Lobby table rows kept ready to send, per game.
+
+Packaging a room for the lobby formats its creation date and counts its connected users, so
+the lobby's initial list is built once and kept up to date instead of packaging every room on
+every lobby join. Handlers call `refresh(room)` whenever a room's row can change (created,
+joined, left, game started or ended) and `remove(name)` when it's deleted; only that row is
+repackaged.
+
+With a shared room store other workers change rooms too. `SQLiteStore.versions` gives the
+saved version of each room, and `rows` repackages the rows whose version has moved on since
+they were packaged (or that were refreshed mid-transaction, before their version was saved).
+
+Changes are broadcast by `LobbyBroadcaster`: handlers call `changed(room)` instead of sending
+an update themselves, and a background task sends one `LobbyUpdate` per game every `interval`
+seconds with the latest row of every room that changed. A room that changes several times in
+one interval is sent once, and only to sockets browsing that game's lobby.
+"""
+import logging
+
+from helpers import Room
+from wire import LobbyRow, LobbyUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class LobbyIndex:
+
+    def __init__(self) -> None:
+        self.games = {}  # {game name: {room name: LobbyRow}}
+        self.versions = {}  # {room name: store version the row was packaged at, None if not saved yet}
+
+
+    def refresh(self, room: Room) -> LobbyRow:
+        """Repackage one room's row; returns the new row."""
+        row = room.package_self()
+        self.games.setdefault(room.game_name, {})[room.name] = row
+        self.versions[room.name] = None
+        return row
+
+
+    def remove(self, name: str) -> None:
+        for game_rows in self.games.values():
+            game_rows.pop(name, None)
+        self.versions.pop(name, None)
+
+
+    def get(self, game_name: str, name: str) -> LobbyRow|None:
+        return self.games.get(game_name, {}).get(name)
+
+
+    def fill(self, store) -> None:
+        """Package every room in the store, e.g. on startup."""
+        for room in store.values():
+            if room.game_name:
+                self.refresh(room)
+
+
+    def rows(self, game_name: str, store) -> list[LobbyRow]:
+        """Rows for one game's lobby, checked against the store's saved versions if it has them."""
+        game_rows = self.games.setdefault(game_name, {})
+
+        saved = store.versions(game_name)
+        if saved is not None:
+            for name in [name for name in game_rows if name not in saved]:
+                self.remove(name)
+
+            for name, version in saved.items():
+                if self.versions.get(name, -1) == version:
+                    continue
+                room = store.peek(name)
+                if room:
+                    self.refresh(room)
+                    self.versions[name] = version
+
+        return list(game_rows.values())
+
+
+class LobbyBroadcaster:
+
+    def __init__(self, index: LobbyIndex, send, interval: float=0.25) -> None:
+        self.index = index
+        self.send = send  # send(game name, LobbyUpdate)
+        self.interval = interval
+        self.pending = {}  # {game name: {room names changed or removed}}
+
+
+    def changed(self, room: Room) -> LobbyRow:
+        """Repackage a room's row and queue it for its game's next lobby update."""
+        self.pending.setdefault(room.game_name, set()).add(room.name)
+        return self.index.refresh(room)
+
+
+    def removed(self, game_name: str, name: str) -> None:
+        self.index.remove(name)
+        self.pending.setdefault(game_name, set()).add(name)
+
+
+    def flush(self) -> None:
+        pending, self.pending = self.pending, {}
+
+        for game_name, names in pending.items():
+            rows = {name: self.index.get(game_name, name) for name in sorted(names)}
+            self.send(game_name, LobbyUpdate(room="lobby", rows=[row for row in rows.values() if row],
+                                             removed=[name for name, row in rows.items() if not row]))
+
+
+    def run(self, sleep) -> None:
+        """Background task; `sleep` is `socketio.sleep` so this works with eventlet or threads."""
+        while True:
+            sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not send lobby updates")
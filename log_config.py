@@ -0,0 +1,72 @@
+"""Operator logging for the app.
+
+Modules log through `logging.getLogger(__name__)` with lazy %-style arguments, so messages
+below the configured level cost almost nothing. Records are put on a queue by the handler
+and written out by a listener thread, so a socket handler never waits on stderr.
+
+Levels come from the environment:
+    LOG_LEVEL=INFO                              level for everything not listed below
+    LOG_LEVELS=app=DEBUG,game_log=DEBUG         per-module overrides (logger name=level);
+                                                game_log copies messages shown to players
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Per-event Socket.IO / Engine.IO logging is very chatty; only show problems unless asked
+DEFAULT_LEVELS = {"socketio": "WARNING", "engineio": "WARNING", "werkzeug": "WARNING"}
+
+_listener = None
+
+
+class lazy:
+    """Call `func(*args)` only if the record is written, e.g. logger.debug("%s", lazy(format_cards, hand))."""
+
+    def __init__(self, func, *args) -> None:
+        self.func = func
+        self.args = args
+
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """Parse "name=LEVEL,name=LEVEL" into {name: LEVEL}."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str="", levels: dict[str, str]|None=None) -> None:
+    """Send all logging through a queue to stderr; safe to call more than once."""
+    global _listener
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    levels = {**DEFAULT_LEVELS, **parse_levels(os.environ.get("LOG_LEVELS", "")), **(levels or {})}
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
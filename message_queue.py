@@ -0,0 +1,63 @@
+"""Message queue that lets workers emit to sockets connected to other workers.
+
+Any URL Flask-SocketIO understands (redis://, amqp://, ...) is passed through. A sqlite:///
+URL uses `SQLitePubSubManager`, a local stand-in that needs no extra service: workers on the
+same box append messages to a shared table and poll it for messages from the others.
+"""
+import pickle
+import sqlite3
+from time import time
+
+import socketio
+
+
+def queue_options(url: str) -> dict:
+    """Keyword arguments for `flask_socketio.SocketIO` for a message queue URL ("" for none)."""
+    if len(url) == 0:
+        return {}
+
+    if url.startswith("sqlite:///"):
+        return {"client_manager": SQLitePubSubManager(url, channel="flask-socketio")}
+
+    return {"message_queue": url}
+
+
+class SQLitePubSubManager(socketio.PubSubManager):
+    name = "sqlite"
+
+    def __init__(self, url: str="sqlite:///socketio_queue.db", channel: str="socketio", write_only: bool=False,
+                 logger=None, poll_interval: float=0.02, max_age: int=60):
+        self.path = url[len("sqlite:///"):]
+        self.poll_interval = poll_interval
+        self.max_age = max_age  # Seconds to keep messages around for slow listeners
+
+        self.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS messages (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, created REAL, data BLOB)
+                          """)
+        # Only messages published after this worker started
+        self.last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+
+    def _publish(self, data):
+        cursor = self.conn.execute("INSERT INTO messages (channel, created, data) VALUES (?, ?, ?)",
+                                   (self.channel, time(), pickle.dumps(data)))
+
+        # Clear out old messages every so often
+        if cursor.lastrowid % 1000 == 0:
+            self.conn.execute("DELETE FROM messages WHERE created < ?", (time() - self.max_age,))
+
+
+    def _listen(self):
+        while True:
+            rows = self.conn.execute("SELECT id, data FROM messages WHERE channel = ? AND id > ? ORDER BY id",
+                                     (self.channel, self.last_id)).fetchall()
+            for message_id, data in rows:
+                self.last_id = message_id
+                yield pickle.loads(data)
+
+            self.server.sleep(self.poll_interval)
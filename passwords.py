@@ -0,0 +1,76 @@
+"""Password hashing off the event loop.
+
+`generate_password_hash` and `check_password_hash` are slow on purpose. Calling them inline
+stops every other greenlet in the worker, so they run on a small pool of OS threads instead
+(hashlib releases the GIL while hashing). Under eventlet this is eventlet's tpool; with plain
+threads (flask run, tests) it is a ThreadPoolExecutor.
+
+At most `PASSWORD_HASH_THREADS` hashes run at once and at most `PASSWORD_HASH_QUEUE` more
+wait for a slot. Past that, or after waiting `timeout` seconds, calls raise `PoolBusy` so
+callers can answer "try again" instead of piling up work.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+
+import eventlet.patcher
+import eventlet.tpool
+import werkzeug.security as ws
+
+logger = logging.getLogger(__name__)
+
+
+class PoolBusy(Exception):
+    """Too many password hashes are already running or waiting."""
+
+
+class HashPool:
+
+    def __init__(self, size: int=2, max_waiting: int=32, timeout: float=10.0) -> None:
+        self.size = size
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.waiting = 0
+        self.executor = None
+
+
+    def _execute(self, func, *args):
+        if eventlet.patcher.is_monkey_patched("thread"):
+            return eventlet.tpool.execute(func, *args)
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.size, thread_name_prefix="password-hash")
+        return self.executor.submit(func, *args).result()
+
+
+    def run(self, func, *args):
+        """Run `func(*args)` on the pool; the calling greenlet or thread waits for the result."""
+        if self.waiting >= self.max_waiting + self.size:
+            logger.warning("Password hash pool is full; rejecting request")
+            raise PoolBusy
+
+        self.waiting += 1
+        try:
+            if not self.slots.acquire(timeout=self.timeout):
+                logger.warning("Timed out waiting for the password hash pool")
+                raise PoolBusy
+            try:
+                return self._execute(func, *args)
+            finally:
+                self.slots.release()
+        finally:
+            self.waiting -= 1
+
+
+pool = HashPool(size=int(os.environ.get("PASSWORD_HASH_THREADS", 2)),
+                max_waiting=int(os.environ.get("PASSWORD_HASH_QUEUE", 32)))
+
+
+def generate_hash(password: str) -> str:
+    return pool.run(ws.generate_password_hash, password)
+
+
+def check_hash(pwhash: str, password: str) -> bool:
+    return pool.run(ws.check_password_hash, pwhash, password)
@@ -0,0 +1,104 @@
+"""Frees users and rooms nobody is using, so a long-running worker's memory stays bounded.
+
+Handlers call `Room.touch` on activity. Every `interval` seconds a background task sweeps
+every room:
+    users   disconnected for `user_ttl` seconds are removed from their room (and the user
+            registry), unless they are in a game that is still running
+    rooms   not used for `room_ttl` seconds, with nobody connected, are deleted; `on_delete(room)`
+            lets the app drop what it keeps for the room elsewhere (lobby rows, snapshots, bots)
+Rooms in `keep` (the lobby and test rooms) are never deleted. The last time each room was used
+is saved to the rooms table once per sweep instead of on every move.
+
+Only rooms with something to remove are loaded with `store[name]`, so a shared store doesn't
+save every room on every sweep.
+"""
+from collections import Counter
+import logging
+import sqlite3
+from time import time
+
+import db
+from helpers import Room, registry
+
+logger = logging.getLogger(__name__)
+
+
+class Reaper:
+
+    def __init__(self, store, on_delete, user_ttl: float=600, room_ttl: float=86400, interval: float=60,
+                 keep: set[str]=set()) -> None:
+        self.store = store
+        self.on_delete = on_delete
+        self.user_ttl = user_ttl
+        self.room_ttl = room_ttl
+        self.interval = interval
+        self.keep = keep
+
+        self.saved_last_used = {}  # {room name: time last used saved to the rooms table}
+        self.totals = Counter()  # users and rooms reclaimed since startup
+
+
+    def stale_users(self, room: Room, now: float) -> list:
+        playing = set(room.game.players) if room.game and room.game.in_progress else set()
+        return [user for user in room.users if not user.connected and user.name not in playing
+                and now - user.time_disconnected >= self.user_ttl]
+
+
+    def idle(self, room: Room, now: float) -> bool:
+        return (room.name not in self.keep and now - room.time_last_used >= self.room_ttl
+                and not any(user.connected for user in room.users))
+
+
+    def sweep(self, now: float|None=None) -> Counter:
+        """Remove stale users and idle rooms; returns counts of what was reclaimed."""
+        now = now or time()
+        reclaimed = Counter()
+        last_used = []
+
+        with self.store.transaction():
+            for name in list(self.store.keys()):
+                room = self.store.peek(name)
+                if room is None:
+                    continue
+
+                if self.idle(room, now):
+                    room = self.store[name]
+                    reclaimed["users"] += len(room.users)
+                    reclaimed["rooms"] += 1
+                    for user in list(room.users):
+                        room.remove_user(user)
+                    del self.store[name]
+                    self.saved_last_used.pop(name, None)
+                    self.on_delete(room)
+                    continue
+
+                if self.stale_users(room, now):
+                    room = self.store[name]
+                    for user in self.stale_users(room, now):
+                        room.remove_user(user)
+                        reclaimed["users"] += 1
+
+                if self.saved_last_used.get(name) != room.time_last_used:
+                    last_used.append((name, room.time_last_used))
+
+        try:
+            db.touch_rooms(last_used)
+            self.saved_last_used.update(last_used)
+        except sqlite3.Error:
+            logger.exception("Could not save when rooms were last used")
+
+        self.totals.update(reclaimed)
+        if reclaimed:
+            logger.info("Reaper removed %s users and %s rooms; %s rooms and %s indexed users left",
+                        reclaimed["users"], reclaimed["rooms"], len(self.store.keys()), len(registry.by_room_name))
+        return reclaimed
+
+
+    def run(self, sleep) -> None:
+        """Background task; `sleep` is `socketio.sleep` so this works with eventlet or threads."""
+        while True:
+            sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Could not reap rooms")
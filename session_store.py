@@ -0,0 +1,183 @@
+"""Flask-Session backend: bounded in-memory LRU in front of a SQLite write-behind store.
+
+Plugged in through Flask-Session's cachelib support:
+    app.config["SESSION_TYPE"] = "cachelib"
+    app.config["SESSION_CACHELIB"] = SessionCache("sessions.db")
+
+Reads are served from memory when possible. Writes update memory and are queued; a background
+task (`run`) saves queued writes to SQLite together in one transaction every `flush_interval`
+seconds, and they're saved sooner once `max_pending` writes are waiting, and when the process
+exits. Sessions expire after their timeout; expired rows are deleted from SQLite at most every
+`evict_interval` seconds.
+
+The memory front is per worker and isn't checked against SQLite. With several workers
+(`shared=True`) a client's page request and its game room's socket can land on different
+workers, so every read goes to SQLite and every write is saved at once.
+"""
+import atexit
+from collections import OrderedDict
+import logging
+import pickle
+import sqlite3
+import threading
+from time import time
+
+from cachelib.base import BaseCache
+
+logger = logging.getLogger(__name__)
+
+_DELETED = object()
+
+
+class SessionCache(BaseCache):
+
+    def __init__(self, path: str="sessions.db", capacity: int=10000, default_timeout: int=86400,
+                 flush_interval: float=1.0, max_pending: int=500, evict_interval: float=60.0,
+                 shared: bool=False):
+        super().__init__(default_timeout)
+        # Other workers change sessions too: don't keep them in memory, save every write at once
+        if shared:
+            capacity, max_pending = 0, 1
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.evict_interval = evict_interval
+
+        self.memory = OrderedDict()  # {key: (expires, session dict)}; most recently used last
+        self.pending = {}  # {key: (expires, session dict) or _DELETED} not yet saved to SQLite
+        self.last_evict = 0.0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, expires REAL, data BLOB)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+        atexit.register(self.flush)
+
+
+    def _expires(self, timeout: int|None) -> float:
+        timeout = self._normalize_timeout(timeout)
+        return time() + timeout if timeout > 0 else 0
+
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+
+        # Unsaved entries stay in `pending`, so dropping them from memory loses nothing
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+
+    def _lookup(self, key: str) -> tuple|None:
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            return entry
+
+        entry = self.pending.get(key)
+        if entry is _DELETED:
+            return None
+        if entry is not None:
+            self._remember(key, entry)
+            return entry
+
+        row = self.conn.execute("SELECT expires, data FROM sessions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = (row[0], pickle.loads(row[1]))
+        self._remember(key, entry)
+        return entry
+
+
+    def get(self, key: str):
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires != 0 and expires <= time():
+            self.memory.pop(key, None)
+            return None
+        return dict(value)
+
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+    def set(self, key: str, value, timeout: int|None=None) -> bool:
+        entry = (self._expires(timeout), dict(value))
+        self._remember(key, entry)
+        self.pending[key] = entry
+        self._maybe_flush()
+        return True
+
+
+    def add(self, key: str, value, timeout: int|None=None) -> bool:
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+
+    def delete(self, key: str) -> bool:
+        self.memory.pop(key, None)
+        self.pending[key] = _DELETED
+        self._maybe_flush()
+        return True
+
+
+    def clear(self) -> bool:
+        self.memory.clear()
+        self.pending.clear()
+        self.conn.execute("DELETE FROM sessions")
+        return True
+
+
+    def _maybe_flush(self) -> None:
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """Save queued writes in one transaction and delete expired sessions."""
+        now = time()
+        evict = now - self.last_evict >= self.evict_interval
+
+        if not self.pending and not evict:
+            return
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            upserts = [(key, entry[0], pickle.dumps(entry[1], pickle.HIGHEST_PROTOCOL))
+                       for key, entry in pending.items() if entry is not _DELETED]
+            deletes = [(key,) for key, entry in pending.items() if entry is _DELETED]
+
+            try:
+                with self.conn:
+                    self.conn.execute("BEGIN")
+                    self.conn.executemany("INSERT OR REPLACE INTO sessions (key, expires, data) VALUES (?, ?, ?)", upserts)
+                    self.conn.executemany("DELETE FROM sessions WHERE key = ?", deletes)
+                    if evict:
+                        self.conn.execute("DELETE FROM sessions WHERE expires != 0 AND expires <= ?", (now,))
+            except sqlite3.Error:
+                # Keep writes queued for the next flush; newer writes win
+                self.pending = {**pending, **self.pending}
+                raise
+
+        if evict:
+            self.last_evict = now
+            for key in [key for key, (expires, _) in self.memory.items() if expires != 0 and expires <= now]:
+                del self.memory[key]
+
+
+    def run(self, sleep) -> None:
+        """Background task; `sleep` is `socketio.sleep` so this works with eventlet or threads."""
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Could not save sessions")
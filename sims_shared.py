@@ -0,0 +1,16 @@
+"""Shared by the headless simulators, thirty_one_sim.py and cribbage_sim.py."""
+from abc import ABC, abstractmethod
+import random
+
+
+class Policy(ABC):
+    """Chooses moves for one bot. Each simulator adds its game's other moves as abstract methods;
+    policies draw only from their own `rng` so a seeded batch plays out the same every time."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+
+
+    @abstractmethod
+    def discard(self, game, name: str):
+        """Card(s) `name` gives up: one card int in thirty-one, the cards for the crib in cribbage."""
@@ -0,0 +1,159 @@
+"""Game snapshots saved to SQLite so games survive a worker restart or deploy.
+
+Handlers call `save(room)` after a change; that only encodes the room (MessagePack, cards as
+ints) and queues it, replacing any older queued copy of the same room. A background task
+writes everything queued in one transaction every `flush_interval` seconds, and again when
+the process exits; `delete(name)` queues removing a deleted room's row. On startup the saved
+rooms are rebuilt with all users disconnected, so players get back in through the usual
+session cookie rejoin in `on_prejoin` / `on_join`.
+
+Each row keeps the snapshot format and the game's board version; rows in an old format are
+skipped, and a write never replaces a newer version of the same room.
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+from time import time
+
+import msgspec
+
+from helpers import Room, User
+import thirty_one_game
+
+logger = logging.getLogger(__name__)
+
+# Bump when a snapshot struct changes in a way old rows can't be decoded with
+SNAPSHOT_FORMAT = 1
+
+
+class RoomSnapshot(msgspec.Struct, array_like=True):
+    name: str
+    roompw: str
+    game_name: str
+    capacity: int
+    date_created: int
+    creator: str
+    users: list[tuple[str, str]]  # (name, session cookie)
+    game: thirty_one_game.GameSnapshot|None = None
+    bots: list[str] = []
+    time_last_used: int = 0
+
+
+GAME_STATES = {"thirty_one": thirty_one_game.State}
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(RoomSnapshot)
+
+
+def snapshot_room(room: Room) -> RoomSnapshot:
+    return RoomSnapshot(
+        name=room.name, roompw=room.roompw, game_name=room.game_name, capacity=room.capacity,
+        date_created=room.date_created, creator=room.creator,
+        users=[(user.name, user.session_cookie) for user in room.users],
+        game=room.game.snapshot() if room.game else None,
+        bots=list(room.bots),
+        time_last_used=room.time_last_used
+    )
+
+
+def restore_room(snapshot: RoomSnapshot) -> Room:
+    room = Room(name=snapshot.name, roompw=snapshot.roompw, game_name=snapshot.game_name,
+                capacity=snapshot.capacity, date_created=snapshot.date_created, creator=snapshot.creator)
+
+    for name, session_cookie in snapshot.users:
+        room.add_user(User(name=name, session_cookie=session_cookie, connected=False))
+
+    room.bots = list(snapshot.bots)
+    room.time_last_used = max(snapshot.time_last_used, snapshot.date_created)
+
+    if snapshot.game is not None:
+        room.game = GAME_STATES[snapshot.game_name].from_snapshot(room.name, snapshot.game)
+
+    return room
+
+
+class SnapshotWriter:
+
+    def __init__(self, path: str="snapshots.db", flush_interval: float=1.0) -> None:
+        self.flush_interval = flush_interval
+        self.pending = {}  # {room name: (version, encoded snapshot), or None to delete} not yet saved
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS game_snapshots (
+                          room TEXT PRIMARY KEY, format INTEGER, version INTEGER, saved REAL, data BLOB)
+                          """)
+
+        atexit.register(self.flush)
+
+
+    def save(self, room: Room) -> None:
+        """Queue a snapshot of the room as it is now."""
+        if room.game and room.game_name not in GAME_STATES:
+            return
+
+        version = room.game.changes.version if room.game else 0
+        self.pending[room.name] = (version, _encoder.encode(snapshot_room(room)))
+
+
+    def delete(self, name: str) -> None:
+        """Queue removing a deleted room's snapshot."""
+        self.pending[name] = None
+
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            now = time()
+            try:
+                with self.conn:
+                    self.conn.execute("BEGIN")
+                    self.conn.executemany("DELETE FROM game_snapshots WHERE room = ?",
+                                          ((name,) for name, snapshot in pending.items() if snapshot is None))
+                    self.conn.executemany("""
+                                          INSERT INTO game_snapshots (room, format, version, saved, data)
+                                          VALUES (?, ?, ?, ?, ?)
+                                          ON CONFLICT (room) DO UPDATE SET
+                                          format = excluded.format, version = excluded.version,
+                                          saved = excluded.saved, data = excluded.data
+                                          WHERE excluded.version >= game_snapshots.version
+                                          OR excluded.format != game_snapshots.format
+                                          """,
+                                          ((name, SNAPSHOT_FORMAT, snapshot[0], now, snapshot[1])
+                                           for name, snapshot in pending.items() if snapshot is not None))
+            except sqlite3.Error:
+                # Keep snapshots queued for the next flush; newer ones win
+                self.pending = {**pending, **self.pending}
+                raise
+
+        logger.debug("Saved or deleted %s game snapshots", len(pending))
+
+
+    def run(self, sleep) -> None:
+        """Background task; `sleep` is `socketio.sleep` so this works with eventlet or threads."""
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Could not save game snapshots")
+
+
+    def load(self) -> list[RoomSnapshot]:
+        """Saved snapshots in the current format; rebuild rooms with `restore_room`."""
+        snapshots = []
+        for name, data in self.conn.execute("SELECT room, data FROM game_snapshots WHERE format = ?",
+                                            (SNAPSHOT_FORMAT,)):
+            try:
+                snapshots.append(_decoder.decode(data))
+            except msgspec.DecodeError:
+                logger.warning("Skipping unreadable snapshot of room %s", name)
+
+        return snapshots
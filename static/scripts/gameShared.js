@@ -6,6 +6,54 @@ var discardCard;
 var playerOrder = [];
 var chatLogCount = 0;  // Number of entries in chat log
 let playersConnected = [];  // Keep track of player names connected
+let boardState = null;  // Latest board from server; updates are merged in by version
+
+// Merge a board update into `boardState`. Returns null if the update can't be applied yet.
+function applyBoardUpdate(update) {
+    
+    // Full snapshot replaces the whole board; own hand may come after in a player update
+    if (update.full) {
+        boardState = Object.assign({'hand': [], 'hand_score': 0}, update);
+    }
+
+    // Missed an update (or received one out of order); ask server for a full snapshot
+    // Same version is allowed; means no fields changed
+    else if (boardState === null || update.version > boardState.version + 1 || update.version < boardState.version) {
+        console.log(`Board version gap: have ${boardState === null ? 'none' : boardState.version}, received ${update.version}.`);
+        socket.emit('request_state', {'room': currentRoom});
+        return null;
+    }
+
+    // Only changed fields are sent; everything else stays the same
+    else {
+        Object.assign(boardState, update);
+    }
+
+    // Log msgs come with the player update; don't repeat old ones
+    boardState.log = update.log === undefined ? [] : update.log;
+
+    return boardState;
+}
+
+// Merge a player's own data (hand, hand score, log) into `boardState`.
+function applyPlayerUpdate(update) {
+
+    // No board yet; log msgs are only sent once, so show them now
+    if (boardState === null) {
+        for (const msg of update.log) {
+            addToLog(msg, 'system');
+        }
+        return null;
+    }
+
+    if (update.hand !== undefined) {
+        boardState.hand = update.hand;
+        boardState.hand_score = update.hand_score;
+    }
+    boardState.log = update.log;
+
+    return boardState;
+}
 
 function createLobbyButton() {
     const toLobby = document.createElement('button');
@@ -206,6 +254,7 @@ function updateGameRoom(response) {
         playerOrder = [];
         playersConnected = [];
         mode = '';
+        boardState = null;
         
     }
 
@@ -1,6 +1,10 @@
 // Room, Socket Variables
 // Initializing socket
-const socket = io();
+// Ask for MessagePack payloads if the decoder loaded; server falls back to JSON otherwise
+const wireEncoding = (typeof MessagePack !== 'undefined') ? 'msgpack' : 'json';
+
+// `room` query param lets the router send every request for a game room to the same worker
+const socket = io({'query': {'room': 'lobby'}, 'auth': {'encoding': wireEncoding}});
 // TODO: Add leaveRoom() functions to all nav buttons that direct user to different page
 
 // Client username - assign on connect if not logged into account
@@ -714,29 +718,30 @@ function updateLobby(response) {
         addRooms(response.rooms);
     }
 
-    // Update number of players in a room when a player leaves or joins
-    else if (response.action === 'update_lobby_table') {
+    // Batched changes since the last lobby update: new or changed rows and removed rooms
+    else if (response.action === 'update_rows') {
         
-        // Check that row exists
-        if (document.querySelector('#room-tr-' + response.row) === null) {
-            console.log(`${response.row} does not exist.`);
-            return;
-        }
+        for (const room of response.rows) {
+            // New room
+            if (document.querySelector('#room-tr-' + room.name) === null) {
+                addRooms([room]);
+                continue;
+            }
 
-        // Update number of players
-        if (response.col === 'players') {
-            document.querySelector('#room-td-players-' + response.row).innerText = response.new_value;
-        }
+            // Update number of players
+            document.querySelector('#room-tr-' + room.name).dataset.clientsConnected = room.clients_connected;
+            document.querySelector('#room-td-players-' + room.name).innerText = `${room.clients_connected} / ${room.capacity}`;
 
-        // Update in_progress
-        if (response.col === 'in_progress') {
-            
-            // Update row dataset
-            document.querySelector('#room-tr-' + response.row).dataset.inProgress = response.new_value;
+            // Update in_progress
+            document.querySelector('#room-tr-' + room.name).dataset.inProgress = room.in_progress;
+            document.querySelector('#room-td-in_progress-' + room.name).innerText = room.in_progress;
+        }
 
-            document.querySelector('#room-td-in_progress-' + response.row).innerText = response.new_value;
+        for (const roomName of response.removed) {
+            if (document.querySelector('#room-tr-' + roomName) !== null) {
+                document.querySelector('#room-tr-' + roomName).remove();
+            }
         }
-        
     }
 }
 
@@ -1090,6 +1095,20 @@ async function leaveRoom(username, room) {
     }
 }
 
+// With several workers, reconnect socket so that the new room's worker receives its events
+function routeSocket(room) {
+    if (!stickyRooms || socket.io.opts.query.room === room) {
+        return Promise.resolve();
+    }
+
+    socket.io.opts.query.room = room;
+
+    return new Promise(resolve => {
+        socket.once('connect', resolve);
+        socket.disconnect().connect();
+    });
+}
+
 // This should only be called AFTER all join validations.
 // Previous room must be left in order to join new room
     // so failing a validation on join at this point will leave user in liminal space
@@ -1103,6 +1122,9 @@ function leaveAndJoin(username, newRoom) {
             // On successful leave, teardown will be requested by server
             console.log(`Successfully left ${currentRoom}.`);
 
+            return routeSocket(newRoom);
+        })
+        .then(() => {
             joinRoom(newRoom, username);
 
             // Close all open modals (and clear all inputs)
@@ -1116,8 +1138,18 @@ function leaveAndJoin(username, newRoom) {
         });
 }
 
+// MessagePack payloads arrive as binary; JSON payloads are already objects
+function decodePayload(data) {
+    if (data instanceof ArrayBuffer) {
+        return MessagePack.decode(new Uint8Array(data));
+    }
+    return data;
+}
+
 // Updating lobby
 socket.on('update_lobby', data => {
+    data = decodePayload(data);
+
     // For debug:
     console.log(`Client received 'update_lobby' event: ${JSON.stringify(data)}.`);
     
@@ -1134,12 +1166,37 @@ socket.on('update_gameroom', data => {
 
 // Updating game state
 socket.on('update_board', data => {
+    data = decodePayload(data);
+
     // For debug:
     console.log(`Client received 'update_board' event: ${JSON.stringify(data)}.`);
 
-    if (data.game === 'thirty_one') {
+    // Server only sends changed fields to the whole room; merge into full board before updating display
+    const board = applyBoardUpdate(data);
+    if (board === null) {
+        return;
+    }
+
+    if (board.game === 'thirty_one') {
         // Old updateGameRoom
-        updateThirtyOne(data);
+        updateThirtyOne(board);
+    }
+});
+
+// Updating player's own hand and log
+socket.on('update_player', data => {
+    data = decodePayload(data);
+
+    // For debug:
+    console.log(`Client received 'update_player' event: ${JSON.stringify(data)}.`);
+
+    const board = applyPlayerUpdate(data);
+    if (board === null) {
+        return;
+    }
+
+    if (board.game === 'thirty_one') {
+        updateThirtyOne(board);
     }
 });
 
@@ -1171,6 +1228,7 @@ socket.on('reconnect', (attempt) => {
 
 // Receiving log / chat messages
 socket.on('chat_log', data => {
+    data = decodePayload(data);
     addToLog(data.msg, data.sender);
 });
 
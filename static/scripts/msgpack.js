@@ -0,0 +1,91 @@
+// MessagePack decoder for payloads from wire.py (msgspec), served with the app instead of from a CDN
+// Maps become objects, bin becomes Uint8Array; ext types are never sent and are rejected
+const MessagePack = (() => {
+    const textDecoder = new TextDecoder();
+
+    function decode(bytes) {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        let pos = 0;
+
+        function str(length) {
+            const value = textDecoder.decode(bytes.subarray(pos, pos + length));
+            pos += length;
+            return value;
+        }
+
+        function bin(length) {
+            const value = bytes.slice(pos, pos + length);
+            pos += length;
+            return value;
+        }
+
+        function array(length) {
+            const value = new Array(length);
+            for (let i = 0; i < length; i++) {
+                value[i] = read();
+            }
+            return value;
+        }
+
+        function map(length) {
+            const value = {};
+            for (let i = 0; i < length; i++) {
+                const key = read();
+                value[key] = read();
+            }
+            return value;
+        }
+
+        // Reads a big-endian number of `size` bytes and moves past it
+        function num(getter, size) {
+            const value = view[getter](pos);
+            pos += size;
+            return value;
+        }
+
+        function read() {
+            const type = bytes[pos++];
+
+            if (type <= 0x7f) return type;                      // positive fixint
+            if (type <= 0x8f) return map(type & 0x0f);          // fixmap
+            if (type <= 0x9f) return array(type & 0x0f);        // fixarray
+            if (type <= 0xbf) return str(type & 0x1f);          // fixstr
+            if (type >= 0xe0) return type - 0x100;              // negative fixint
+
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: return bin(num('getUint8', 1));
+                case 0xc5: return bin(num('getUint16', 2));
+                case 0xc6: return bin(num('getUint32', 4));
+                case 0xca: return num('getFloat32', 4);
+                case 0xcb: return num('getFloat64', 8);
+                case 0xcc: return num('getUint8', 1);
+                case 0xcd: return num('getUint16', 2);
+                case 0xce: return num('getUint32', 4);
+                case 0xcf: return Number(num('getBigUint64', 8));
+                case 0xd0: return num('getInt8', 1);
+                case 0xd1: return num('getInt16', 2);
+                case 0xd2: return num('getInt32', 4);
+                case 0xd3: return Number(num('getBigInt64', 8));
+                case 0xd9: return str(num('getUint8', 1));
+                case 0xda: return str(num('getUint16', 2));
+                case 0xdb: return str(num('getUint32', 4));
+                case 0xdc: return array(num('getUint16', 2));
+                case 0xdd: return array(num('getUint32', 4));
+                case 0xde: return map(num('getUint16', 2));
+                case 0xdf: return map(num('getUint32', 4));
+            }
+            throw new Error(`Unsupported MessagePack type 0x${type.toString(16)} at byte ${pos - 1}`);
+        }
+
+        const value = read();
+        if (pos !== bytes.length) {
+            throw new Error(`Extra bytes after MessagePack value at byte ${pos}`);
+        }
+        return value;
+    }
+
+    return {decode};
+})();
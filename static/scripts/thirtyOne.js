@@ -130,6 +130,30 @@ function createMoveButtons() {
     }
     
     newGameButtonContainer.appendChild(newGameButton);
+
+    // Bots fill empty seats; only before a game starts
+    const addBotButton = document.createElement('button');
+
+    addBotButton.className = 'move-button';
+    addBotButton.id = 'add-bot-button';
+    addBotButton.innerText = 'Add Bot';
+
+    addBotButton.onclick = () => {
+        socket.emit('add_bot', {'room': currentRoom, 'username': username});
+    }
+
+    const removeBotButton = document.createElement('button');
+
+    removeBotButton.className = 'move-button';
+    removeBotButton.id = 'remove-bot-button';
+    removeBotButton.innerText = 'Remove Bot';
+
+    removeBotButton.onclick = () => {
+        socket.emit('remove_bot', {'room': currentRoom, 'username': username});
+    }
+
+    newGameButtonContainer.appendChild(addBotButton);
+    newGameButtonContainer.appendChild(removeBotButton);
     
     tempButtonContainer.appendChild(continueButtonContainer);
     tempButtonContainer.appendChild(newGameButtonContainer);
@@ -311,15 +335,17 @@ function updateThirtyOne(response) {
             document.querySelector('#knock-button').disabled = false;
         }
         
-        // Disable start button when game in progress; Enable when not in progress
-        document.querySelector('#start-button').disabled = inProgress;
-        if (inProgress) {
-            // Hide start button when game in progress
-            document.querySelector('#start-button').style.display = 'none';
-        }
-        else {
-            // Unhide start button when game not in progress
-            document.querySelector('#start-button').style.display = '';
+        // Disable start and bot buttons when game in progress; Enable when not in progress
+        for (const buttonId of ['#start-button', '#add-bot-button', '#remove-bot-button']) {
+            document.querySelector(buttonId).disabled = inProgress;
+            if (inProgress) {
+                // Hide button when game in progress
+                document.querySelector(buttonId).style.display = 'none';
+            }
+            else {
+                // Unhide button when game not in progress
+                document.querySelector(buttonId).style.display = '';
+            }
         }
         
         // Enable continue button on round end (and NOT on game end)
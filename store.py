@@ -0,0 +1,320 @@
+"""Where rooms (with their users and game state) live between socket events.
+
+`InProcessStore` is a plain dict of rooms; it's the default and only works with one worker.
+`SQLiteStore` keeps a pickled copy of each room in a SQLite database (WAL mode) so that
+several workers on one box can share rooms. Pick one with `create_store`, e.g. from the
+ROOM_STORE environment variable: "memory" or "sqlite:///rooms.db".
+"""
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from helpers import Room, registry
+
+
+def worker_for_room(room_name: str, num_workers: int) -> int:
+    """Worker that owns a room; stable across restarts so a room always goes to the same worker."""
+    return zlib.crc32(room_name.encode()) % num_workers
+
+
+def create_store(url: str="memory"):
+    if url == "memory":
+        return InProcessStore()
+
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+
+    raise ValueError(f"Unknown room store `{url}`; use `memory` or `sqlite:///<path>`.")
+
+
+class InProcessStore(dict):
+    """{room name: Room} held in this process."""
+
+    def transaction(self):
+        return nullcontext()
+
+
+    def transactional(self, f):
+        return f
+
+
+    def after_commit(self, f, *args, **kwargs) -> None:
+        f(*args, **kwargs)
+
+
+    def deferred(self, f):
+        return f
+
+
+    def name_taken(self, name: str, session_cookie: str) -> bool:
+        return registry.name_taken(name, session_cookie)
+
+
+    def peek(self, name: str) -> Room|None:
+        return self.get(name)
+
+
+    def versions(self, game_name: str) -> None:
+        """No saved versions; every change is made in this process."""
+        return None
+
+
+class SQLiteStore:
+    """Rooms shared between processes through a SQLite database.
+
+    Socket handlers run inside `transaction` (see `transactional`), which holds the database's
+    write lock, so events for a room are applied one at a time across all workers. Every room
+    read with `store[name]` during a transaction is saved when it ends; use `peek` to only look.
+    Each worker keeps the last copy of a room it loaded or saved and only unpickles again if
+    another worker has saved a newer version; with sticky routing a room's worker nearly always
+    has it cached.
+
+    The write lock should only be held to load, change and save rooms. Calls wrapped with
+    `deferred` (the app wraps `socketio.emit`) are held until the transaction commits, and slow
+    work such as password hashing is done before opening one. A worker waiting for the lock
+    sleeps between tries rather than in SQLite's busy handler, which would block its event loop.
+    """
+
+    lock_timeout = 10.0  # seconds to wait for another worker's transaction
+    lock_retry = 0.005
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS room_state (
+                          name TEXT PRIMARY KEY, game_name TEXT, version INTEGER, data BLOB)
+                          """)
+        self.conn.execute("""
+                          CREATE TABLE IF NOT EXISTS room_users (
+                          room TEXT, name TEXT, session_cookie TEXT, PRIMARY KEY (room, name))
+                          """)
+        # From here on only BEGIN IMMEDIATE waits for other workers; see `_begin`
+        self.conn.execute("PRAGMA busy_timeout=0")
+
+        self.cache = {}  # {room name: (version, Room)}
+        self.touched = {}  # {room name: Room} read or added during the open transaction
+        self.on_commit = []  # (f, args, kwargs) deferred until the open transaction commits
+        self.depth = 0
+        self.owner = None  # thread (or greenlet) running the open transaction
+        self.lock = threading.RLock()
+
+
+    def __getitem__(self, name: str) -> Room:
+        if name in self.touched:
+            return self.touched[name]
+
+        room = self._load(name)
+        if room is None:
+            raise KeyError(name)
+
+        if self.depth > 0:
+            self.touched[name] = room
+        return room
+
+
+    def __setitem__(self, name: str, room: Room) -> None:
+        with self.transaction():
+            self.touched[name] = room
+
+
+    def __delitem__(self, name: str) -> None:
+        with self.transaction():
+            if name not in self:
+                raise KeyError(name)
+
+            room = self.touched.pop(name, None) or self._load(name)
+            self.cache.pop(name, None)
+            for user in room.users:
+                registry.remove(user)
+
+            self.conn.execute("DELETE FROM room_state WHERE name = ?", (name,))
+            self.conn.execute("DELETE FROM room_users WHERE room = ?", (name,))
+
+
+    def __contains__(self, name: str) -> bool:
+        if name in self.touched:
+            return True
+        return self.conn.execute("SELECT 1 FROM room_state WHERE name = ?", (name,)).fetchone() is not None
+
+
+    def get(self, name: str, default=None) -> Room|None:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+
+    def setdefault(self, name: str, room: Room) -> Room:
+        with self.transaction():
+            if name in self:
+                return self[name]
+            self[name] = room
+            return room
+
+
+    def keys(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("SELECT name FROM room_state")]
+
+
+    def values(self) -> list[Room]:
+        """Current copy of every room; for display only since these are not saved."""
+        rooms = []
+        for name in self.keys():
+            room = self.peek(name)
+            if room:
+                rooms.append(room)
+        return rooms
+
+
+    def peek(self, name: str) -> Room|None:
+        """Current copy of a room without adding it to the transaction, so it isn't saved."""
+        return self.touched.get(name) or self._load(name)
+
+
+    def versions(self, game_name: str) -> dict[str, int]:
+        """{room name: saved version} for one game's rooms."""
+        return dict(self.conn.execute("SELECT name, version FROM room_state WHERE game_name = ?", (game_name,)))
+
+
+    def name_taken(self, name: str, session_cookie: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM room_users WHERE name = ? AND session_cookie != ? LIMIT 1",
+                                 (name, session_cookie)).fetchone() is not None
+
+
+    @contextmanager
+    def transaction(self):
+        committed = []
+        with self.lock:
+            if self.depth == 0:
+                self._begin()
+                self.owner = threading.get_ident()
+            self.depth += 1
+            try:
+                yield
+            except BaseException:
+                if self.depth == 1:
+                    self.conn.execute("ROLLBACK")
+                    # In-memory copies may have been changed; reload them next time
+                    for name, room in self.touched.items():
+                        self.cache.pop(name, None)
+                        for user in room.users:
+                            registry.remove(user)
+                    self.touched = {}
+                    self.on_commit = []
+                raise
+            else:
+                if self.depth == 1:
+                    self._save_touched()
+                    self.conn.execute("COMMIT")
+                    committed, self.on_commit = self.on_commit, []
+            finally:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.owner = None
+
+        for f, args, kwargs in committed:
+            f(*args, **kwargs)
+
+
+    def transactional(self, f):
+        """Decorate a socket handler to run it in a transaction.
+
+        Loads the event's room first so the user registry matches the stored room; the room is
+        only saved if the handler reads it with `store[name]`.
+        """
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with self.transaction():
+                if args and isinstance(args[0], dict) and args[0].get("room"):
+                    self.peek(args[0]["room"])
+                return f(*args, **kwargs)
+
+        return decorated_function
+
+
+    def after_commit(self, f, *args, **kwargs) -> None:
+        """Call `f` once this thread's open transaction commits (never if it rolls back), else now."""
+        if self.depth > 0 and self.owner == threading.get_ident():
+            self.on_commit.append((f, args, kwargs))
+        else:
+            f(*args, **kwargs)
+
+
+    def deferred(self, f):
+        """Wrap `f` so calls made during a transaction wait for it to commit; see `after_commit`."""
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            self.after_commit(f, *args, **kwargs)
+
+        return decorated_function
+
+
+    def _begin(self) -> None:
+        # `time.sleep` is green under eventlet, so other greenlets run while this one waits
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(self.lock_retry)
+
+
+    def _load(self, name: str) -> Room|None:
+        row = self.conn.execute("SELECT version FROM room_state WHERE name = ?", (name,)).fetchone()
+        cached = self.cache.get(name)
+
+        # Deleted, possibly by another worker's reaper; drop our copy and its users
+        if row is None:
+            if cached:
+                del self.cache[name]
+                for user in cached[1].users:
+                    registry.remove(user)
+            return None
+
+        if cached and cached[0] == row[0]:
+            return cached[1]
+
+        version, data = self.conn.execute("SELECT version, data FROM room_state WHERE name = ?", (name,)).fetchone()
+        room = pickle.loads(data)
+
+        # Point registry at the new copy of the room's users
+        if cached:
+            for user in cached[1].users:
+                registry.remove(user)
+        for user in room.users:
+            registry.add(user)
+
+        self.cache[name] = (version, room)
+        return room
+
+
+    def _save_touched(self) -> None:
+        for name, room in self.touched.items():
+            row = self.conn.execute("SELECT version FROM room_state WHERE name = ?", (name,)).fetchone()
+            version = row[0] + 1 if row else 1
+
+            self.conn.execute("""
+                              INSERT INTO room_state (name, game_name, version, data) VALUES (?, ?, ?, ?)
+                              ON CONFLICT (name) DO UPDATE SET version = excluded.version, data = excluded.data
+                              """,
+                              (name, room.game_name, version, pickle.dumps(room, pickle.HIGHEST_PROTOCOL)))
+
+            self.conn.execute("DELETE FROM room_users WHERE room = ?", (name,))
+            self.conn.executemany("INSERT OR REPLACE INTO room_users (room, name, session_cookie) VALUES (?, ?, ?)",
+                                  ((name, user.name, user.session_cookie) for user in room.users))
+
+            self.cache[name] = (version, room)
+
+        self.touched = {}
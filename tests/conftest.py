@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Modules live at the repo root; same as the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards_shared import zip_card
+import thirty_one_game
+
+
+def random_packet(game: thirty_one_game.State, rng: random.Random) -> dict:
+    """A move for the current player; about one in ten is one the game should reject."""
+    name = game.current_player
+    if rng.random() < 0.1:
+        return {"action": rng.choice(["continue", "pickup", "discard"]), "name": name, "card": zip_card(rng.randrange(52))}
+    if game.mode == "end_round":
+        return {"action": "continue", "name": name}
+    if game.mode == "main_phase":
+        return {"action": rng.choice(["draw", "draw", "pickup", "knock"]), "name": name}
+    return {"action": "discard", "name": name, "card": zip_card(rng.choice(game.players[name].hand))}
+
+
+@pytest.fixture
+def thirty_one_moves():
+    """Plays a seeded game of thirty-one with random moves; yields (game, packet, result) after each move, starting with "start"."""
+
+    def play(seed: int, num_players: int=3, max_moves: int=2000):
+        rng = random.Random(seed)
+        game = thirty_one_game.State("test", seed=seed)
+        for n in range(num_players):
+            game.add_player(f"player{n}")
+
+        packet = {"action": "start", "name": game.current_player}
+        for _ in range(max_moves):
+            yield game, packet, game.update(packet)
+            if not game.in_progress:
+                return
+            packet = random_packet(game, rng)
+
+    return play
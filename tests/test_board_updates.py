@@ -0,0 +1,39 @@
+"""Board updates with only the changed fields, merged the way the client does (gameShared.js), add up to the full board."""
+import msgspec
+import pytest
+
+from thirty_one_game import PUBLIC_FIELDS
+
+
+def merge(board: dict, update) -> dict:
+    if update.full:
+        board = {}
+    for field in PUBLIC_FIELDS:
+        value = getattr(update, field)
+        if value is not msgspec.UNSET:
+            board[field] = value
+    return board
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_merged_updates_match_the_full_board(thirty_one_moves, seed):
+    board, version = {}, 0
+    for game, packet, result in thirty_one_moves(seed):
+        # Nothing is sent for a rejected move; changes carry over to the next accepted one
+        if result == "reject":
+            continue
+
+        fields, _ = game.changes.collect()
+        new_game = packet["action"] == "start"
+        update = game.package_public(PUBLIC_FIELDS if new_game else fields, full=new_game)
+
+        # Same version means nothing changed
+        assert update.version in (version, version + 1)
+        assert update.version == version or fields
+        version = update.version
+
+        board = merge(board, update)
+        full = game.package_public(PUBLIC_FIELDS, full=True)
+        assert board == {field: getattr(full, field) for field in PUBLIC_FIELDS}, packet
+
+    assert not game.in_progress
@@ -0,0 +1,86 @@
+"""Show scoring (`cribbage.score_show_hand`) against known hands and a brute-force count."""
+from itertools import combinations
+import random
+
+from cards_shared import CARD_RANKS, CARD_SUIT_INDEX, CARD_VALUES, unzip_card
+from cribbage import RUN_RANKS, score_show_hand
+
+
+def cards(codes: str) -> list[int]:
+    return [unzip_card(code) for code in codes.split()]
+
+
+def brute_force_score(hand: list[int], starter: int, crib: bool) -> int:
+    """Count every combination directly, the way it's done at the table."""
+    all_cards = hand + [starter]
+    points = 0
+
+    for size in range(2, 6):
+        for combo in combinations(all_cards, size):
+            if sum(CARD_VALUES[card] for card in combo) == 15:
+                points += 2
+
+    for a, b in combinations(all_cards, 2):
+        if RUN_RANKS[a] == RUN_RANKS[b]:
+            points += 2
+
+    # Only the longest runs count, once for each way of making them
+    for size in (5, 4, 3):
+        runs = []
+        for combo in combinations(all_cards, size):
+            ranks = sorted(RUN_RANKS[card] for card in combo)
+            if ranks == list(range(ranks[0], ranks[0] + size)):
+                runs.append(combo)
+        if runs:
+            points += size * len(runs)
+            break
+
+    if len({CARD_SUIT_INDEX[card] for card in all_cards}) == 1:
+        points += 5
+    elif not crib and len({CARD_SUIT_INDEX[card] for card in hand}) == 1:
+        points += 4
+
+    points += any(CARD_RANKS[card] == "J" and CARD_SUIT_INDEX[card] == CARD_SUIT_INDEX[starter] for card in hand)
+    return points
+
+
+def test_29_hand():
+    score = score_show_hand(cards("5H 5D 5C JS"), unzip_card("5S"), crib=False)
+    assert score.total == 29
+    assert (len(score.fifteens), len(score.pairs), score.runs, score.flush) == (8, 6, (), 0)
+    assert score.nobs == unzip_card("JS")
+
+
+def test_double_run():
+    # 3-4-5 twice (6), the pair of 4s (2) and 5+K (2)
+    score = score_show_hand(cards("3H 4D 4C 5S"), unzip_card("KH"), crib=False)
+    assert len(score.runs) == 2 and all(len(run) == 3 for run in score.runs)
+    assert len(score.pairs) == 1
+    assert score.total == 10
+
+
+def test_four_card_flush_counts_in_the_hand_but_not_the_crib():
+    hand, starter = cards("2H 4H 6H 8H"), unzip_card("KS")
+    assert score_show_hand(hand, starter, crib=False).flush == 4
+    assert score_show_hand(hand, starter, crib=True).flush == 0
+
+
+def test_five_card_flush_counts_in_the_hand_and_the_crib():
+    hand, starter = cards("2H 4H 6H 8H"), unzip_card("KH")
+    assert score_show_hand(hand, starter, crib=False).flush == 5
+    assert score_show_hand(hand, starter, crib=True).flush == 5
+
+
+def test_nobs_needs_the_jack_of_the_starters_suit():
+    assert score_show_hand(cards("JH 2S 4D 8C"), unzip_card("QH"), crib=True).nobs == unzip_card("JH")
+    assert score_show_hand(cards("JH 2S 4D 8C"), unzip_card("QS"), crib=True).nobs is None
+    # A jack turned up as the starter is his heels (scored at the cut), not nobs
+    assert score_show_hand(cards("2H 3S 4D 8C"), unzip_card("JH"), crib=False).nobs is None
+
+
+def test_matches_brute_force_on_random_hands():
+    rng = random.Random(4)
+    for _ in range(3000):
+        dealt = rng.sample(range(52), 5)
+        hand, starter, crib = dealt[:4], dealt[4], rng.random() < 0.5
+        assert score_show_hand(hand, starter, crib).total == brute_force_score(hand, starter, crib), (hand, starter, crib)
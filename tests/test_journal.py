@@ -0,0 +1,86 @@
+"""Replaying a room's move journal rebuilds the same game, at the end or at any move."""
+import msgspec
+import pytest
+
+from cards_shared import zip_card
+from journal import MoveJournal, read_journal, replay
+import thirty_one_game
+
+
+def board(game: thirty_one_game.State) -> thirty_one_game.GameSnapshot:
+    # Replay doesn't broadcast, so its board version never moves
+    return msgspec.structs.replace(game.snapshot(), version=0)
+
+
+def journal_game(journal: MoveJournal, game: thirty_one_game.State) -> None:
+    journal.record(game.room_name, "new", {"game": "thirty_one", "room": game.room_name, "seed": game.seed})
+    for name in game.players:
+        journal.record(game.room_name, "add_player", name)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_replay_reaches_the_same_game_at_every_move(thirty_one_moves, tmp_path, seed):
+    journal = MoveJournal(str(tmp_path))
+    boards = []
+    for n, (game, packet, _) in enumerate(thirty_one_moves(seed)):
+        if n == 0:
+            journal_game(journal, game)
+        # Rejected moves are journaled too, as app.py does, since they can add log msgs
+        journal.record(game.room_name, "move", packet)
+        boards.append(board(game))
+    journal.flush()
+
+    records = read_journal(journal.path(game.room_name))
+    replayed, moves = replay(records)
+    assert moves == len(boards)
+    assert board(replayed) == boards[-1]
+
+    for move in range(1, len(boards), 7):
+        replayed, moves = replay(records, move=move)
+        assert moves == move
+        assert board(replayed) == boards[move - 1]
+
+
+def test_replay_follows_a_restore_with_a_new_seed(thirty_one_moves, tmp_path):
+    journal = MoveJournal(str(tmp_path))
+    for n, (game, packet, _) in enumerate(thirty_one_moves(seed=1)):
+        if n == 0:
+            journal_game(journal, game)
+        journal.record(game.room_name, "move", packet)
+        if n == 20:
+            break
+
+    # Restart: the game comes back from its snapshot with a fresh seed, which is journaled
+    game = thirty_one_game.State.from_snapshot(game.room_name, game.snapshot())
+    game.reseed(7)
+    journal.record(game.room_name, "seed", 7)
+    round_num = game.round_num
+    for n in range(60):
+        if game.mode == "main_phase":
+            packet = {"action": "knock" if n % 5 == 0 and not game.knocked else "draw"}
+        elif game.mode == "end_round":
+            packet = {"action": "continue"}
+        else:
+            packet = {"action": "discard", "card": zip_card(game.players[game.current_player].hand[-1])}
+        journal.record(game.room_name, "move", packet)
+        game.update(dict(packet))
+    journal.flush()
+    # New rounds are dealt from the new seed
+    assert game.round_num > round_num
+
+    replayed, _ = replay(read_journal(journal.path(game.room_name)))
+    assert board(replayed) == board(game)
+
+
+def test_partial_record_ends_the_journal(tmp_path):
+    journal = MoveJournal(str(tmp_path))
+    journal.record("room", "new", {"game": "thirty_one", "room": "room", "seed": 3})
+    journal.record("room", "add_player", "player0")
+    journal.flush()
+    with open(journal.path("room"), "ab") as f:
+        f.write(b"\x00\x00\x00\x40\x93")
+
+    records = read_journal(journal.path("room"))
+    assert [kind for _, kind, _ in records] == ["new", "add_player"]
+    game, moves = replay(records)
+    assert list(game.players) == ["player0"] and moves == 0
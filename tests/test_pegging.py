@@ -0,0 +1,67 @@
+"""`cribbage.PeggingTracker` against a recount of the whole play after every card."""
+import random
+
+from cards_shared import CARD_VALUES, unzip_card
+from cribbage import RUN_RANKS, PeggingTracker
+
+
+def trailing_pairs(ranks: list[int]) -> int:
+    streak = 1
+    while streak < len(ranks) and ranks[-streak - 1] == ranks[-1]:
+        streak += 1
+    return streak
+
+
+def trailing_run(ranks: list[int]) -> int:
+    """Longest run of 3+ made by the last n cards, checking every n."""
+    for size in range(len(ranks), 2, -1):
+        last = sorted(ranks[-size:])
+        if last == list(range(last[0], last[0] + size)):
+            return size
+    return 0
+
+
+def play(codes: str) -> PeggingTracker:
+    tracker = PeggingTracker()
+    for code in codes.split():
+        tracker.add(unzip_card(code))
+    return tracker
+
+
+def test_runs_out_of_order():
+    assert play("4H 2S 3D").run_length() == 3
+    assert play("4H 2S 3D AC").run_length() == 4
+    assert play("4H 2S 3D AC 5C").run_length() == 5
+
+
+def test_run_broken_by_a_pair():
+    assert play("2S 3D 3H 4C").run_length() == 0
+    assert play("2S 3D 4C 3H").run_length() == 0
+    # Aces are low: Q-K-A is not a run
+    assert play("QS KD AC").run_length() == 0
+
+
+def test_pair_streak():
+    tracker = play("7H 7S 7D")
+    assert (tracker.pair_rank, tracker.pair_streak, tracker.count) == (RUN_RANKS[unzip_card("7H")], 3, 21)
+    tracker.add(unzip_card("8C"))
+    assert tracker.pair_streak == 1
+
+
+def test_matches_recount_on_random_plays():
+    rng = random.Random(5)
+    for _ in range(300):
+        tracker = PeggingTracker()
+        played = []
+        for card in rng.sample(range(52), 52):
+            if not tracker.can_play(card):
+                assert sum(CARD_VALUES[c] for c in played) + CARD_VALUES[card] > 31
+                tracker.reset()
+                played = []
+            tracker.add(card)
+            played.append(card)
+
+            ranks = [RUN_RANKS[c] for c in played]
+            assert tracker.count == sum(CARD_VALUES[c] for c in played)
+            assert tracker.pair_streak == trailing_pairs(ranks)
+            assert tracker.run_length() == trailing_run(ranks), ranks
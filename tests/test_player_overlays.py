@@ -0,0 +1,34 @@
+"""The shared board plus each player's overlay, as sent by app.send_update, is that player's full board."""
+import msgspec
+import pytest
+
+from thirty_one_game import PUBLIC_FIELDS
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_board_and_overlay_match_package_state(thirty_one_moves, seed):
+    board, hands = {}, {}
+    for game, packet, result in thirty_one_moves(seed):
+        if result == "reject":
+            continue
+
+        fields, changed_hands = game.changes.collect()
+        new_game = packet["action"] == "start"
+        update = game.package_public(PUBLIC_FIELDS if new_game else fields, full=new_game)
+        if new_game:
+            board = {}
+        board.update({field: getattr(update, field) for field in PUBLIC_FIELDS
+                      if getattr(update, field) is not msgspec.UNSET})
+
+        for name in game.players:
+            expected = game.package_state(name)
+            overlay = game.package_private(name, include_hand=new_game or name in changed_hands)
+            if overlay.hand is not msgspec.UNSET:
+                hands[name] = (overlay.hand, overlay.hand_score)
+
+            assert {field: board[field] for field in PUBLIC_FIELDS} == \
+                   {field: getattr(expected, field) for field in PUBLIC_FIELDS}
+            assert hands[name] == (expected.hand, expected.hand_score), (name, packet)
+            assert overlay.log == expected.log
+            game.events.mark_read(name)
+            assert game.package_private(name).log == []
@@ -0,0 +1,105 @@
+"""Game snapshots: `snapshot` → `from_snapshot` and a room through `SnapshotWriter` come back the same."""
+from time import time
+
+import msgspec
+import pytest
+
+from cards_shared import zip_card
+from helpers import Room, User
+from snapshots import RoomSnapshot, SnapshotWriter, restore_room, snapshot_room
+import thirty_one_game
+
+
+def same_boards(game: thirty_one_game.State, restored: thirty_one_game.State) -> bool:
+    return all(game.package_state(name) == restored.package_state(name) for name in game.players)
+
+
+def game_after(moves, seed: int, num_moves: int) -> thirty_one_game.State:
+    for n, (game, _, _) in enumerate(moves(seed)):
+        if n == num_moves:
+            break
+    game.changes.collect()
+    return game
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_restored_game_matches_at_every_move(thirty_one_moves, seed):
+    for game, _, _ in thirty_one_moves(seed):
+        game.changes.collect()
+        snapshot = game.snapshot()
+        encoded = msgspec.msgpack.encode(snapshot)
+        restored = thirty_one_game.State.from_snapshot(game.room_name,
+                                                       msgspec.msgpack.decode(encoded, type=thirty_one_game.GameSnapshot))
+
+        assert same_boards(game, restored)
+        assert restored.snapshot() == snapshot
+
+
+def test_restored_game_plays_on_the_same(thirty_one_moves):
+    game = game_after(thirty_one_moves, seed=1, num_moves=25)
+    restored = thirty_one_game.State.from_snapshot(game.room_name, game.snapshot())
+
+    # A restored game has a fresh rng; with the same seed both deal and reshuffle the same
+    game.reseed(99)
+    restored.reseed(99)
+    round_num = game.round_num
+    for n in range(200):
+        if not game.in_progress:
+            break
+        if game.mode == "main_phase":
+            packet = {"action": "knock" if n % 5 == 0 and not game.knocked else "draw"}
+        elif game.mode == "end_round":
+            packet = {"action": "continue"}
+        else:
+            packet = {"action": "discard", "card": zip_card(game.players[game.current_player].hand[0])}
+        assert game.update(dict(packet)) == restored.update(dict(packet))
+        assert same_boards(game, restored)
+
+    assert game.round_num > round_num
+
+
+def make_room(game: thirty_one_game.State) -> Room:
+    room = Room(name=game.room_name, roompw="pw", game_name="thirty_one", capacity=4,
+                date_created=int(time()), creator="player0")
+    for name in game.players:
+        room.add_user(User(name=name, session_cookie=f"cookie_{name}"))
+    room.bots = ["player2"]
+    room.game = game
+    return room
+
+
+def test_writer_round_trip(thirty_one_moves, tmp_path):
+    room = make_room(game_after(thirty_one_moves, seed=2, num_moves=30))
+    writer = SnapshotWriter(str(tmp_path / "snapshots.db"))
+    writer.save(room)
+    writer.flush()
+
+    [snapshot] = SnapshotWriter(str(tmp_path / "snapshots.db")).load()
+    assert snapshot == snapshot_room(room)
+
+    restored = restore_room(snapshot)
+    assert (restored.name, restored.roompw, restored.capacity, restored.creator, restored.bots) == \
+           (room.name, room.roompw, room.capacity, room.creator, room.bots)
+    assert [(user.name, user.session_cookie, user.connected) for user in restored.users] == \
+           [(user.name, user.session_cookie, False) for user in room.users]
+    assert same_boards(room.game, restored.game)
+
+    writer.delete(room.name)
+    writer.flush()
+    assert writer.load() == []
+
+
+def test_writer_keeps_the_newer_version(thirty_one_moves, tmp_path):
+    room = make_room(game_after(thirty_one_moves, seed=3, num_moves=30))
+    writer = SnapshotWriter(str(tmp_path / "snapshots.db"))
+    writer.save(room)
+    writer.flush()
+
+    # An older copy of the room written late, e.g. by another worker
+    stale = make_room(game_after(thirty_one_moves, seed=3, num_moves=10))
+    writer.save(stale)
+    writer.flush()
+
+    [snapshot] = writer.load()
+    assert isinstance(snapshot, RoomSnapshot)
+    assert snapshot.game.version == room.game.changes.version
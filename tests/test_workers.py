@@ -0,0 +1,80 @@
+"""Two workers' room stores and message queues on the same files, in one process."""
+import json
+from time import time
+
+import socketio
+
+from helpers import Room, User, registry
+from message_queue import SQLitePubSubManager
+from store import SQLiteStore
+
+
+class RecordingServer(socketio.Server):
+    """Keeps the events it sends instead of writing them to a socket."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sent = []  # (event name, data)
+
+
+    def _send_eio_packet(self, eio_sid, eio_pkt) -> None:
+        # Socket.IO EVENT packets are encoded as '2["event", data]'
+        self.sent.append(tuple(json.loads(eio_pkt.data[1:])))
+
+
+def make_room(name: str) -> Room:
+    return Room(name=name, roompw="", game_name="thirty_one", capacity=7, date_created=int(time()), creator="test")
+
+
+def test_room_changed_in_one_store_is_reloaded_by_the_other(tmp_path):
+    store_0 = SQLiteStore(str(tmp_path / "rooms.db"))
+    store_1 = SQLiteStore(str(tmp_path / "rooms.db"))
+
+    store_0["table"] = make_room("table")
+    cached = store_1.peek("table")
+    assert cached.capacity == 7
+    assert store_1.peek("table") is cached  # unchanged, so not unpickled again
+
+    with store_0.transaction():
+        store_0["table"].add_user(User(name="bob", session_cookie="cookie_bob"))
+        store_0["table"].capacity = 5
+
+    room = store_1.peek("table")
+    assert room is not cached
+    assert room.capacity == 5
+    assert [user.name for user in room.users] == ["bob"]
+    assert registry.find_by_session("cookie_bob", "table") is room.users[0]
+    assert store_1.versions("thirty_one") == store_0.versions("thirty_one") == {"table": 2}
+
+
+def test_room_deleted_in_one_store_is_dropped_by_the_other(tmp_path):
+    store_0 = SQLiteStore(str(tmp_path / "rooms.db"))
+    store_1 = SQLiteStore(str(tmp_path / "rooms.db"))
+
+    room = make_room("table")
+    room.add_user(User(name="bob", session_cookie="cookie_bob"))
+    store_0["table"] = room
+    assert store_1.peek("table") is not None
+
+    del store_0["table"]
+    assert store_1.peek("table") is None
+    assert "table" not in store_1
+    assert registry.find_by_session("cookie_bob", "table") is None
+
+
+def test_emit_in_one_worker_reaches_a_client_of_the_other(tmp_path):
+    url = f"sqlite:///{tmp_path / 'queue.db'}"
+    server_0 = socketio.Server(async_mode="threading", client_manager=SQLitePubSubManager(url))
+    server_1 = RecordingServer(async_mode="threading", client_manager=SQLitePubSubManager(url))
+    sid = server_1.manager.connect("client_eio_sid", "/")
+    server_1.enter_room(sid, "table")
+
+    server_0.emit("update_board", {"version": 3}, to="table")
+    server_0.emit("chat_log", {"msg": "elsewhere"}, to="other_room")
+
+    # What server_1's listener thread does with each message it reads from the queue
+    messages = server_1.manager._listen()
+    for _ in range(2):
+        server_1.manager._handle_emit(next(messages))
+
+    assert server_1.sent == [("update_board", {"version": 3})]
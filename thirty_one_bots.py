@@ -0,0 +1,121 @@
+"""Bot players for Thirty-One, to fill empty seats.
+
+A bot joins a game with `State.add_player` and moves through `State.update` like anyone else;
+`move` gives the packet for its turn. Every decision is an expected value over the cards the
+bot hasn't seen, looked up in the hand score tables, so a move takes well under a millisecond:
+    pickup or draw    pick up the discard if the best hand with it is worth at least the
+                      average best hand after drawing an unseen card
+    knock             with `knock_at` points or more (fewer needed against more players) once
+                      drawing isn't expected to gain much
+    discard           keep the best 3 cards; of equal options, the ones expected to score best
+                      after the next draw
+
+Seen cards are kept incrementally: `observe` must be called after every update of the game, and
+only adds the top of the discard pile. Every discard is on top right after it is made, so that
+covers the whole pile. A new round, a reshuffled deck or a bot that missed updates (e.g. after a
+restart) starts again from the hand and the discard pile.
+"""
+from cards_shared import NUM_CARDS, hand_to_mask, zip_card
+from thirty_one_game import ACE_HIGH_VALUES, State, hand_score
+
+# Knock with this many points or more, by number of players left in the round; tuned with
+# thirty_one_sim.py against greedy bots
+KNOCK_AT = {2: 26, 3: 25, 4: 24}
+KNOCK_AT_MANY = 23
+
+# Don't knock if a draw or the discard is expected to add this much
+KNOCK_MAX_GAIN = 2.0
+
+BOT_NAMES = ["Ada", "Bender", "Clippy", "Data", "Eliza", "Hal", "Marvin", "Robby", "Tars", "Wall_E"]
+
+
+def bot_name(taken: set[str]) -> str:
+    """First bot name not taken in the room."""
+    for name in BOT_NAMES:
+        name = f"{name}_bot"
+        if name not in taken:
+            return name
+    return f"Bot_{len(taken)}"
+
+
+class SeenCards:
+    """Cards one player knows are not in the deck this round: their hand and all discards."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.round = None  # (game seed, round number, reshuffles) the mask is for
+        self.mask = 0
+
+
+    def observe(self, game: State) -> None:
+        if self.round != (game.seed, game.round_num, game.reshuffles):
+            self.round = (game.seed, game.round_num, game.reshuffles)
+            self.mask = hand_to_mask(game.discard)
+
+        elif game.discard:
+            self.mask |= 1 << game.discard[-1]
+
+        self.mask |= hand_to_mask(game.players[self.name].hand)
+
+
+    def unseen(self) -> list[int]:
+        return [card for card in range(NUM_CARDS) if not self.mask >> card & 1]
+
+
+def average_draw(hand: list[int], unseen: list[int]) -> float:
+    """Average best score of `hand` plus one card drawn from `unseen`."""
+    if not unseen:
+        return hand_score(hand)
+    return sum(hand_score(hand + [card]) for card in unseen) / len(unseen)
+
+
+class ThirtyOneBot:
+
+    def __init__(self, name: str, knock_at: int|None=None) -> None:
+        self.name = name
+        self.knock_at = knock_at  # None picks from KNOCK_AT by number of players
+        self.seen = SeenCards(name)
+
+
+    def observe(self, game: State) -> None:
+        self.seen.observe(game)
+
+
+    def move(self, game: State) -> dict:
+        """Packet for the bot's turn; only call when it is the current player."""
+        if game.mode == "discard":
+            return {"action": "discard", "card": zip_card(self.discard(game))}
+        return {"action": self.main_phase(game)}
+
+
+    def main_phase(self, game: State) -> str:
+        """"draw", "pickup" or "knock"."""
+        self.observe(game)
+
+        hand = game.players[self.name].hand
+        score = hand_score(hand)
+        draw_value = average_draw(hand, self.seen.unseen())
+        pickup_value = hand_score(hand + [game.discard[-1]]) if game.discard else 0
+
+        knock_at = self.knock_at or KNOCK_AT.get(len(game.player_order), KNOCK_AT_MANY)
+        if not game.knocked and score >= knock_at and max(draw_value, pickup_value) - score < KNOCK_MAX_GAIN:
+            return "knock"
+
+        # An empty deck is refilled from the discard pile on the next draw (see State.reshuffle_discard)
+        if game.discard and pickup_value >= draw_value:
+            return "pickup"
+        return "draw"
+
+
+    def discard(self, game: State) -> int:
+        """Card to throw away from a 4 card hand."""
+        self.observe(game)
+
+        hand = game.players[self.name].hand
+        unseen = self.seen.unseen()
+
+        def keep_value(card: int) -> tuple:
+            keep = [c for c in hand if c != card]
+            return hand_score(keep), average_draw(keep, unseen), -ACE_HIGH_VALUES[card]
+
+        return max(hand, key=keep_value)
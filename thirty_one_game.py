@@ -1,510 +1,758 @@
-import random
-
-from cards_shared import *
-from games_shared import *
-
-# TODO - what happens when deck runs out of cards?
-
-# Set ace value
-RANK_TO_VALUE["A"] = 11
-
-
-class Player:
-    def __init__(self, name: str) -> None:
-        self.name = name
-        self.order = 0
-        self.hand = []
-        self.lives = 3  # debug = score starts at 1  # Score starts at 3
-        self.log = []  # Individual logs per player
-
-    
-    def __repr__(self) -> str:
-        return f"{Player(self.name)}"
-
-
-class State:
-    def __init__(self, room_name: str) -> None:
-        
-        # modes : start, main_phase, discard
-            # end_round - requires user input
-            # end_game - do not require user input
-
-        # Room
-        self.room_name = room_name
-        
-        # Room constants
-        self.MAX_PLAYERS = 7
-        self.MIN_PLAYERS = 2
-
-        # Game pieces
-        self.deck = Deck()
-        self.shuffled_cards = []
-        self.hand_size = 3
-        self.players = {}  # Static; {player name: player object}
-        self.player_order = []  # Dynamic; adjusted when player gets knocked out
-
-        # Gameplay
-        self.mode = "start"
-        self.in_progress = False
-
-        # Rounds
-        self.round_num = 0
-        self.turn_num = 0
-        self.first_player = ""  # player name
-        self.current_player = ""  # player name
-        self.dealer = ""  # player name
-        self.knocked = ""  # player name
-        self.blitzed_players = []  # player names; technically possible for more than 1 blitz
-        self.discard = []
-        self.free_ride_alts = ["getting a free ride", "on the bike", "on the dole", "riding the bus", "barely hanging on", "having a tummy ache", "having a long day"]
-        
-
-    def hand_to_discard(self, card_to_discard: Card) -> None:
-        """Find selected card in hand and move from hand to discard."""
-
-        # Find in card in hand by comparing suit and rank
-        for card in self.players[self.current_player].hand:
-            if card.suit == card_to_discard.suit and card.rank == card_to_discard.rank:
-                # Remove from hand
-                self.players[self.current_player].hand.remove(card)
-                break
-        
-        # Add to discard
-        self.discard.append(card_to_discard)
-
-        # 'debug' log the actual card discarded; don't send to players
-        print(f"{self.current_player} discarded: {card_to_discard}")
-
-
-    def find_discard_on_blitz(self) -> Card:
-        """Find card to automatically discard on a blitz."""
-        
-        # Either one card out of suit, or lowest card of a hand that only has one suit
-        discard_card = None
-        
-        suits = {}
-        for card in self.players[self.current_player].hand:
-            if card.suit in suits.keys():
-                suits[card.suit].append(card)
-            else:
-                suits[card.suit] = [card]
-        
-        # Len 1 means only suit; find lowest card
-        if len(suits.keys()) == 1:
-            discard_card = min(self.players[self.current_player].hand, key = lambda x: x.value)
-        
-        # Len 2 means find the odd suit with only one card
-        else:
-            for card_list in suits.values():
-                if len(card_list) == 1:
-                    discard_card = card_list[0]
-        
-        return discard_card
-
-
-    def calc_hand_score(self, player_object:Player) -> int:
-        """Calculate the highest score of a player's hand."""
-
-        # Return if hand is empty
-        if len(player_object.hand) == 0:
-            print("Cannot calc hand score; Hand empty.")
-            return 0
-        
-        # List of score dict for each group of three
-        hand_scores = []
-        
-        combos_of_three = []
-
-        # Get all combinations of 3 cards
-        for i in range(len(player_object.hand)):
-            for j in range(i + 1, len(player_object.hand)):
-                for k in range(j + 1, len(player_object.hand)):
-                    
-                    combos_of_three.append([
-                        player_object.hand[i], 
-                        player_object.hand[j], 
-                        player_object.hand[k]])
-        
-        for combo in combos_of_three:
-            # Count score by suit for each combo
-            combo_score = {}
-
-            for card in combo:
-                if card.suit not in combo_score.keys():
-                    combo_score[card.suit] = 0
-                combo_score[card.suit] += card.value
-
-            # Add combo to list of all combos
-            hand_scores.append(combo_score)
-        
-        # DOUBLE MAX - take max of each combo and then max of that list
-        return max(max(combo.values()) for combo in hand_scores)
-        
-
-    # This is currently only called from app.py
-    def add_player(self, name) -> None:
-        """Initializes a player and adds to players dict."""
-
-        self.players[name] = Player(name)
-
-
-    def start_game(self) -> None:
-
-        # Validations
-        if self.in_progress:
-            print("Cannot start game while a game is in progress.")
-            return
-        
-        # Check number of players
-        if not (self.MIN_PLAYERS <= len(self.players.keys()) <= self.MAX_PLAYERS):
-            print(f"Need between {self.MIN_PLAYERS} and {self.MAX_PLAYERS} players to begin.")
-            return
-        
-        # Reset game vars
-        self.player_order = []
-        self.round_num = 0
-        for p_object in self.players.values():
-            p_object.log = []  # Start log as empty list for each player
-
-        # Set player order - eventually should be random
-        self.player_order = [p_name for p_name in self.players.keys()]
-
-        self.in_progress = True
-
-        self.new_round()
-
-
-    def new_round(self) -> None:
-
-        # Moved removal of players here so they stay in the client up until start of next round
-        for p_name in self.player_order:
-
-            # Use try/except clause because some players will have negative lives for more than 1 round
-            if 0 > self.players[p_name].lives:
-                try:
-                    # Adjust player order only; Keep players dict static
-                    self.player_order.remove(p_name)
-                except ValueError:
-                    pass
-
-        assert len(self.player_order) != 0, "Player order must not be 0 on round start."
-        
-        self.round_num += 1
-        self.turn_num = 0
-            
-        # Calculate new first player index based on round number
-        first_player_index = ((self.round_num)-1) % len(self.player_order)
-        
-        # Set dealer, first player, current player, blitzed players
-        self.first_player = self.player_order[first_player_index]
-        self.current_player = self.player_order[first_player_index]
-        self.dealer = self.player_order[first_player_index-1]
-        self.blitzed_players = []
-        
-        print_and_log(f"\n--- ROUND {self.round_num} ---\n", self.players)
-        print_and_log("\n--- DEALING ---", self.players)
-        
-        # Shuffle cards
-        self.shuffled_cards = shuffle_deck(self.deck)
-        
-        # Reset each player's hand and deal new hand
-        for p_name, p_object in self.players.items():
-            # Reset hand for every player to make sure player who is out doesn't have a hand
-            p_object.hand = []
-
-            if p_name in self.player_order:
-                # Deal for players who are still in the game
-                deal(p_object, self.shuffled_cards, num_cards=3)
-                
-                # Check for blitz
-                # It's possible for more than one player to be dealt a blitz; blitzed players must be list
-                if self.calc_hand_score(p_object) == 31:
-                    self.blitzed_players.append(p_name)
-
-        # Set a discard card; reset knocked
-        self.discard = [draw_card(self.shuffled_cards)]
-        self.knocked = ""
-
-        # Move on to turn
-        self.start_turn()
-
-
-    def end_round(self):
-        # scenarios - win doesn't actually matter, just display who knocked and loser
-            # BLITZ or blitz tie - everyone except highest loses a life
-            # ALL tie for loser - display knocked; no one loses
-            # tie for loser and other higher player - all tied for lowest lose a life
-            # 1 loser - display one who knocked and one who lost
-            # 1 loser AND loser knocked - loser loses 2 points
-
-        # Use player_order for all calculations here (since it only includes players who are NOT knocked out)
-
-        # Mode = end round; requires input from user to start next round
-        self.mode = "end_round"
-
-        if len(self.blitzed_players) > 0:
-            for p_name in self.blitzed_players:
-                print_and_log(f"{p_name} BLITZED!!!", self.players)
-
-        print_and_log(f"--- END OF ROUND {self.round_num} ---\n", self.players)
-        print_and_log("---     SCORES     ---\n", self.players)
-        
-        # Calc all hand scores for display and round end calculations
-        hand_scores = {}  # {score: player name}
-
-        # Group using SCORES as keys instead of player
-        for p_name in self.player_order:
-            score = self.calc_hand_score(self.players[p_name])
-            
-            if score in hand_scores.keys():
-                # Adds to list of players if there is a tie
-                hand_scores[score].append(p_name)
-            else:
-                # Starts new list for that score if no tie
-                hand_scores[score] = [p_name]
-
-        # Order scores from highest -> lowest for display
-        scores_ordered = sorted(hand_scores.keys(), reverse=True)
-        
-        # Loop through all entries to log all scores
-        for ordered_score in scores_ordered:
-            # Multiple players can have same score - need to use 2nd loop below
-            for p_name in hand_scores[ordered_score]:
-                print_and_log(f"{p_name}'s hand was worth {ordered_score}.", self.players)
-
-        # List contains all names of players who blitzed
-        if len(self.blitzed_players) > 0:
-            for p_name in self.player_order:
-                # If multiple blitzed players, everyone except blitzed players lose a life
-                if p_name not in self.blitzed_players:
-                    print_and_log(f"{p_name} loses 1 life.", self.players)
-                    self.players[p_name].lives -= 1
-        
-        # Else, no blitz. Find lowest scorer and subtract lives, or handle tie scenario
-        else:
-            # House rule - everyone who tied for last place loses a life unless *everyone* tied
-            
-            # All players tied when hand scores length = 1
-            if len(hand_scores) == 1:
-                print_and_log("Tie for last place, no change in score.", self.players)
-
-            # Players tied for last but some scored higher; All tying for last lose one life
-            elif len(hand_scores[scores_ordered[-1]]) > 1:
-        
-                # Lowest hand = hand_scores[scores_ordered[-1]]
-                for p_name in hand_scores[scores_ordered[-1]]:
-                    print_and_log(f"{p_name} loses 1 life.", self.players)
-                    self.players[p_name].lives -= 1
-
-            # Only one player scored the lowest; Subtract one life, or 2 lives if they knocked
-            else:
-                
-                # Get first (and only) element of scores ordered list
-                lowest_player = hand_scores[scores_ordered[-1]][0]
-                
-                # If didn't knock, lose 1 life
-                if lowest_player != self.knocked:
-                    print_and_log(f"{lowest_player} loses 1 life.", self.players)
-                    self.players[lowest_player].lives -= 1
-
-                # If knocked, lose 2 lives
-                else:
-                    print_and_log(f"{lowest_player} knocked but had the lowest score.", self.players)
-                    print_and_log(f"{lowest_player} loses 2 lives.", self.players)
-                    self.players[lowest_player].lives -= 2
-        
-        # List of any players that were brought down to negative lives
-        knocked_out = [p_name for p_name in self.player_order if 0 > self.players[p_name].lives]
-        
-        # Announce knock outs here; wait until start of next round to remove player for
-        # game real-ness; i.e. so players can view their hand and hand score at end of round
-        for p_name in knocked_out:
-            print_and_log(f"{p_name} has been knocked out.", self.players)
-            
-            # `-1` can represent a knockout to client
-            self.players[p_name].lives = -1
-
-        players_remaining = len(self.player_order) - len(knocked_out)
-
-        if players_remaining == 1:
-            print_and_log(f"\n{players_remaining[0]} wins!", self.players)
-            self.mode = "end_game"
-            self.in_progress = False
-            # mode `end_game` gives clients time to view the scores, leave/join rooms
-
-        else:
-            # More than 1 player remaining; continuing game
-            print_and_log("\nRemaining Players' Extra Lives:", self.players)
-            for p_name in self.player_order:
-                
-                # Skip knocked out player
-                if p_name in knocked_out:
-                    continue
-                
-                msg = ""
-                
-                # Send different msgs based on number of lives
-                if self.players[p_name].lives == 1:
-                    # Corrected grammar
-                    msg = f"{p_name} - {self.players[p_name].lives} life"
-                elif self.players[p_name].lives == 0:
-                    # On the bike, etc
-                    msg = f"{p_name} is {self.free_ride_alts[random.randint(0, len(self.free_ride_alts)-1)]}"
-                else:
-                    msg = f"{p_name} - {self.players[p_name].lives} lives"
-                
-                print_and_log(msg, self.players)
-
-
-    def start_turn(self):
-        # Increment turn number
-        self.turn_num += 1
-
-        # Set mode to main phase
-        self.mode = "main_phase"
-
-        # Check if any player(s) were dealt a blitz; skip to round end
-        if len(self.blitzed_players) > 0:
-            self.end_round()
-
-
-    def end_turn(self):
-        # Calculate new current player
-        self.current_player = self.player_order[((self.turn_num + ((self.round_num-1) % len(self.player_order))) % len(self.player_order))]
-        
-        # If new current player has knocked, round should end
-        if self.current_player == self.knocked:
-            self.end_round()
-        
-        # If not, start next turn
-        else:
-            self.start_turn()
-
-
-    def update(self, packet: dict):
-        # actions: start, add_player, draw, pickup, knock, discard, quit
-        # Assuming packet is coming from current player; validate before this is called
-
-        if not self.in_progress:
-            if packet["action"] == "start":
-                self.start_game()
-                return "accept"
-            
-        # Pause game before next round starts
-        if self.mode == "end_round":
-            if packet["action"] == "continue":
-                # Start a new round
-                self.new_round()
-            else:
-                return "reject"
-
-        elif self.mode == "main_phase":
-            taken_card = None
-            if packet["action"] == "knock":
-                if len(self.knocked) > 0:
-                    print_and_log(f"{self.knocked} has already knocked. You must pick a different move.", self.players, player=self.current_player)
-                    return "accept"
-                self.knocked = self.current_player
-                print_and_log(f"{self.current_player} knocked.", self.players)
-                self.end_turn()
-                return "accept"
-
-            elif packet["action"] == "pickup":
-                # convert to str here for type consistency
-                taken_card = self.discard.pop()
-
-            elif packet["action"] == "draw":
-                taken_card = draw_card(self.shuffled_cards)
-            
-            elif packet["action"] == "discard":
-                print_and_log("Must have 4 cards to discard.", self.players, player=self.current_player)
-                return "reject"
-            
-            # Catch all other moves with `else`; Hitting continue on main phase was breaking game
-            else:
-                print_and_log(f"Move {packet['action']} is not allowed during the main phase.", self.players, player=self.current_player)
-                return "reject"
-            
-            # If taken card has not been set at this point, will raise exception
-            if not taken_card:
-                print("taken_card not set in server update() function")
-                return "reject"
-            
-            # Add card to hand
-            self.players[self.current_player].hand.append(taken_card)
-            
-            # Check for blitz; can skip discard phase if blitz
-            if self.calc_hand_score(self.players[self.current_player]) == 31:
-                self.blitzed_players.append(self.current_player)
-                
-                # Auto-discard lowest card or odd suit out
-                # looks better than ending with 4 cards in hand
-                self.hand_to_discard(card_to_discard=self.find_discard_on_blitz())
-
-                # End round after card discarded
-                self.end_round()
-            
-            # Only set to discard if round has not ended Check for >3 cards in hand before setting mode to discard
-            # Removing check for end_round because discard should happen before the round ends - better for display and real game-feel
-            if len(self.players[self.current_player].hand) > 3:
-                self.mode = "discard"
-            
-        elif self.mode == "discard" and packet["action"] == "discard":
-            
-            # Unzip card from client
-            self.hand_to_discard(card_to_discard=unzip_card(packet["card"]))
-            self.end_turn()
-        
-        # If not returned early, move was accepted
-        return "accept"
-        
-
-    # Packages state for each player individually. Includes sid for socketio
-    def package_state(self, player_name) -> dict:
-        
-        # assert self.mode == "end_game" or self.in_progress, "Only call once game has started or between games"
-
-        # Get discard card
-        discard_card = None
-        if len(self.discard) > 0:
-            discard_card = self.discard[-1].zip_card()
-
-        # Build lists in order of player_order to make sure they're unpacked correctly
-        hand_sizes = []
-        lives = []
-        final_hands = []
-        final_scores = []
-        
-        for p_name in self.player_order:
-            hand_sizes.append(len(self.players[p_name].hand))
-            lives.append(self.players[p_name].lives)
-
-            if self.mode == "end_round" or self.mode == "end_game":
-                final_hands.append(zip_hand(self.players[p_name].hand))
-                final_scores.append(self.calc_hand_score(self.players[p_name]))
-
-        # All data the client needs from server
-        return {
-            # Generic data
-            "game": "thirty_one",  # specifies game
-            "action": "update_board",  # for client to know what type of update this is
-            "room": self.room_name,  # name of room
-            "mode": self.mode,  # current game mode - might help restrict inputs on client side
-            "in_progress": self.in_progress,  # whether game is in progress
-            "player_order": self.player_order,  # list of player names in order
-            "current_player": self.current_player,  # current player's name
-            "lives": lives,  # remaining lives of all players
-            "discard": discard_card,  # top card of discard pile
-            "hand_sizes": hand_sizes,  # number of cards in each players' hands
-            "dealer": self.dealer,  # dealer of round
-            "knocked": self.knocked,  # player who knocked (empty string until a knock)
-            "final_hands": final_hands,  # reveal all hands to all players
-            "final_scores": final_scores,  # reveal all scores to all players
-
-            # Specific to player
-            "recipient": player_name,
-            "hand": zip_hand(self.players[player_name].hand),  # hand for self only
-            "hand_score": self.calc_hand_score(self.players[player_name]),  # hand score for self
-            "log": self.players[player_name].log,  # new log msgs - split up for each player
-        }
-    
+from itertools import combinations
+import logging
+import os
+import random
+
+import msgspec
+from msgspec import UNSET, UnsetType
+
+from cards_shared import *
+from games_shared import *
+from log_config import lazy
+
+logger = logging.getLogger(__name__)
+
+# Fields in package_state shared by all players
+    # mode: current game mode - might help restrict inputs on client side
+    # in_progress: whether game is in progress
+    # player_order: list of player names in order
+    # current_player: current player's name
+    # lives: remaining lives of all players
+    # discard: top card of discard pile
+    # hand_sizes: number of cards in each players' hands
+    # dealer: dealer of round
+    # knocked: player who knocked (empty string until a knock)
+    # final_hands: reveal all hands to all players
+    # final_scores: reveal all scores to all players
+PUBLIC_FIELDS = ("mode", "in_progress", "player_order", "current_player", "lives", "discard", 
+                 "hand_sizes", "dealer", "knocked", "final_hands", "final_scores")
+
+
+
+class BoardUpdate(msgspec.Struct):
+    """Board data shared by all players; fields left unset were not changed by the move."""
+    room: str  # name of room
+    version: int  # board version; client checks for gaps
+    full: bool  # True: client replaces its board; False: client merges changed fields
+    game: str = "thirty_one"  # specifies game
+    action: str = "update_board"  # for client to know what type of update this is
+
+    # See PUBLIC_FIELDS
+    mode: str|UnsetType = UNSET
+    in_progress: bool|UnsetType = UNSET
+    player_order: list[str]|UnsetType = UNSET
+    current_player: str|UnsetType = UNSET
+    lives: list[int]|UnsetType = UNSET
+    discard: str|None|UnsetType = UNSET
+    hand_sizes: list[int]|UnsetType = UNSET
+    dealer: str|UnsetType = UNSET
+    knocked: str|UnsetType = UNSET
+    final_hands: list[list[str]]|UnsetType = UNSET
+    final_scores: list[int]|UnsetType = UNSET
+
+
+class PlayerUpdate(msgspec.Struct):
+    """Data for one player only."""
+    room: str
+    recipient: str
+    log: list[str]  # new log msgs - split up for each player
+    hand: list[str]|UnsetType = UNSET  # hand for self only
+    hand_score: int|UnsetType = UNSET  # hand score for self
+
+
+class BoardState(BoardUpdate):
+    """Full board for one player."""
+    recipient: str = ""
+    log: list[str] = []
+    hand: list[str] = []
+    hand_score: int = 0
+
+
+class PlayerSnapshot(msgspec.Struct, array_like=True):
+    name: str
+    hand: list[int]
+    lives: int
+    log: list[str]  # msgs not yet sent to the player
+
+
+class GameSnapshot(msgspec.Struct, array_like=True):
+    """Everything needed to rebuild a `State`; cards are ints. Saved by snapshots.py."""
+    version: int  # board version (ChangeTracker)
+    mode: str
+    in_progress: bool
+    round_num: int
+    turn_num: int
+    first_player: str
+    current_player: str
+    dealer: str
+    knocked: str
+    blitzed_players: list[str]
+    player_order: list[str]
+    players: list[PlayerSnapshot]  # in order of `State.players`
+    shuffled_cards: list[int]
+    discard: list[int]
+    reshuffles: int = 0
+
+
+# Card int -> value with aces worth 11
+ACE_HIGH_VALUES = value_table({**RANK_TO_VALUE, "A": 11})
+
+# Best scores for every 3 and 4 card hand, indexed by `hand_index`; cached on disk after first build
+HAND_SCORE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thirty_one_scores.bin")
+HAND_SCORE_TABLE_SIZES = {3: BINOMIALS[3][NUM_CARDS], 4: BINOMIALS[4][NUM_CARDS]}
+
+_hand_score_tables = {}  # {hand size: bytes}; filled on first use
+_B1, _B2, _B3, _B4 = BINOMIALS[1:5]
+
+
+def score_hand_combos(hand) -> int:
+    """Calculate the highest score of a hand by checking every combination of 3 cards."""
+    
+    best_score = 0
+
+    # Get all combinations of 3 cards
+    for combo in combinations(hand, 3):
+        # Count score by suit for each combo
+        suit_scores = [0, 0, 0, 0]
+
+        for card in combo:
+            suit_scores[CARD_SUIT_INDEX[card]] += ACE_HIGH_VALUES[card]
+
+        best_score = max(best_score, max(suit_scores))
+    
+    return best_score
+
+
+def build_hand_score_tables() -> dict[int, bytes]:
+    """Score every 3 card hand, then every 4 card hand from its 3 card subsets."""
+
+    table_3 = bytearray(HAND_SCORE_TABLE_SIZES[3])
+    for a, b, c in combinations(range(NUM_CARDS), 3):
+        table_3[_B1[a] + _B2[b] + _B3[c]] = score_hand_combos((a, b, c))
+
+    table_4 = bytearray(HAND_SCORE_TABLE_SIZES[4])
+    for a, b, c, d in combinations(range(NUM_CARDS), 4):
+        table_4[_B1[a] + _B2[b] + _B3[c] + _B4[d]] = max(
+            table_3[_B1[b] + _B2[c] + _B3[d]],
+            table_3[_B1[a] + _B2[c] + _B3[d]],
+            table_3[_B1[a] + _B2[b] + _B3[d]],
+            table_3[_B1[a] + _B2[b] + _B3[c]])
+
+    return {3: bytes(table_3), 4: bytes(table_4)}
+
+
+def load_hand_score_tables() -> dict[int, bytes]:
+    """Get score tables, reading from the disk cache or building (and caching) them."""
+
+    if _hand_score_tables:
+        return _hand_score_tables
+    
+    expected_size = HAND_SCORE_TABLE_SIZES[3] + HAND_SCORE_TABLE_SIZES[4]
+
+    try:
+        with open(HAND_SCORE_CACHE, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = b""
+
+    if len(data) == expected_size:
+        tables = {3: data[:HAND_SCORE_TABLE_SIZES[3]], 4: data[HAND_SCORE_TABLE_SIZES[3]:]}
+    
+    else:
+        tables = build_hand_score_tables()
+
+        # Write to temp file first so other workers never read a partial cache
+        try:
+            tmp_path = f"{HAND_SCORE_CACHE}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(tables[3] + tables[4])
+            os.replace(tmp_path, HAND_SCORE_CACHE)
+        except OSError:
+            logger.warning("Could not write hand score cache; continuing with tables in memory.")
+
+    _hand_score_tables.update(tables)
+
+    return _hand_score_tables
+
+
+def hand_score(hand) -> int:
+    """Look up the highest score of a 3 or 4 card hand."""
+
+    tables = _hand_score_tables or load_hand_score_tables()
+
+    # Same as `hand_index`, unrolled since this is called on every broadcast
+    if len(hand) == 3:
+        a, b, c = sorted(hand)
+        return tables[3][_B1[a] + _B2[b] + _B3[c]]
+    
+    elif len(hand) == 4:
+        a, b, c, d = sorted(hand)
+        return tables[4][_B1[a] + _B2[b] + _B3[c] + _B4[d]]
+    
+    return score_hand_combos(hand)
+
+
+class Player:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.order = 0
+        self.hand = []
+        self.lives = 3  # debug = score starts at 1  # Score starts at 3
+
+    
+    def __repr__(self) -> str:
+        return f"{Player(self.name)}"
+
+
+class State:
+    def __init__(self, room_name: str, seed: int|None=None, quiet: bool=False) -> None:
+        
+        # modes : start, main_phase, discard
+            # end_round - requires user input
+            # end_game - do not require user input
+
+        # Room
+        self.room_name = room_name
+        
+        # Room constants
+        self.MAX_PLAYERS = 7
+        self.MIN_PLAYERS = 2
+
+        # Game pieces
+        self.deck = DECK
+        self.shuffled_cards = []
+        self.hand_size = 3
+        self.players = {}  # Static; {player name: player object}
+
+        # All randomness comes from `rng` so a game can be replayed from its seed; see journal.py
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+
+        # Player-facing log; quiet games keep none, e.g. for simulations; see thirty_one_sim.py
+        self.events = EventLog()
+        self.quiet = quiet
+        self.player_order = []  # Dynamic; adjusted when player gets knocked out
+
+        # Gameplay
+        self.mode = "start"
+        self.in_progress = False
+
+        # Rounds
+        self.round_num = 0
+        self.turn_num = 0
+        self.first_player = ""  # player name
+        self.current_player = ""  # player name
+        self.dealer = ""  # player name
+        self.knocked = ""  # player name
+        self.blitzed_players = []  # player names; technically possible for more than 1 blitz
+        self.discard = []
+        self.reshuffles = 0  # times the discard pile was shuffled into a new deck this round
+
+        # Fields changed since last broadcast
+        self.changes = ChangeTracker()
+        self.free_ride_alts = ["getting a free ride", "on the bike", "on the dole", "riding the bus", "barely hanging on", "having a tummy ache", "having a long day"]
+        
+
+    def log(self, msg: str, player: str="all") -> None:
+        """Add msg to the game log for everyone or one player, unless the game is quiet."""
+        if not self.quiet:
+            self.events.append(msg, player)
+
+
+    def hand_to_discard(self, card_to_discard: int) -> None:
+        """Move selected card (checked to be in the current player's hand) from hand to discard."""
+
+        # Remove from hand
+        self.players[self.current_player].hand.remove(card_to_discard)
+        
+        # Add to discard
+        self.discard.append(card_to_discard)
+        self.changes.mark("discard", "hand_sizes")
+        self.changes.mark_hand(self.current_player)
+
+        # 'debug' log the actual card discarded; don't send to players
+        logger.debug("%s discarded: %s", self.current_player, lazy(format_card, card_to_discard))
+
+
+    def find_discard_on_blitz(self) -> int:
+        """Find card to automatically discard on a blitz."""
+        
+        # Either one card out of suit, or lowest card of a hand that only has one suit
+        discard_card = None
+
+        hand = self.players[self.current_player].hand
+        hand_mask = hand_to_mask(hand)
+        
+        # Cards per suit in hand
+        suit_masks = [hand_mask & suit_mask for suit_mask in SUIT_MASKS if hand_mask & suit_mask]
+        
+        # Len 1 means only suit; find lowest card
+        if len(suit_masks) == 1:
+            discard_card = min(hand, key=lambda card: ACE_HIGH_VALUES[card])
+        
+        # Len 2 means find the odd suit with only one card
+        else:
+            for suit_mask in suit_masks:
+                if suit_mask.bit_count() == 1:
+                    discard_card = suit_mask.bit_length() - 1
+        
+        return discard_card
+
+
+    def calc_hand_score(self, player_object:Player) -> int:
+        """Calculate the highest score of a player's hand."""
+
+        # Return if hand is empty
+        if len(player_object.hand) == 0:
+            logger.debug("Cannot calc hand score; Hand empty.")
+            return 0
+        
+        return hand_score(player_object.hand)
+        
+
+    # This is currently only called from app.py
+    def add_player(self, name) -> None:
+        """Initializes a player and adds to players dict."""
+
+        self.players[name] = Player(name)
+        self.changes.mark(*PUBLIC_FIELDS)
+
+
+    def start_game(self) -> None:
+
+        # Validations
+        if self.in_progress:
+            logger.info("Cannot start game while a game is in progress.")
+            return
+        
+        # Check number of players
+        if not (self.MIN_PLAYERS <= len(self.players.keys()) <= self.MAX_PLAYERS):
+            logger.info("Need between %s and %s players to begin.", self.MIN_PLAYERS, self.MAX_PLAYERS)
+            return
+        
+        # Reset game vars
+        self.player_order = []
+        self.round_num = 0
+        self.events.clear()
+
+        # Set player order - eventually should be random
+        self.player_order = [p_name for p_name in self.players.keys()]
+
+        self.in_progress = True
+        self.changes.mark("in_progress")
+
+        self.new_round()
+
+
+    def new_round(self) -> None:
+
+        # Moved removal of players here so they stay in the client up until start of next round
+        # Adjust player order only; Keep players dict static
+        self.player_order = [p_name for p_name in self.player_order if self.players[p_name].lives >= 0]
+
+        assert len(self.player_order) != 0, "Player order must not be 0 on round start."
+        
+        self.round_num += 1
+        self.turn_num = 0
+            
+        # Calculate new first player index based on round number
+        first_player_index = ((self.round_num)-1) % len(self.player_order)
+        
+        # Set dealer, first player, current player, blitzed players
+        self.first_player = self.player_order[first_player_index]
+        self.current_player = self.player_order[first_player_index]
+        self.dealer = self.player_order[first_player_index-1]
+        self.blitzed_players = []
+
+        # Everything on the board changes with a new deal
+        self.changes.mark(*PUBLIC_FIELDS)
+        self.changes.mark_hand(*self.players.keys())
+        
+        self.log(f"\n--- ROUND {self.round_num} ---\n")
+        self.log("\n--- DEALING ---")
+        
+        # Shuffle cards
+        self.shuffled_cards = shuffle_deck(self.deck, self.rng)
+        self.reshuffles = 0
+        
+        # Reset each player's hand and deal new hand
+        for p_name, p_object in self.players.items():
+            # Reset hand for every player to make sure player who is out doesn't have a hand
+            p_object.hand = []
+
+            if p_name in self.player_order:
+                # Deal for players who are still in the game
+                deal(p_object, self.shuffled_cards, num_cards=3, values=ACE_HIGH_VALUES)
+                
+                # Check for blitz
+                # It's possible for more than one player to be dealt a blitz; blitzed players must be list
+                if self.calc_hand_score(p_object) == 31:
+                    self.blitzed_players.append(p_name)
+
+        # Set a discard card; reset knocked
+        self.discard = [draw_card(self.shuffled_cards)]
+        self.knocked = ""
+
+        # Move on to turn
+        self.start_turn()
+
+
+    def end_round(self):
+        # scenarios - win doesn't actually matter, just display who knocked and loser
+            # BLITZ or blitz tie - everyone except highest loses a life
+            # ALL tie for loser - display knocked; no one loses
+            # tie for loser and other higher player - all tied for lowest lose a life
+            # 1 loser - display one who knocked and one who lost
+            # 1 loser AND loser knocked - loser loses 2 points
+
+        # Use player_order for all calculations here (since it only includes players who are NOT knocked out)
+
+        # Mode = end round; requires input from user to start next round
+        self.mode = "end_round"
+        self.changes.mark("mode", "lives", "final_hands", "final_scores")
+
+        if len(self.blitzed_players) > 0:
+            for p_name in self.blitzed_players:
+                self.log(f"{p_name} BLITZED!!!")
+
+        self.log(f"--- END OF ROUND {self.round_num} ---\n")
+        self.log("---     SCORES     ---\n")
+        
+        # Calc all hand scores for display and round end calculations
+        hand_scores = {}  # {score: player name}
+
+        # Group using SCORES as keys instead of player
+        for p_name in self.player_order:
+            score = self.calc_hand_score(self.players[p_name])
+            
+            if score in hand_scores.keys():
+                # Adds to list of players if there is a tie
+                hand_scores[score].append(p_name)
+            else:
+                # Starts new list for that score if no tie
+                hand_scores[score] = [p_name]
+
+        # Order scores from highest -> lowest for display
+        scores_ordered = sorted(hand_scores.keys(), reverse=True)
+        
+        # Loop through all entries to log all scores
+        for ordered_score in scores_ordered:
+            # Multiple players can have same score - need to use 2nd loop below
+            for p_name in hand_scores[ordered_score]:
+                self.log(f"{p_name}'s hand was worth {ordered_score}.")
+
+        # List contains all names of players who blitzed
+        if len(self.blitzed_players) > 0:
+            for p_name in self.player_order:
+                # If multiple blitzed players, everyone except blitzed players lose a life
+                if p_name not in self.blitzed_players:
+                    self.log(f"{p_name} loses 1 life.")
+                    self.players[p_name].lives -= 1
+        
+        # Else, no blitz. Find lowest scorer and subtract lives, or handle tie scenario
+        else:
+            # House rule - everyone who tied for last place loses a life unless *everyone* tied
+            
+            # All players tied when hand scores length = 1
+            if len(hand_scores) == 1:
+                self.log("Tie for last place, no change in score.")
+
+            # Players tied for last but some scored higher; All tying for last lose one life
+            elif len(hand_scores[scores_ordered[-1]]) > 1:
+        
+                # Lowest hand = hand_scores[scores_ordered[-1]]
+                for p_name in hand_scores[scores_ordered[-1]]:
+                    self.log(f"{p_name} loses 1 life.")
+                    self.players[p_name].lives -= 1
+
+            # Only one player scored the lowest; Subtract one life, or 2 lives if they knocked
+            else:
+                
+                # Get first (and only) element of scores ordered list
+                lowest_player = hand_scores[scores_ordered[-1]][0]
+                
+                # If didn't knock, lose 1 life
+                if lowest_player != self.knocked:
+                    self.log(f"{lowest_player} loses 1 life.")
+                    self.players[lowest_player].lives -= 1
+
+                # If knocked, lose 2 lives
+                else:
+                    self.log(f"{lowest_player} knocked but had the lowest score.")
+                    self.log(f"{lowest_player} loses 2 lives.")
+                    self.players[lowest_player].lives -= 2
+        
+        # List of any players that were brought down to negative lives
+        knocked_out = [p_name for p_name in self.player_order if 0 > self.players[p_name].lives]
+        
+        # Announce knock outs here; wait until start of next round to remove player for
+        # game real-ness; i.e. so players can view their hand and hand score at end of round
+        for p_name in knocked_out:
+            self.log(f"{p_name} has been knocked out.")
+            
+            # `-1` can represent a knockout to client
+            self.players[p_name].lives = -1
+
+        players_remaining = [p_name for p_name in self.player_order if p_name not in knocked_out]
+
+        if len(players_remaining) == 1:
+            self.log(f"\n{players_remaining[0]} wins!")
+            self.mode = "end_game"
+            self.in_progress = False
+            self.changes.mark("mode", "in_progress")
+            # mode `end_game` gives clients time to view the scores, leave/join rooms
+
+        else:
+            # More than 1 player remaining; continuing game
+            self.log("\nRemaining Players' Extra Lives:")
+            for p_name in self.player_order:
+                
+                # Skip knocked out player
+                if p_name in knocked_out:
+                    continue
+                
+                msg = ""
+                
+                # Send different msgs based on number of lives
+                if self.players[p_name].lives == 1:
+                    # Corrected grammar
+                    msg = f"{p_name} - {self.players[p_name].lives} life"
+                elif self.players[p_name].lives == 0:
+                    # On the bike, etc
+                    msg = f"{p_name} is {self.free_ride_alts[self.rng.randint(0, len(self.free_ride_alts)-1)]}"
+                else:
+                    msg = f"{p_name} - {self.players[p_name].lives} lives"
+                
+                self.log(msg)
+
+
+    def start_turn(self):
+        # Increment turn number
+        self.turn_num += 1
+
+        # Set mode to main phase
+        self.mode = "main_phase"
+        self.changes.mark("mode")
+
+        # Check if any player(s) were dealt a blitz; skip to round end
+        if len(self.blitzed_players) > 0:
+            self.end_round()
+
+
+    def end_turn(self):
+        # Calculate new current player
+        self.current_player = self.player_order[((self.turn_num + ((self.round_num-1) % len(self.player_order))) % len(self.player_order))]
+        self.changes.mark("current_player")
+        
+        # If new current player has knocked, round should end
+        if self.current_player == self.knocked:
+            self.end_round()
+        
+        # If not, start next turn
+        else:
+            self.start_turn()
+
+
+    def update(self, packet: dict):
+        # actions: start, add_player, draw, pickup, knock, discard, quit
+        # Assuming packet is coming from current player; validate before this is called
+
+        if not self.in_progress:
+            if packet["action"] == "start":
+                self.start_game()
+                return "accept"
+            
+        # Pause game before next round starts
+        if self.mode == "end_round":
+            if packet["action"] == "continue":
+                # Start a new round
+                self.new_round()
+            else:
+                return "reject"
+
+        elif self.mode == "main_phase":
+            taken_card = None
+            if packet["action"] == "knock":
+                if len(self.knocked) > 0:
+                    self.log(f"{self.knocked} has already knocked. You must pick a different move.", player=self.current_player)
+                    return "accept"
+                self.knocked = self.current_player
+                self.changes.mark("knocked")
+                self.log(f"{self.current_player} knocked.")
+                self.end_turn()
+                return "accept"
+
+            elif packet["action"] == "pickup":
+                if not self.discard:
+                    self.log("The discard pile is empty.", player=self.current_player)
+                    return "reject"
+                taken_card = self.discard.pop()
+                self.changes.mark("discard")
+
+            elif packet["action"] == "draw":
+                if not self.shuffled_cards:
+                    self.reshuffle_discard()
+                if not self.shuffled_cards:
+                    self.log("There are no cards left to draw.", player=self.current_player)
+                    return "reject"
+                taken_card = draw_card(self.shuffled_cards)
+            
+            elif packet["action"] == "discard":
+                self.log("Must have 4 cards to discard.", player=self.current_player)
+                return "reject"
+            
+            # Catch all other moves with `else`; Hitting continue on main phase was breaking game
+            else:
+                self.log(f"Move {packet['action']} is not allowed during the main phase.", player=self.current_player)
+                return "reject"
+            
+            # If taken card has not been set at this point, will raise exception
+            if taken_card is None:
+                logger.error("taken_card not set in server update() function")
+                return "reject"
+            
+            # Add card to hand
+            self.players[self.current_player].hand.append(taken_card)
+            self.changes.mark("hand_sizes")
+            self.changes.mark_hand(self.current_player)
+            
+            # Check for blitz; can skip discard phase if blitz
+            if self.calc_hand_score(self.players[self.current_player]) == 31:
+                self.blitzed_players.append(self.current_player)
+                
+                # Auto-discard lowest card or odd suit out
+                # looks better than ending with 4 cards in hand
+                self.hand_to_discard(card_to_discard=self.find_discard_on_blitz())
+
+                # End round after card discarded
+                self.end_round()
+            
+            # Only set to discard if round has not ended Check for >3 cards in hand before setting mode to discard
+            # Removing check for end_round because discard should happen before the round ends - better for display and real game-feel
+            if len(self.players[self.current_player].hand) > 3:
+                self.mode = "discard"
+                self.changes.mark("mode")
+            
+        elif self.mode == "discard" and packet["action"] == "discard":
+            
+            # Unzip card from client; can only discard a card from own hand
+            card_to_discard = unzip_card(packet.get("card"))
+            if card_to_discard not in self.players[self.current_player].hand:
+                self.log("Must discard a card from your hand.", player=self.current_player)
+                return "reject"
+
+            self.hand_to_discard(card_to_discard=card_to_discard)
+            self.end_turn()
+        
+        # If not returned early, move was accepted
+        return "accept"
+        
+
+    def reshuffle_discard(self) -> None:
+        """Deck ran out: shuffle the discard pile, except its top card, into a new deck."""
+        if len(self.discard) < 2:
+            return
+
+        self.shuffled_cards = shuffle_cards(self.discard[:-1], self.rng)
+        self.discard = self.discard[-1:]
+        self.reshuffles += 1
+        self.changes.mark("discard")
+        self.log("The deck ran out; the discard pile was shuffled into a new deck.")
+
+
+    def reseed(self, seed: int) -> None:
+        """Continue with a new seed, e.g. after restoring from a snapshot."""
+        self.seed = seed
+        self.rng.seed(seed)
+
+
+    def snapshot(self) -> GameSnapshot:
+        return GameSnapshot(
+            version=self.changes.version, mode=self.mode, in_progress=self.in_progress,
+            round_num=self.round_num, turn_num=self.turn_num, first_player=self.first_player,
+            current_player=self.current_player, dealer=self.dealer, knocked=self.knocked,
+            blitzed_players=list(self.blitzed_players), player_order=list(self.player_order),
+            players=[PlayerSnapshot(p.name, list(p.hand), p.lives, self.events.unread(p.name)) for p in self.players.values()],
+            shuffled_cards=list(self.shuffled_cards), discard=list(self.discard), reshuffles=self.reshuffles)
+
+
+    @classmethod
+    def from_snapshot(cls, room_name: str, snapshot: GameSnapshot) -> "State":
+        state = cls(room_name)
+
+        for field in ("mode", "in_progress", "round_num", "turn_num", "first_player", "current_player",
+                      "dealer", "knocked", "blitzed_players", "player_order", "shuffled_cards", "discard", "reshuffles"):
+            setattr(state, field, getattr(snapshot, field))
+
+        for p in snapshot.players:
+            player = Player(p.name)
+            player.hand, player.lives = p.hand, p.lives
+            state.players[p.name] = player
+
+        # Shared entries come back as one copy per player; widen the window so a player who
+        # fell behind still gets all of theirs, not only what fits in the last `size` entries
+        state.events.entries = [(p.name, msg) for p in snapshot.players for msg in p.log]
+        state.events.size = max(state.events.size, len(state.events.entries))
+
+        # Clients that rejoin get a full board with this version
+        state.changes.version = snapshot.version
+        return state
+
+
+    def package_field(self, field: str):
+        """Package one public field for the client."""
+
+        # Top card of discard pile
+        if field == "discard":
+            if len(self.discard) > 0:
+                return zip_card(self.discard[-1])
+            return None
+
+        # Build lists in order of player_order to make sure they're unpacked correctly
+        elif field == "lives":
+            return [self.players[p_name].lives for p_name in self.player_order]
+        
+        elif field == "hand_sizes":
+            return [len(self.players[p_name].hand) for p_name in self.player_order]
+        
+        # Only reveal all hands and scores at end of round
+        elif field == "final_hands" or field == "final_scores":
+            if self.mode != "end_round" and self.mode != "end_game":
+                return []
+            
+            if field == "final_hands":
+                return [zip_hand(self.players[p_name].hand) for p_name in self.player_order]
+            
+            return [self.calc_hand_score(self.players[p_name]) for p_name in self.player_order]
+        
+        # mode, in_progress, player_order, current_player, dealer, knocked
+        return getattr(self, field)
+
+
+    def package_public(self, fields, full: bool=False) -> BoardUpdate:
+        """Board data shared by all players; built once per move and sent to the whole room."""
+
+        return BoardUpdate(room=self.room_name, version=self.changes.version, full=full,
+                           **{field: self.package_field(field) for field in fields})
+
+
+    def package_private(self, player_name: str, include_hand: bool=True) -> PlayerUpdate:
+        """Data for one player only; sent to that player's sid."""
+
+        private = PlayerUpdate(room=self.room_name, recipient=player_name, log=self.events.unread(player_name))
+
+        if include_hand:
+            private.hand = zip_hand(self.players[player_name].hand)
+            private.hand_score = self.calc_hand_score(self.players[player_name])
+        
+        return private
+
+
+    # Packages state for each player individually. Includes sid for socketio
+    def package_state(self, player_name) -> BoardState:
+        """Full snapshot of the board for one player; sent on join, rejoin or when a client misses an update."""
+        
+        # assert self.mode == "end_game" or self.in_progress, "Only call once game has started or between games"
+
+        return BoardState(**{**msgspec.structs.asdict(self.package_public(PUBLIC_FIELDS, full=True)),
+                             **msgspec.structs.asdict(self.package_private(player_name))})
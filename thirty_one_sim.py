@@ -0,0 +1,243 @@
+"""Headless Monte Carlo simulation of Thirty-One.
+
+Bots play whole games through `State.update` with no Socket.IO and no player logs (`quiet`).
+Each seat gets a policy that picks its moves; batches of games run in parallel processes and
+their statistics are added up. Use it to try house rules or to load-test the engine:
+    python thirty_one_sim.py --games 100000 --players 4 --policy greedy random
+
+Games are reproducible: the same --seed and --batch-size give the same results for any
+number of processes.
+"""
+from abc import abstractmethod
+import argparse
+from collections import Counter
+import multiprocessing
+import random
+from time import perf_counter
+
+from cards_shared import zip_card
+from sims_shared import Policy
+from thirty_one_bots import ThirtyOneBot
+from thirty_one_game import ACE_HIGH_VALUES, State, hand_score, load_hand_score_tables
+
+# Moves without the game ending before it is counted as stalled and abandoned
+MAX_TURNS = 2000
+
+
+class ThirtyOnePolicy(Policy):
+    """`main_phase` returns "draw", "pickup" or "knock", `discard` a card int."""
+
+    @abstractmethod
+    def main_phase(self, game: State, name: str) -> str:
+        ...
+
+
+    def observe(self, game: State) -> None:
+        """Called after every update, for policies that keep track of the game."""
+
+
+class RandomPolicy(ThirtyOnePolicy):
+    """Draws or picks up at random, knocks now and then, discards a random card."""
+
+    def __init__(self, rng: random.Random, knock_chance: float=0.1) -> None:
+        super().__init__(rng)
+        self.knock_chance = knock_chance
+
+
+    def main_phase(self, game: State, name: str) -> str:
+        if not game.knocked and self.rng.random() < self.knock_chance:
+            return "knock"
+        return self.rng.choice(("draw", "pickup"))
+
+
+    def discard(self, game: State, name: str) -> int:
+        return self.rng.choice(game.players[name].hand)
+
+
+class GreedyPolicy(ThirtyOnePolicy):
+    """Knocks at `knock_at` or better, picks up the discard if it improves the hand, keeps the best 3 cards."""
+
+    def __init__(self, rng: random.Random, knock_at: int=27) -> None:
+        super().__init__(rng)
+        self.knock_at = knock_at
+
+
+    def main_phase(self, game: State, name: str) -> str:
+        hand = game.players[name].hand
+        score = hand_score(hand)
+
+        if not game.knocked and score >= self.knock_at:
+            return "knock"
+
+        if game.discard and hand_score(hand + [game.discard[-1]]) > score:
+            return "pickup"
+        return "draw"
+
+
+    def discard(self, game: State, name: str) -> int:
+        hand = game.players[name].hand
+
+        # Keep the 3 cards that score best; of equal options, throw away the lowest card
+        return max(hand, key=lambda card: (hand_score([c for c in hand if c != card]), -ACE_HIGH_VALUES[card]))
+
+
+class ExpectedValuePolicy(ThirtyOnePolicy):
+    """The server's bot players (thirty_one_bots): expected values over the cards a player hasn't seen."""
+
+    def __init__(self, rng: random.Random) -> None:
+        super().__init__(rng)
+        self.bots = {}  # {player name: ThirtyOneBot}
+
+
+    def bot(self, name: str) -> ThirtyOneBot:
+        if name not in self.bots:
+            self.bots[name] = ThirtyOneBot(name)
+        return self.bots[name]
+
+
+    def main_phase(self, game: State, name: str) -> str:
+        return self.bot(name).main_phase(game)
+
+
+    def discard(self, game: State, name: str) -> int:
+        return self.bot(name).discard(game)
+
+
+    def observe(self, game: State) -> None:
+        for bot in self.bots.values():
+            bot.observe(game)
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "ev": ExpectedValuePolicy}
+
+
+def record_round(game: State, lives_at_start: dict[str, int], stats: Counter) -> None:
+    stats["rounds"] += 1
+    stats["turns"] += game.turn_num
+
+    if game.blitzed_players:
+        stats["blitz_rounds"] += 1
+
+    if game.knocked:
+        stats["knocks"] += 1
+        if game.players[game.knocked].lives >= lives_at_start[game.knocked]:
+            stats["knock_successes"] += 1
+
+
+def play_game(policies: dict[str, ThirtyOnePolicy], seed: int, stats: Counter) -> None:
+    """Play one game to the end; `policies` is {player name: policy} in seat order."""
+    game = State("simulation", seed=seed, quiet=True)
+    for name in policies:
+        game.add_player(name)
+
+    game.update({"action": "start"})
+
+    lives_at_start = {name: player.lives for name, player in game.players.items()}
+    recorded_round = 0
+    moves = 0
+
+    while True:
+        for policy in policies.values():
+            policy.observe(game)
+
+        # Rounds can end on the deal (blitz), so check after every update
+        if game.mode in ("end_round", "end_game") and recorded_round != game.round_num:
+            record_round(game, lives_at_start, stats)
+            recorded_round = game.round_num
+
+        if not game.in_progress:
+            break
+
+        if moves >= MAX_TURNS:
+            stats["stalled"] += 1
+            return
+        moves += 1
+
+        if game.mode == "end_round":
+            game.update({"action": "continue"})
+            lives_at_start = {name: player.lives for name, player in game.players.items()}
+            continue
+
+        name = game.current_player
+        if game.mode == "discard":
+            game.update({"action": "discard", "card": zip_card(policies[name].discard(game, name))})
+            continue
+
+        action = policies[name].main_phase(game, name)
+
+        # Keep bots to legal moves: one knock per round
+        if action == "knock" and game.knocked:
+            action = "draw"
+
+        # The engine shuffles the discard pile into a new deck
+        if action == "draw" and not game.shuffled_cards:
+            stats["deck_exhausted"] += 1
+
+        game.update({"action": action})
+
+    stats["games"] += 1
+    winner = next(name for name in game.player_order if game.players[name].lives >= 0)
+    stats[f"wins_seat_{list(policies).index(winner)}"] += 1
+
+
+def run_batch(num_games: int, num_players: int, policy_names: tuple[str, ...], seed: int) -> Counter:
+    rng = random.Random(seed)
+    policies = {f"bot{seat}": POLICIES[policy_names[seat % len(policy_names)]](rng) for seat in range(num_players)}
+
+    stats = Counter()
+    for _ in range(num_games):
+        play_game(policies, rng.getrandbits(64), stats)
+    return stats
+
+
+def simulate(num_games: int, num_players: int=4, policy_names: tuple[str, ...]=("greedy",),
+             processes: int|None=None, seed: int=0, batch_size: int=1000) -> Counter:
+    """Play `num_games` games; policies are given to seats in turn."""
+
+    # Build or read the score tables once so forked workers share them
+    load_hand_score_tables()
+
+    batches = [(min(batch_size, num_games - start), num_players, tuple(policy_names), seed * 1_000_003 + index)
+               for index, start in enumerate(range(0, num_games, batch_size))]
+
+    if processes == 1:
+        results = [run_batch(*batch) for batch in batches]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run_batch, batches)
+
+    return sum(results, Counter())
+
+
+def report(stats: Counter, num_players: int, elapsed: float) -> None:
+    games, rounds = stats["games"], max(stats["rounds"], 1)
+
+    print(f"games            {games} ({games / elapsed:.0f}/s), stalled {stats['stalled']}")
+    print(f"rounds per game  {stats['rounds'] / max(games, 1):.2f}")
+    print(f"turns per round  {stats['turns'] / rounds:.2f}")
+    print(f"blitz rate       {stats['blitz_rounds'] / rounds:.2%}")
+    print(f"knock rate       {stats['knocks'] / rounds:.2%}")
+    print(f"knock success    {stats['knock_successes'] / max(stats['knocks'], 1):.2%}")
+    print(f"deck ran out     {stats['deck_exhausted']} times")
+    print("wins by seat     " + ", ".join(f"{stats[f'wins_seat_{seat}'] / max(games, 1):.1%}"
+                                          for seat in range(num_players)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate Thirty-One games between bots.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--policy", nargs="+", default=["greedy"], choices=POLICIES,
+                        help="policies given to seats in turn")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    stats = simulate(args.games, args.players, tuple(args.policy), args.processes, args.seed, args.batch_size)
+    report(stats, args.players, perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Payload schemas and encodings for events sent to clients.
+
+Clients receive JSON unless they ask for MessagePack when connecting (`auth: {"encoding": "msgpack"}`).
+Alongside each room, a socket joins the group `<room>#<encoding>`; payloads sent to a room are
+encoded once per encoding and sent to each group.
+"""
+from time import localtime, strftime
+
+import flask_socketio as fio
+import msgspec
+
+ENCODINGS = ("json", "msgpack")
+
+_msgpack_encoder = msgspec.msgpack.Encoder()
+
+
+class LobbyRow(msgspec.Struct):
+    """One room in the lobby table."""
+    name: str
+    pw_flag: bool  # True if pw, False if no pw
+    game_name: str
+    capacity: int
+    date_created: str
+    creator: str
+    clients_connected: int
+    in_progress: bool
+
+
+class LobbyRooms(msgspec.Struct):
+    """Rows to add to the lobby table."""
+    room: str
+    rooms: list[LobbyRow]
+    username: str = ""
+    action: str = "add_rooms"
+
+
+class LobbyUpdate(msgspec.Struct):
+    """Rows changed or added, and rooms removed, in one game's lobby since its last update."""
+    room: str
+    rows: list[LobbyRow]
+    removed: list[str] = []
+    action: str = "update_rows"
+
+
+class ChatMessage(msgspec.Struct):
+    msg: str
+    sender: str
+    time_stamp: str
+
+
+def chat_message(msg: str, sender: str="system") -> ChatMessage:
+    return ChatMessage(msg=msg, sender=sender, time_stamp=strftime("%b-%d %I:%M%p", localtime()))
+
+
+def negotiate(auth) -> str:
+    """Encoding requested by a connecting client, or JSON if it didn't ask for one we support."""
+    if isinstance(auth, dict) and auth.get("encoding") in ENCODINGS:
+        return auth["encoding"]
+    return "json"
+
+
+def encode(payload: msgspec.Struct, encoding: str) -> dict|bytes:
+    if encoding == "msgpack":
+        return _msgpack_encoder.encode(payload)
+
+    # Socket.IO serializes the dict to JSON; unset fields are left out
+    return msgspec.to_builtins(payload)
+
+
+def lobby_channel(game_name: str) -> str:
+    """Lobby sockets also join one of these for the game they're browsing; lobby updates go there."""
+    return f"lobby/{game_name}"
+
+
+def group(room: str, encoding: str) -> str:
+    return f"{room}#{encoding}"
+
+
+def join_room(room: str, encoding: str) -> None:
+    fio.join_room(room)
+    fio.join_room(group(room, encoding))
+
+
+def leave_room(room: str) -> None:
+    fio.leave_room(room)
+    for encoding in ENCODINGS:
+        fio.leave_room(group(room, encoding))
+
+
+def emit(event: str, payload: msgspec.Struct, to: str, encoding: str="") -> None:
+    """
+    Send to a single sid in its `encoding`, or to everyone in room `to` if no encoding is given.
+    Works outside of socket events too (e.g. background tasks), as long as there is an app context.
+    """
+    if len(encoding) > 0:
+        fio.emit(event, encode(payload, encoding), to=to, namespace="/")
+        return
+
+    for encoding in ENCODINGS:
+        fio.emit(event, encode(payload, encoding), to=group(to, encoding), namespace="/")
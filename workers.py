@@ -0,0 +1,117 @@
+"""Run several app workers on one box behind a sticky router.
+
+    python workers.py --port 5000 --workers 4
+
+Each worker is a one-process gunicorn eventlet server on its own port (port + 1, port + 2, ...).
+Workers share rooms through the SQLite room store and reach each other's sockets through the
+message queue (the local SQLite stand-in unless SOCKETIO_MESSAGE_QUEUE is set). The router
+listens on `port` and sends every request for a game room (`room` query param set by the
+client's socket) to the same worker, see `store.worker_for_room`. Other requests are spread
+by client address. With one worker, gunicorn is run directly on `port` with rooms in memory.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+from urllib.parse import parse_qs, urlsplit
+import zlib
+
+import eventlet
+
+from store import worker_for_room
+
+MAX_HEAD_SIZE = 65536
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    gunicorn = [sys.executable, "-m", "gunicorn", "--worker-class", "eventlet", "-w", "1"]
+
+    if args.workers <= 1:
+        os.execv(sys.executable, gunicorn + ["-b", f"0.0.0.0:{args.port}", "app:app"])
+
+    env = dict(os.environ, NUM_WORKERS=str(args.workers))
+    env.setdefault("ROOM_STORE", "sqlite:///rooms.db")
+    env.setdefault("SOCKETIO_MESSAGE_QUEUE", "sqlite:///socketio_queue.db")
+
+    ports = [args.port + 1 + i for i in range(args.workers)]
+    processes = [subprocess.Popen(gunicorn + ["-b", f"127.0.0.1:{port}", "app:app"], env=dict(env, WORKER_INDEX=str(index)))
+                 for index, port in enumerate(ports)]
+
+    try:
+        server = eventlet.listen(("0.0.0.0", args.port))
+        print(f"Routing port {args.port} to workers on ports {ports}")
+        eventlet.serve(server, lambda client, address: route(client, address, ports))
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+def route(client: socket.socket, address: tuple, ports: list[int]) -> None:
+    """Forward one client connection to the worker that owns its room."""
+    head = b""
+    while b"\r\n\r\n" not in head:
+        chunk = client.recv(4096)
+        if not chunk or len(head) > MAX_HEAD_SIZE:
+            client.close()
+            return
+        head += chunk
+
+    header_block, body = head.split(b"\r\n\r\n", 1)
+    request_line, *headers = header_block.split(b"\r\n")
+
+    room = ""
+    parts = request_line.decode("latin-1").split(" ")
+    if len(parts) == 3:
+        room = parse_qs(urlsplit(parts[1]).query).get("room", [""])[0]
+
+    if len(room) > 0 and room != "lobby":
+        port = ports[worker_for_room(room, len(ports))]
+    else:
+        port = ports[zlib.crc32(address[0].encode()) % len(ports)]
+
+    # Requests on a kept-alive connection could belong to another room; one request per connection
+    if not any(line.lower() == b"upgrade: websocket" for line in headers):
+        headers = [line for line in headers if not line.lower().startswith((b"connection:", b"keep-alive:"))]
+        headers.append(b"Connection: close")
+
+    try:
+        upstream = eventlet.connect(("127.0.0.1", port))
+        upstream.sendall(b"\r\n".join([request_line] + headers) + b"\r\n\r\n" + body)
+    except OSError:
+        client.close()
+        return
+
+    # Copy both ways until the worker is done sending; a client may leave its side open
+    to_upstream = eventlet.spawn(pipe, client, upstream)
+    pipe(upstream, client)
+    to_upstream.kill()
+
+    upstream.close()
+    client.close()
+
+
+def pipe(source: socket.socket, destination: socket.socket) -> None:
+    try:
+        while True:
+            data = source.recv(65536)
+            if not data:
+                break
+            destination.sendall(data)
+        destination.shutdown(socket.SHUT_WR)
+    except OSError:
+        # Either side went away; unblock the other direction too
+        for sock in (source, destination):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main()